@@ -0,0 +1,121 @@
+"""
+Measure the locality gained by sorting features along space-filling curves
+
+Run with the Python interpreter of the QGIS installation, e.g.
+
+    python-qgis benchmarks/spatial_order.py [number of buildings per side]
+
+Features are Voronoi cells of the synthetic buildings of the tessellation
+benchmark, shuffled to mimic a provider returning them in no spatial order.
+Each order mirrors the spatial order conversion parameter and is split into
+chunks of consecutive features, as in chunked and parallel processing. The script
+reports the time needed to sort, the mean area of chunk extents relative to
+the whole layer, the number of features a chunk has to read around it
+(features intersecting its extent, as tiles of the tessellation do), the
+share of queen contiguity pairs split between chunks and the best time to
+build the contiguity graph.
+
+Results for 100 x 100 buildings in chunks of 1000 on a single core:
+
+    order         sort [s]  extent  context  split pairs  graph [s]
+    provider         0.000   1.000    10000        0.897       0.39
+    hilbert          0.023   0.133     1419        0.045       0.29
+    morton           0.017   0.177     1867        0.042       0.37
+
+Chunks in the provider order each span the whole layer. Chunks of the Hilbert
+order cover an eighth of it, read 7x fewer features for context and split
+20x fewer neighbour pairs, and the graph builds faster on the sorted cells,
+at the cost of about two milliseconds per thousand features.
+"""
+
+import importlib
+import os
+import sys
+import time
+
+import numpy as np
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHUNK_SIZE = 1000
+REPEAT = 3
+
+
+def utils():
+    sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+    return importlib.import_module(os.path.basename(PLUGIN_DIR) + ".momepy.utils")
+
+
+def chunk_locality(geometry, chunk_size):
+    import shapely as shp
+
+    bounds = geometry.total_bounds
+    total_area = (bounds[2] - bounds[0]) * (bounds[3] - bounds[1])
+    extents, context = [], 0
+    for start in range(0, len(geometry), chunk_size):
+        extent = shp.box(*geometry.iloc[start : start + chunk_size].total_bounds)
+        extents.append(extent.area / total_area)
+        context += len(geometry.sindex.query(extent))
+    chunks = -(-len(geometry) // chunk_size)
+    return float(np.mean(extents)), context / chunks
+
+
+def split_pairs(graph, chunk_size):
+    adjacency = graph.adjacency.reset_index()
+    adjacency = adjacency[adjacency["focal"] != adjacency["neighbor"]]
+    focal = adjacency["focal"].to_numpy() // chunk_size
+    return float(np.mean(focal != adjacency["neighbor"].to_numpy() // chunk_size))
+
+
+def contiguity(geometry):
+    from libpysal.graph import Graph
+
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        graph = Graph.build_contiguity(geometry, rook=False)
+        timings.append(time.perf_counter() - start)
+    return graph, min(timings)
+
+
+if __name__ == "__main__":
+    import geopandas as gpd
+    import shapely as shp
+    from tessellation import buildings
+
+    module = utils()
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    # Voronoi cells of buildings stand in for a tessellation with neighbours
+    centroids = buildings(side).centroid
+    cells = shp.voronoi_polygons(
+        shp.multipoints(centroids.array), extend_to=shp.box(*centroids.total_bounds)
+    )
+    cells = shp.clip_by_rect(shp.get_parts(cells), *centroids.total_bounds)
+    geometry = gpd.GeoSeries(cells, crs=centroids.crs)
+    rng = np.random.default_rng(0)
+    geometry = geometry.iloc[rng.permutation(len(geometry))].reset_index(drop=True)
+
+    print(
+        f"{'order':<12}{'sort [s]':>10}{'extent':>8}{'context':>9}"
+        f"{'split pairs':>13}{'graph [s]':>11}"
+    )
+    for label, curve in [
+        ("provider", module.PROVIDER_ORDER),
+        ("hilbert", module.HILBERT),
+        ("morton", module.MORTON),
+    ]:
+        elapsed = 0.0
+        ordered = geometry
+        if curve != module.PROVIDER_ORDER:
+            timings = []
+            for _ in range(REPEAT):
+                start = time.perf_counter()
+                order = module.spatial_order(geometry, curve)
+                timings.append(time.perf_counter() - start)
+            elapsed = min(timings)
+            ordered = geometry.iloc[order].reset_index(drop=True)
+        extent, context = chunk_locality(ordered, CHUNK_SIZE)
+        graph, graph_time = contiguity(ordered)
+        print(
+            f"{label:<12}{elapsed:>10.3f}{extent:>8.3f}{context:>9.0f}"
+            f"{split_pairs(graph, CHUNK_SIZE):>13.3f}{graph_time:>11.2f}"
+        )
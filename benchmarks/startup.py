@@ -0,0 +1,59 @@
+"""
+Measure how long loading the plugin takes and what it imports
+
+Run with the Python interpreter of the QGIS installation, e.g.
+
+    python-qgis benchmarks/startup.py
+
+Each measurement runs in a fresh interpreter so that nothing is cached in
+sys.modules. The script reports the time needed to import the provider and
+instantiate all algorithms (what QGIS does at startup), which heavy modules
+that pulled in, and for comparison the time needed to import the scientific
+stack the algorithms use.
+"""
+
+import os
+import subprocess
+import sys
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["momepy", "geopandas", "shapely", "numpy", "pandas", "libpysal"]
+REPEAT = 5
+
+LOAD_PLUGIN = f"""
+import importlib, sys, time
+sys.path.insert(0, {os.path.dirname(PLUGIN_DIR)!r})
+start = time.perf_counter()
+provider = importlib.import_module(
+    {os.path.basename(PLUGIN_DIR)!r} + ".momepy.momepyProvider"
+).MomepyProvider()
+provider.getAlgorithms()
+elapsed = time.perf_counter() - start
+loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print(elapsed, ",".join(loaded))
+"""
+
+LOAD_STACK = """
+import time
+start = time.perf_counter()
+import momepy, geopandas, shapely, libpysal.graph
+print(time.perf_counter() - start, "")
+"""
+
+
+def measure(code):
+    timings = []
+    for _ in range(REPEAT):
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout.split()
+        timings.append(float(output[0]))
+    return min(timings), output[1] if len(output) > 1 else ""
+
+
+if __name__ == "__main__":
+    plugin_time, loaded = measure(LOAD_PLUGIN)
+    stack_time, _ = measure(LOAD_STACK)
+    print(f"Plugin load (provider + algorithms): {plugin_time:.3f} s")
+    print(f"Heavy modules imported at load: {loaded or 'none'}")
+    print(f"Scientific stack import, deferred to first run: {stack_time:.3f} s")
@@ -0,0 +1,112 @@
+"""
+Measure the speed and accuracy trade-off of morphological tessellation options
+
+Run with the Python interpreter of the QGIS installation, e.g.
+
+    python-qgis benchmarks/tessellation.py [number of buildings per side]
+
+Buildings are synthetic: a jittered grid of rotated rectangles with randomly
+notched corners, so that boundaries have a realistic number of vertices. Each
+configuration mirrors the parameters of the Morphological tessellation
+algorithm (segment, simplify and the precision grid of the conversion
+parameters) and reports the best runtime, the number of cells and the mean
+absolute difference of cell areas from the default configuration.
+
+Results for 40 x 40 buildings on a laptop:
+
+    configuration             time [s]   cells  speedup  area diff [m2]
+    default                       2.27    1600     1.0x           0.000
+    no simplification             1.94    1600     1.2x           0.096
+    segment 1                     1.18    1600     1.9x           0.218
+    segment 2                     0.82    1600     2.8x           0.760
+    segment 2, grid 0.1           0.74    1600     3.1x           0.898
+    segment 4                     0.61    1600     3.7x           2.744
+
+Cells cover about 256 m2 each, so a segment of 2 m with a 10 cm grid runs 3x
+faster while changing cell areas by about 0.35 %. The number of cells does
+not change, as there is one cell per building.
+"""
+
+import sys
+import time
+
+import numpy as np
+
+REPEAT = 3
+CONFIGURATIONS = [
+    ("default", {}, None),
+    ("no simplification", {"simplify": False}, None),
+    ("segment 1", {"segment": 1.0}, None),
+    ("segment 2", {"segment": 2.0}, None),
+    ("segment 2, grid 0.1", {"segment": 2.0}, 0.1),
+    ("segment 4", {"segment": 4.0}, None),
+]
+
+
+def buildings(side, seed=0):
+    import geopandas as gpd
+    import shapely as shp
+    from shapely import affinity
+
+    rng = np.random.default_rng(seed)
+    polygons = []
+    for x in range(side):
+        for y in range(side):
+            width, depth = rng.uniform(5, 10, 2)
+            polygon = shp.box(0, 0, width, depth)
+            # Cut a notch overlapping one corner to get an L-shaped footprint
+            notch_width, notch_depth = rng.uniform(1, 3, 2)
+            right, top = rng.integers(2, size=2)
+            notch = shp.box(
+                width - notch_width if right else -1,
+                depth - notch_depth if top else -1,
+                width + 1 if right else notch_width,
+                depth + 1 if top else notch_depth,
+            )
+            polygon = polygon.difference(notch)
+            polygon = affinity.rotate(polygon, rng.uniform(-15, 15))
+            polygons.append(
+                affinity.translate(
+                    polygon, x * 16 + rng.uniform(-1, 1), y * 16 + rng.uniform(-1, 1)
+                )
+            )
+    return gpd.GeoSeries(polygons, crs="EPSG:3857")
+
+
+def measure(geometry, limit, options, grid_size):
+    import momepy
+    import shapely as shp
+
+    if grid_size:
+        geometry = geometry.set_precision(grid_size)
+        limit = limit.set_precision(grid_size)
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        cells = momepy.morphological_tessellation(geometry, clip=limit, **options)
+        timings.append(time.perf_counter() - start)
+    return min(timings), shp.area(cells.geometry.reindex(geometry.index).array)
+
+
+if __name__ == "__main__":
+    import geopandas as gpd
+    import momepy
+
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    geometry = buildings(side)
+    limit = gpd.GeoSeries([momepy.buffered_limit(geometry, 20)], crs=geometry.crs)
+
+    print(
+        f"{'configuration':<24}{'time [s]':>10}{'cells':>8}"
+        f"{'speedup':>9}{'area diff [m2]':>16}"
+    )
+    baseline_time = baseline_area = None
+    for label, options, grid_size in CONFIGURATIONS:
+        elapsed, area = measure(geometry, limit, options, grid_size)
+        if baseline_time is None:
+            baseline_time, baseline_area = elapsed, area
+        difference = np.nanmean(np.abs(area - baseline_area))
+        print(
+            f"{label:<24}{elapsed:>10.2f}{np.isfinite(area).sum():>8}"
+            f"{baseline_time / elapsed:>8.1f}x{difference:>16.3f}"
+        )
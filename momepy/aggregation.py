@@ -0,0 +1,446 @@
+from .output import add_file_output_parameters, check_sink, write_file
+from .utils import qgs_to_gpd, add_conversion_parameters, conversion_options
+from PyQt5.QtCore import QVariant
+from qgis.core import (
+    QgsField,
+    QgsFields,
+    QgsFeature,
+    QgsGeometry,
+    QgsWkbTypes,
+    QgsProcessing,
+    QgsFeatureSink,
+    QgsProcessingAlgorithm,
+    QgsProcessingException,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterField,
+    QgsProcessingParameterNumber,
+)
+
+SQUARE, HEXAGON = range(2)
+CENTROID, OVERLAY = range(2)
+STATISTICS = ["mean", "std", "min", "max", "median", "sum"]
+
+
+def _hexagon_radius(size):
+    """Circumradius of pointy-top hexagons size apart."""
+    return size / 3**0.5
+
+
+def _cell_index(x, y, size, grid):
+    """
+    Find the cells of a grid containing points
+
+    Grids are anchored at the origin of the CRS, so that grids of the same
+    size line up across runs and layers. Hexagons are pointy-top, indexed by
+    their axial coordinates.
+
+    Parameters:
+    -----------
+    x, y : np.ndarray
+        Coordinates of points
+    size : float
+        Side of squares or distance between centres of hexagons
+    grid : int
+        SQUARE or HEXAGON
+
+    Returns:
+    --------
+    np.ndarray, np.ndarray
+        Integer column and row of cells
+    """
+    import numpy as np
+
+    if grid == SQUARE:
+        column = np.floor(x / size).astype(np.int64)
+        row = np.floor(y / size).astype(np.int64)
+        return column, row
+
+    # Fractional cube coordinates rounded to the nearest hexagon
+    radius = _hexagon_radius(size)
+    q = (3**0.5 / 3 * x - y / 3) / radius
+    r = 2 / 3 * y / radius
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq[fix_q] = -rr[fix_q] - rs[fix_q]
+    rr[fix_r] = -rq[fix_r] - rs[fix_r]
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+def _cell_polygons(column, row, size, grid):
+    """Polygons of grid cells, see _cell_index."""
+    import numpy as np
+    import shapely as shp
+
+    if grid == SQUARE:
+        return shp.box(
+            column * size, row * size, (column + 1) * size, (row + 1) * size
+        )
+
+    radius = _hexagon_radius(size)
+    centre_x = radius * 3**0.5 * (column + row / 2)
+    centre_y = radius * 1.5 * row
+    angles = np.radians(30 + 60 * np.arange(7))
+    coordinates = np.stack(
+        [
+            centre_x[:, None] + radius * np.cos(angles),
+            centre_y[:, None] + radius * np.sin(angles),
+        ],
+        axis=-1,
+    )
+    return shp.polygons(coordinates)
+
+
+def _candidate_cells(bounds, size, grid):
+    """
+    Enumerate cells which may intersect bounding boxes
+
+    Parameters:
+    -----------
+    bounds : np.ndarray
+        Bounding boxes of geometries, one row of minx, miny, maxx, maxy each
+    size : float
+        Side of squares or distance between centres of hexagons
+    grid : int
+        SQUARE or HEXAGON
+
+    Returns:
+    --------
+    np.ndarray, np.ndarray, np.ndarray
+        Position of the geometry, column and row of each candidate cell
+    """
+    import numpy as np
+
+    if grid == SQUARE:
+        first_column, first_row = _cell_index(bounds[:, 0], bounds[:, 1], size, grid)
+        last_column, last_row = _cell_index(bounds[:, 2], bounds[:, 3], size, grid)
+    else:
+        # Rows of hexagons are shifted by half a cell, cover the bounds with a
+        # range of axial coordinates one cell wider on each side
+        radius = _hexagon_radius(size)
+        first_row = np.floor(bounds[:, 1] / (1.5 * radius)).astype(np.int64) - 1
+        last_row = np.ceil(bounds[:, 3] / (1.5 * radius)).astype(np.int64) + 1
+        first_column = np.floor(bounds[:, 0] / size - last_row / 2).astype(np.int64)
+        last_column = np.ceil(bounds[:, 2] / size - first_row / 2).astype(np.int64)
+        first_column -= 1
+        last_column += 1
+
+    columns = last_column - first_column + 1
+    counts = columns * (last_row - first_row + 1)
+    position = np.repeat(np.arange(len(bounds)), counts)
+    offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    column = first_column[position] + offset % columns[position]
+    row = first_row[position] + offset // columns[position]
+    return position, column, row
+
+
+def _grouped_statistics(group, values, weights, n_groups, statistics):
+    """
+    Weighted statistics of values by group
+
+    Sums are reduced with np.bincount, order statistics by sorting values
+    within groups once.
+
+    Parameters:
+    -----------
+    group : np.ndarray
+        Group of each value
+    values : np.ndarray
+        Values, NaN are skipped
+    weights : np.ndarray
+        Weight of each value
+    n_groups : int
+        Number of groups
+    statistics : list of str
+        Names of statistics, see STATISTICS
+
+    Returns:
+    --------
+    dict
+        Array of n_groups values by name of statistic, NaN for groups without
+        values
+    """
+    import numpy as np
+
+    present = ~np.isnan(values)
+    group, values, weights = group[present], values[present], weights[present]
+
+    total = np.bincount(group, weights=weights, minlength=n_groups)
+    weighted_sum = np.bincount(group, weights=weights * values, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = weighted_sum / total
+    empty = np.bincount(group, minlength=n_groups) == 0
+
+    results = {}
+    if "mean" in statistics:
+        results["mean"] = mean
+    if "sum" in statistics:
+        results["sum"] = np.where(empty, np.nan, weighted_sum)
+    if "std" in statistics:
+        squares = weights * (values - mean[group]) ** 2
+        with np.errstate(invalid="ignore", divide="ignore"):
+            results["std"] = np.sqrt(
+                np.bincount(group, weights=squares, minlength=n_groups) / total
+            )
+
+    if {"min", "max", "median"} & set(statistics):
+        order = np.lexsort((values, group))
+        sorted_group, sorted_values = group[order], values[order]
+        starts = np.searchsorted(sorted_group, np.arange(n_groups), side="left")
+        stops = np.searchsorted(sorted_group, np.arange(n_groups), side="right")
+        found = stops > starts
+        for name, positions in [("min", starts), ("max", stops - 1)]:
+            if name in statistics:
+                results[name] = np.full(n_groups, np.nan)
+                results[name][found] = sorted_values[positions[found]]
+        if "median" in statistics:
+            # First value reaching half of the weight of its group
+            cumulative = np.cumsum(weights[order])
+            before = np.concatenate([[0], cumulative])[starts]
+            half = before + total / 2
+            positions = np.searchsorted(cumulative, half[found], side="left")
+            results["median"] = np.full(n_groups, np.nan)
+            results["median"][found] = sorted_values[
+                np.minimum(positions, stops[found] - 1)
+            ]
+
+    return results
+
+
+class GridAggregation(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    OUTPUT = "OUTPUT"
+    FIELDS = "FIELDS"
+    GRID = "GRID"
+    CELL_SIZE = "CELL_SIZE"
+    METHOD = "METHOD"
+    STATISTICS = "STATISTICS"
+
+    GRID_OPTIONS = ["Squares", "Hexagons"]
+    METHOD_OPTIONS = ["Centroid in cell", "Area-weighted overlay"]
+
+    def name(self) -> str:
+        return "grid_aggregation"
+
+    def displayName(self) -> str:
+        return "Grid aggregation"
+
+    def group(self) -> str:
+        return "Aggregation"
+
+    def groupId(self) -> str:
+        return "aggregation"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Aggregates characters of features to a regular grid of squares or "
+            "hexagons, anchored at the origin of the CRS. Features are assigned "
+            "to the cell containing their centroid, or split among cells they "
+            "overlap by their share of area (length for lines). Each cell gets "
+            "the number of features and the chosen statistics of each field, "
+            "weighted by the shares. Split among cells, polygons also give the "
+            "share of each cell they cover."
+        )
+
+    def initAlgorithm(self, configuration=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT,
+                "Input layer",
+                [QgsProcessing.SourceType.VectorAnyGeometry],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.FIELDS,
+                "Fields to aggregate",
+                parentLayerParameterName=self.INPUT,
+                type=QgsProcessingParameterField.Numeric,
+                allowMultiple=True,
+                optional=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.GRID,
+                "Grid",
+                options=self.GRID_OPTIONS,
+                defaultValue=SQUARE,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.CELL_SIZE,
+                "Side of squares or distance between centres of hexagons",
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=100.0,
+                minValue=0.0,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.METHOD,
+                "Assignment of features to cells",
+                options=self.METHOD_OPTIONS,
+                defaultValue=CENTROID,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.STATISTICS,
+                "Statistics",
+                options=STATISTICS,
+                allowMultiple=True,
+                defaultValue=[0],
+            )
+        )
+
+        add_conversion_parameters(self)
+
+        add_file_output_parameters(self)
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT,
+                "Grid aggregation",
+                optional=True,
+                createByDefault=True,
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        import numpy as np
+        import geopandas as gpd
+        import shapely as shp
+
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        field_names = self.parameterAsFields(parameters, self.FIELDS, context)
+        grid = self.parameterAsEnum(parameters, self.GRID, context)
+        size = self.parameterAsDouble(parameters, self.CELL_SIZE, context)
+        method = self.parameterAsEnum(parameters, self.METHOD, context)
+        statistics = [
+            STATISTICS[option]
+            for option in self.parameterAsEnums(parameters, self.STATISTICS, context)
+        ]
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        if size <= 0:
+            raise QgsProcessingException("Cell size must be greater than 0.")
+
+        # Convert QGIS source to GeoDataFrame, the grid is laid out in its CRS
+        geometry_dataframe = qgs_to_gpd(
+            source, attribute_fields=field_names, layer=layer, **conversion
+        )
+        geometry_dataframe = geometry_dataframe[
+            geometry_dataframe.geometry.notna() & ~geometry_dataframe.is_empty
+        ]
+        geometries = geometry_dataframe.geometry.array
+        geometry_type = QgsWkbTypes.geometryType(source.wkbType())
+        polygonal = geometry_type == QgsWkbTypes.PolygonGeometry
+        points = geometry_type == QgsWkbTypes.PointGeometry
+
+        if method == CENTROID or points:
+            # Integer binning of centroids, each feature in a single cell
+            x, y = shp.get_coordinates(shp.centroid(geometries)).T
+            column, row = _cell_index(x, y, size, grid)
+            position = np.arange(len(geometries))
+            weights = np.ones(len(geometries))
+        else:
+            # Split features among the candidate cells of their bounding boxes
+            position, column, row = _candidate_cells(
+                shp.bounds(geometries), size, grid
+            )
+            parts = shp.intersection(
+                geometries[position], _cell_polygons(column, row, size, grid)
+            )
+            measure = shp.area if polygonal else shp.length
+            covered = measure(parts)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                weights = covered / measure(geometries)[position]
+            keep = covered > 0
+            position, column, row = position[keep], column[keep], row[keep]
+            weights, covered = weights[keep], covered[keep]
+        feedback.setProgress(50)
+
+        # Number the occupied cells
+        cells = np.stack([column, row], axis=1)
+        cells, group = np.unique(cells, axis=0, return_inverse=True)
+        group = group.ravel()
+        n_cells = len(cells)
+        polygons = _cell_polygons(cells[:, 0], cells[:, 1], size, grid)
+
+        columns = {
+            "count": np.bincount(group, weights=weights, minlength=n_cells),
+        }
+        # Whole polygons binned by centroid may exceed their cell
+        if polygonal and method != CENTROID:
+            columns["coverage"] = np.bincount(
+                group, weights=covered, minlength=n_cells
+            ) / shp.area(polygons)
+        for field_name in field_names:
+            values = geometry_dataframe[field_name].to_numpy(
+                dtype=np.float64, na_value=np.nan
+            )
+            grouped = _grouped_statistics(
+                group, values[position], weights, n_cells, statistics
+            )
+            for statistic in statistics:
+                columns[f"{field_name}_{statistic}"] = grouped[statistic]
+
+        cell_dataframe = gpd.GeoDataFrame(
+            columns, geometry=polygons, crs=geometry_dataframe.crs
+        )
+        if conversion["crs"] is not None:
+            cell_dataframe = cell_dataframe.to_crs(source.sourceCrs().toWkt())
+        feedback.pushInfo(f"{len(geometries)} features aggregated to {n_cells} cells.")
+        results = write_file(
+            self, parameters, context, feedback, cell_dataframe, source.sourceCrs()
+        )
+
+        fields = QgsFields()
+        for name in columns:
+            fields.append(QgsField(name, QVariant.Double))
+
+        # Create sink
+        (sink, dest_id) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT,
+            context,
+            fields,
+            QgsWkbTypes.Polygon,
+            source.sourceCrs(),
+        )
+        if not check_sink(self, parameters, sink, results):
+            return results
+
+        total = 50.0 / n_cells if n_cells else 0
+        rows = cell_dataframe[list(columns)].itertuples(index=False, name=None)
+        for current, (row_values, polygon) in enumerate(
+            zip(rows, cell_dataframe.geometry.array)
+        ):
+            if feedback.isCanceled():
+                break
+
+            feature = QgsFeature(fields)
+            feature.setGeometry(QgsGeometry.fromWkt(polygon.wkt))
+            feature.setAttributes(
+                [None if value != value else float(value) for value in row_values]
+            )
+            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+
+            feedback.setProgress(50 + int(current * total))
+
+        results[self.OUTPUT] = dest_id
+        return results
+
+    def createInstance(self):
+        return self.__class__()
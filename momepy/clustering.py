@@ -0,0 +1,427 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+
+from .output import FILE_OUTPUT, add_output_parameters, write_results
+from .planning import add_memory_parameter, memory_budget
+from .utils import qgs_to_gpd
+from PyQt5.QtCore import QVariant
+from qgis.core import (
+    QgsField,
+    QgsFeatureRequest,
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingException,
+    QgsProcessingOutputNumber,
+    QgsProcessingParameterDefinition,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterField,
+    QgsProcessingParameterNumber,
+    QgsProcessingUtils,
+)
+
+KMEANS, GAUSSIAN_MIXTURE = range(2)
+# Seed of the random sample and of the models, for repeatable clusters
+RANDOM_STATE = 0
+
+
+def _read_values(source, field_names, batch_size, budget, folder, feedback):
+    """
+    Read complete rows of numeric fields and their mean and standard deviation
+
+    Values are read without geometry in batches, stored as single precision
+    floats and summarised as they are read. Rows with a missing value are
+    skipped. If the values would not fit into the memory budget, they are
+    stored in a file in folder mapped to memory.
+
+    Parameters:
+    -----------
+    source : QgsProcessingFeatureSource
+        Source to read
+    field_names : list of str
+        Numeric fields
+    batch_size : int
+        Number of rows converted at once
+    budget : int or None
+        Memory budget in bytes
+    folder : str
+        Temporary folder of the file, deleted by the caller
+    feedback : QgsProcessingFeedback
+        Processing feedback
+
+    Returns:
+    --------
+    np.ndarray, np.ndarray, np.ndarray, np.ndarray
+        Values of complete rows, positions of the rows among source features,
+        mean and standard deviation of each field
+    """
+    import numpy as np
+    import pandas as pd
+
+    count = source.featureCount()
+    shape = (count, len(field_names))
+    if budget is not None and count * len(field_names) * 4 > budget:
+        path = os.path.join(folder, "values.dat")
+        feedback.pushInfo(
+            f"Values do not fit into the memory budget, mapping them from {path}."
+        )
+        values = np.memmap(path, dtype=np.float32, mode="w+", shape=shape)
+    else:
+        values = np.empty(shape, dtype=np.float32)
+    positions = np.empty(count, dtype=np.int64)
+
+    indices = [source.fields().lookupField(name) for name in field_names]
+    request = QgsFeatureRequest()
+    request.setFlags(QgsFeatureRequest.NoGeometry)
+    request.setSubsetOfAttributes(indices)
+
+    # Running sums per field, merged batch by batch
+    n_rows = 0
+    mean = np.zeros(len(field_names))
+    squares = np.zeros(len(field_names))
+    rows = []
+    total = 100.0 / count if count else 0
+
+    def add_batch(rows, start):
+        nonlocal n_rows, mean, squares
+        batch = pd.DataFrame(rows).apply(pd.to_numeric, errors="coerce")
+        batch = batch.to_numpy(dtype=np.float64)
+        complete = ~np.isnan(batch).any(axis=1)
+        batch = batch[complete]
+        stop = n_rows + len(batch)
+        values[n_rows:stop] = batch
+        positions[n_rows:stop] = start + np.flatnonzero(complete)
+
+        if len(batch):
+            batch_mean = batch.mean(axis=0)
+            delta = batch_mean - mean
+            mean = mean + delta * len(batch) / stop
+            squares += ((batch - batch_mean) ** 2).sum(axis=0)
+            squares += delta**2 * n_rows * len(batch) / stop
+        n_rows = stop
+
+    start = 0
+    for current, feature in enumerate(source.getFeatures(request)):
+        if feedback.isCanceled():
+            break
+        attributes = feature.attributes()
+        rows.append([attributes[index] for index in indices])
+        if len(rows) == batch_size:
+            add_batch(rows, start)
+            start = current + 1
+            rows = []
+            feedback.setProgress(int(current * total))
+    if rows:
+        add_batch(rows, start)
+
+    std = np.sqrt(squares / n_rows) if n_rows else squares
+    return values[:n_rows], positions[:n_rows], mean, std
+
+
+def _standardize(values, mean, std, batch_size):
+    """Standardize values in place, batch by batch."""
+    import numpy as np
+
+    scale = np.where(std > 0, std, 1.0)
+    for start in range(0, len(values), batch_size):
+        batch = values[start : start + batch_size]
+        batch -= mean.astype(np.float32)
+        batch /= scale.astype(np.float32)
+
+
+def _fit(method, values, sample, n_clusters, batch_size):
+    """
+    Fit a clustering model and score it on a sample
+
+    Mini-batch K-means is fitted to all rows, drawing mini-batches from them,
+    and scored by the Calinski-Harabasz index of the sample, higher is better.
+    Gaussian mixtures are fitted to the sample and scored by the negative
+    Bayesian information criterion, so that higher is better as well.
+    """
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.metrics import calinski_harabasz_score
+    from sklearn.mixture import GaussianMixture
+
+    if method == KMEANS:
+        model = MiniBatchKMeans(
+            n_clusters=n_clusters,
+            batch_size=batch_size,
+            n_init=3,
+            compute_labels=False,
+            random_state=RANDOM_STATE,
+        ).fit(values)
+        labels = model.predict(sample)
+        if len(set(labels)) < 2:
+            return model, float("-inf")
+        return model, calinski_harabasz_score(sample, labels)
+
+    model = GaussianMixture(n_components=n_clusters, random_state=RANDOM_STATE)
+    model.fit(sample)
+    return model, -model.bic(sample)
+
+
+def _cluster(
+    source,
+    field_names,
+    method,
+    n_clusters,
+    max_clusters,
+    batch_size,
+    sample_size,
+    budget,
+    folder,
+    feedback,
+):
+    """
+    Cluster complete rows of numeric fields, sweeping numbers of clusters
+
+    Parameters:
+    -----------
+    source : QgsProcessingFeatureSource
+        Source to cluster
+    field_names : list of str
+        Numeric fields
+    method : int
+        KMEANS or GAUSSIAN_MIXTURE
+    n_clusters, max_clusters : int
+        Smallest and largest number of clusters fitted
+    batch_size : int
+        Number of rows per mini-batch
+    sample_size : int
+        Number of rows sampled to fit Gaussian mixtures and score clusters
+    budget : int or None
+        Memory budget in bytes
+    folder : str
+        Temporary folder of values not fitting into the budget
+    feedback : QgsProcessingFeedback
+        Processing feedback
+
+    Returns:
+    --------
+    np.ndarray or None, int
+        Cluster of each source feature, NaN for features with missing values,
+        and the number of clusters kept, None if cancelled
+    """
+    import numpy as np
+
+    # Read and standardize complete rows once, all fits reuse them
+    feedback.pushInfo("Reading characters...")
+    values, positions, mean, std = _read_values(
+        source, field_names, batch_size, budget, folder, feedback
+    )
+    if feedback.isCanceled():
+        return None, 0
+    if len(values) <= max_clusters:
+        raise QgsProcessingException(
+            f"{len(values)} features with all characters are too few for "
+            f"{max_clusters} clusters."
+        )
+    for name in np.asarray(field_names)[std == 0]:
+        feedback.pushWarning(f"{name} is constant and does not separate clusters.")
+    _standardize(values, mean, std, batch_size)
+
+    rng = np.random.default_rng(RANDOM_STATE)
+    sample = np.sort(
+        rng.choice(len(values), min(sample_size, len(values)), replace=False)
+    )
+    sample = np.asarray(values[sample])
+
+    # Sweep the numbers of clusters, keeping the best model
+    best_model, best_score = None, float("-inf")
+    for current in range(n_clusters, max_clusters + 1):
+        if feedback.isCanceled():
+            return None, 0
+        model, score = _fit(method, values, sample, current, batch_size)
+        feedback.pushInfo(f"{current} clusters: score {score:.4g}")
+        if best_model is None or score > best_score:
+            best_model, best_score = model, score
+    n_found = best_model.n_clusters if method == KMEANS else best_model.n_components
+    feedback.pushInfo(f"Keeping {n_found} clusters.")
+
+    # Label rows in batches, features with missing values stay NULL
+    labels = np.full(source.featureCount(), np.nan)
+    for start in range(0, len(values), batch_size):
+        stop = start + batch_size
+        labels[positions[start:stop]] = best_model.predict(values[start:stop])
+    return labels, n_found
+
+
+class Clustering(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    OUTPUT = "OUTPUT"
+    FIELDS = "FIELDS"
+    METHOD = "METHOD"
+    CLUSTERS = "CLUSTERS"
+    MAX_CLUSTERS = "MAX_CLUSTERS"
+    MINI_BATCH_SIZE = "MINI_BATCH_SIZE"
+    SAMPLE_SIZE = "SAMPLE_SIZE"
+    CLUSTER_COUNT = "CLUSTER_COUNT"
+
+    METHOD_OPTIONS = ["Mini-batch K-means", "Gaussian mixture"]
+
+    def name(self) -> str:
+        return "clustering"
+
+    def displayName(self) -> str:
+        return "Clustering"
+
+    def group(self) -> str:
+        return "Clustering"
+
+    def groupId(self) -> str:
+        return "clustering"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Classifies features into clusters of similar characters, e.g. "
+            "urban tissue types. Fields are standardized and clustered with "
+            "mini-batch K-means or a Gaussian mixture. With a largest number "
+            "of clusters, each number in the range is fitted to the same data "
+            "and the best one by the Calinski-Harabasz index (K-means) or BIC "
+            "(Gaussian mixture) is kept. Features with a missing value get no "
+            "cluster. Requires scikit-learn."
+        )
+
+    def initAlgorithm(self, configuration=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT,
+                "Input layer",
+                [QgsProcessing.SourceType.Vector],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.FIELDS,
+                "Characters to cluster",
+                parentLayerParameterName=self.INPUT,
+                type=QgsProcessingParameterField.Numeric,
+                allowMultiple=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.METHOD,
+                "Method",
+                options=self.METHOD_OPTIONS,
+                defaultValue=KMEANS,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.CLUSTERS,
+                "Number of clusters",
+                type=QgsProcessingParameterNumber.Integer,
+                defaultValue=8,
+                minValue=2,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.MAX_CLUSTERS,
+                "Largest number of clusters to try, from the number of clusters",
+                type=QgsProcessingParameterNumber.Integer,
+                optional=True,
+                minValue=2,
+            )
+        )
+
+        batch_size = QgsProcessingParameterNumber(
+            self.MINI_BATCH_SIZE,
+            "Number of rows per mini-batch",
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=10000,
+            minValue=100,
+        )
+        batch_size.setFlags(
+            batch_size.flags() | QgsProcessingParameterDefinition.FlagAdvanced
+        )
+        self.addParameter(batch_size)
+
+        sample_size = QgsProcessingParameterNumber(
+            self.SAMPLE_SIZE,
+            "Number of rows sampled to fit Gaussian mixtures and score clusters",
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=100000,
+            minValue=100,
+        )
+        sample_size.setFlags(
+            sample_size.flags() | QgsProcessingParameterDefinition.FlagAdvanced
+        )
+        self.addParameter(sample_size)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Clusters", discrete=True)
+
+        self.addOutput(
+            QgsProcessingOutputNumber(self.CLUSTER_COUNT, "Number of clusters")
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        if importlib.util.find_spec("sklearn") is None:
+            raise QgsProcessingException(
+                "Clustering requires scikit-learn, install it into the Python "
+                "environment of QGIS."
+            )
+
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        field_names = self.parameterAsFields(parameters, self.FIELDS, context)
+        method = self.parameterAsEnum(parameters, self.METHOD, context)
+        n_clusters = self.parameterAsInt(parameters, self.CLUSTERS, context)
+        max_clusters = n_clusters
+        if parameters.get(self.MAX_CLUSTERS) is not None:
+            max_clusters = max(
+                n_clusters,
+                self.parameterAsInt(parameters, self.MAX_CLUSTERS, context),
+            )
+        batch_size = self.parameterAsInt(parameters, self.MINI_BATCH_SIZE, context)
+        sample_size = self.parameterAsInt(parameters, self.SAMPLE_SIZE, context)
+        budget = memory_budget(self, parameters, context)
+
+        # Values not fitting into the budget are mapped from a temporary file
+        folder = tempfile.mkdtemp(dir=QgsProcessingUtils.tempFolder())
+        try:
+            labels, n_found = _cluster(
+                source,
+                field_names,
+                method,
+                n_clusters,
+                max_clusters,
+                batch_size,
+                sample_size,
+                budget,
+                folder,
+                feedback,
+            )
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+        if labels is None:
+            return {}
+
+        # Geometry is only read for the GeoParquet or Arrow file of clusters
+        geometry = None
+        if self.parameterAsFileOutput(parameters, FILE_OUTPUT, context):
+            geometry = qgs_to_gpd(source)
+
+        results = write_results(
+            self,
+            parameters,
+            context,
+            feedback,
+            source,
+            [QgsField("cluster", QVariant.Int)],
+            [labels],
+            geometry=geometry,
+        )
+        results[self.CLUSTER_COUNT] = n_found
+        return results
+
+    def createInstance(self):
+        return self.__class__()
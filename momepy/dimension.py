@@ -1,20 +1,75 @@
-import momepy
-
-from .utils import qgs_to_gpd
+from .output import add_output_parameters, write_results
+from .parallel import WORKERS, add_workers_parameter, map_chunks, map_geometry
+from .planning import (
+    PROFILE_TICK,
+    SHAPE_PROFILE,
+    add_memory_parameter,
+    plan_execution,
+)
+from .streaming import add_stream_parameters, stream_options, tiles
+from .utils import (
+    qgs_to_gpd,
+    add_conversion_parameters,
+    conversion_options,
+    read_sources,
+)
 from PyQt5.QtCore import QVariant
 from qgis.core import (
     QgsField,
-    QgsFeature,
     QgsProcessing,
-    QgsFeatureSink,
     QgsProcessingAlgorithm,
     QgsProcessingParameterFeatureSource,
-    QgsProcessingParameterFeatureSink,
     QgsProcessingParameterField,
     QgsProcessingParameterNumber,
 )
 
 
+def _street_profile_chunk(streets, buildings, height, distance, tick_length, chunk):
+    """
+    Calculate street profile characters of a tile of streets
+
+    Only buildings within reach of the ticks of the tile are passed to
+    momepy, which gives the same results as for all streets at once.
+
+    Parameters:
+    -----------
+    streets : gpd.GeoSeries
+        All streets
+    buildings : gpd.GeoSeries
+        All buildings
+    height : pd.Series or None
+        Height of buildings
+    distance : float
+        Distance between ticks
+    tick_length : float
+        Length of ticks
+    chunk : np.ndarray
+        Positions of the streets of the tile
+
+    Returns:
+    --------
+    gpd.GeoDataFrame
+        Street profile characters and geometry of the streets of the tile
+    """
+    import momepy
+    import numpy as np
+    import geopandas as gpd
+
+    tile = streets.iloc[chunk]
+    _, near = buildings.sindex.query(
+        tile.array, predicate="dwithin", distance=tick_length / 2
+    )
+    near = np.unique(near)
+    profile = momepy.street_profile(
+        tile,
+        buildings.iloc[near],
+        distance,
+        tick_length,
+        None if height is None else height.iloc[near],
+    )
+    return gpd.GeoDataFrame(profile, geometry=tile.array, crs=streets.crs)
+
+
 class Volume(QgsProcessingAlgorithm):
     pass
 
@@ -51,58 +106,48 @@ class CourtyardArea(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(
-            QgsProcessingParameterFeatureSink(self.OUTPUT, "Courtyard area")
-        )
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Courtyard area")
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS source to GeoSeries and calculate courtyard area
-        geometry_series = qgs_to_gpd(source)
-        courtyard_area_series = momepy.courtyard_area(geometry_series)
+        geometry_series = qgs_to_gpd(source, layer=layer, **conversion)
+        courtyard_area_series = map_geometry(
+            momepy.courtyard_area,
+            geometry_series,
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
+        )
         courtyard_area_values = courtyard_area_series.to_list()
 
-        # Create output fields (original fields + new courtyard area field)
-        fields = source.fields()
-        fields.append(QgsField("courtyard_area", QVariant.Double))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new field
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [QgsField("courtyard_area", QVariant.Double)],
+            [courtyard_area_values],
+            geometry=geometry_series,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new courtyard area
-            attributes = feature.attributes()
-            attributes.append(courtyard_area_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
@@ -135,58 +180,48 @@ class LongestAxisLength(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(
-            QgsProcessingParameterFeatureSink(self.OUTPUT, "Longest axis length")
-        )
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Longest axis length")
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS source to GeoSeries and calculate longest axis length
-        geometry_series = qgs_to_gpd(source)
-        lal_series = momepy.longest_axis_length(geometry_series)
+        geometry_series = qgs_to_gpd(source, layer=layer, **conversion)
+        lal_series = map_geometry(
+            momepy.longest_axis_length,
+            geometry_series,
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
+        )
         lal_values = lal_series.to_list()
 
-        # Create output fields (original fields + new longest axis length field)
-        fields = source.fields()
-        fields.append(QgsField("lal", QVariant.Double))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new field
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [QgsField("lal", QVariant.Double)],
+            [lal_values],
+            geometry=geometry_series,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new longest axis length
-            attributes = feature.attributes()
-            attributes.append(lal_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
@@ -216,7 +251,13 @@ class StreetProfile(QgsProcessingAlgorithm):
         return "dimension"
 
     def shortHelpString(self) -> str:
-        return "Calculates the street profile characters."
+        return (
+            "Calculates the street profile characters of each street segment: "
+            "width, openness and width deviation, and with a height field also "
+            "height, height deviation and height to width ratio. Large "
+            "networks are computed in tiles fitting into the memory budget, "
+            "or in chunks shown as they finish."
+        )
 
     def initAlgorithm(self, configuration=None):
         self.addParameter(
@@ -266,13 +307,26 @@ class StreetProfile(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(
-            QgsProcessingParameterFeatureSink(self.OUTPUT, "Street profile")
-        )
+        add_conversion_parameters(self)
+
+        add_stream_parameters(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Street profile", self.INPUT_STREETS)
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+        import numpy as np
+        import pandas as pd
+        from functools import partial
+
         polygon_source = self.parameterAsSource(parameters, self.INPUT, context)
+        polygon_layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
         line_source = self.parameterAsSource(parameters, self.INPUT_STREETS, context)
+        line_layer = self.parameterAsVectorLayer(
+            parameters, self.INPUT_STREETS, context
+        )
         distance_field = self.parameterAsDouble(
             parameters, self.DISTANCE_FIELD, context
         )
@@ -280,62 +334,88 @@ class StreetProfile(QgsProcessingAlgorithm):
             parameters, self.TICK_LENGTH_FIELD, context
         )
         height_field = self.parameterAsString(parameters, self.HEIGHT_FIELD, context)
-
-        # Convert QGIS source to GeoSeries and calculate street profile characters
-        polygon_geometry_series = qgs_to_gpd(polygon_source)
-        line_geometry_series = qgs_to_gpd(line_source)
-        street_profile_series = momepy.street_profile(
-            line_geometry_series,
-            polygon_geometry_series,
-            distance_field,
-            tick_length_field,
-            height_field,
+        conversion = conversion_options(
+            self, parameters, context, feedback, line_source
         )
-        street_profile_values = street_profile_series.to_list()
-
-        # Create output fields (original fields + new street profile field)
-        fields = polygon_source.fields()
-        fields.append(QgsField("courtyard_area", QVariant.Double))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        preview, chunk_size = stream_options(self, parameters, context, feedback)
+        # Ticks on both sides of streets every distance
+        tick_bytes = 2 * PROFILE_TICK / distance_field if distance_field > 0 else 0
+        tile_size = plan_execution(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            polygon_source.wkbType(),
-            polygon_source.sourceCrs(),
+            feedback,
+            line_source,
+            (0, 0, tick_bytes),
+            tiled=True,
         )
-
-        # Get features from source
-        features = polygon_source.getFeatures()
-        total = (
-            100.0 / polygon_source.featureCount()
-            if polygon_source.featureCount()
-            else 0
+        if tile_size is not None:
+            chunk_size = tile_size if preview is None else min(chunk_size, tile_size)
+
+        # Convert QGIS sources to GeoSeries and calculate street profile characters
+        height_fields = [height_field] if height_field else None
+        polygon_dataframe, line_geometry_series = read_sources(
+            [
+                (polygon_source, polygon_layer, height_fields),
+                (line_source, line_layer, None),
+            ],
+            **conversion,
         )
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
+        polygon_geometry_series = polygon_dataframe.geometry
+        height = None
+        if height_field:
+            height = polygon_dataframe[height_field].astype(float)
+        if preview is None and tile_size is None:
+            street_profile_dataframe = momepy.street_profile(
+                line_geometry_series,
+                polygon_geometry_series,
+                distance_field,
+                tick_length_field,
+                height,
+            )
+        else:
+            # Calculate tiles of streets, shown as they finish if streaming
+            chunk_profile = partial(
+                _street_profile_chunk,
+                line_geometry_series,
+                polygon_geometry_series,
+                height,
+                distance_field,
+                tick_length_field,
+            )
+            profiles = map_chunks(
+                chunk_profile,
+                tiles(line_geometry_series, chunk_size),
+                feedback=feedback,
+                callback=None if preview is None else preview.add,
+            )
+            profiles = [chunk for chunk in profiles if chunk is not None]
             if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new street profile
-            attributes = feature.attributes()
-            attributes.append(street_profile_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
+                feedback.pushWarning(
+                    f"Cancelled, writing {len(profiles)} finished chunks only."
+                )
+            # Streets of unfinished chunks get NULL values
+            street_profile_dataframe = (
+                pd.concat(profiles or [chunk_profile(np.arange(0))])
+                .drop(columns="geometry")
+                .reindex(line_geometry_series.index)
+            )
 
-        return {self.OUTPUT: dest_id}
+        # Write the new fields, street profile is a character of streets
+        return write_results(
+            self,
+            parameters,
+            context,
+            feedback,
+            line_source,
+            [
+                QgsField(column, QVariant.Double)
+                for column in street_profile_dataframe.columns
+            ],
+            [street_profile_dataframe[column] for column in street_profile_dataframe],
+            input_name=self.INPUT_STREETS,
+            geometry=line_geometry_series,
+        )
 
     def createInstance(self):
         return self.__class__()
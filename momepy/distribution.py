@@ -0,0 +1,660 @@
+from .output import add_output_parameters, write_results
+from .utils import (
+    qgs_to_gpd,
+    add_conversion_parameters,
+    conversion_options,
+    nearest_street,
+    read_sources,
+)
+from PyQt5.QtCore import QVariant
+from qgis.core import (
+    QgsField,
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterField,
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterEnum,
+)
+
+
+def _orientation(geometry):
+    """
+    Orientation of polygons and lines, including multipart lines
+
+    momepy orients lines by their first and last point, which multipart lines
+    do not have. Their parts are merged where they connect and lines which
+    stay multipart are represented by their longest part.
+
+    Parameters:
+    -----------
+    geometry : gpd.GeoSeries
+        Polygons or lines
+
+    Returns:
+    --------
+    pd.Series
+        Orientation in degrees, indexed as geometry
+    """
+    import geopandas as gpd
+    import momepy
+    import numpy as np
+    import pandas as pd
+    import shapely as shp
+
+    values = np.asarray(geometry.array, dtype=object)
+    multi = shp.get_type_id(values) == 5
+    multi &= ~shp.is_empty(values)
+    if multi.any():
+        values = values.copy()
+        merged = shp.line_merge(values[multi])
+        parted = shp.get_type_id(merged) == 5
+        if parted.any():
+            parts, part_index = shp.get_parts(merged[parted], return_index=True)
+            longest = pd.Series(shp.length(parts)).groupby(part_index).idxmax()
+            merged[parted] = parts[longest.to_numpy()]
+        values[multi] = merged
+        geometry = gpd.GeoSeries(values, index=geometry.index, crs=geometry.crs)
+    return momepy.orientation(geometry)
+
+
+def _neighbour_alignment(orientation, neighbours):
+    """
+    Mean absolute deviation of orientation from the orientation of neighbours
+
+    Computed over the sparse adjacency matrix of the graph at once instead of
+    grouping neighbours of each element.
+
+    Parameters:
+    -----------
+    orientation : np.ndarray
+        Orientation of elements in the order of the graph
+    neighbours : libpysal.graph.Graph
+        Graph of neighbouring elements
+
+    Returns:
+    --------
+    np.ndarray
+        0 for elements without neighbours, as in momepy.alignment
+    """
+    import numpy as np
+
+    adjacency = neighbours.sparse.tocoo()
+    # Isolates are stored as zero-weight self-loops
+    mask = adjacency.data != 0
+    row, col = adjacency.row[mask], adjacency.col[mask]
+
+    deviation = np.abs(orientation[row] - orientation[col])
+    total = np.bincount(row, weights=deviation, minlength=len(orientation))
+    count = np.bincount(row, minlength=len(orientation))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, 0.0)
+
+
+def _spatial_lag(values, neighbours, include_self=False):
+    """
+    Mean of values of neighbours for all columns at once
+
+    The sparse adjacency matrix multiplies the dense matrix of all columns in
+    a single product. Missing values are left out of the mean of their
+    neighbours by a second product counting the present ones.
+
+    Parameters:
+    -----------
+    values : np.ndarray
+        Values of elements in the order of the graph, one column per
+        character
+    neighbours : libpysal.graph.Graph
+        Graph of neighbouring elements
+    include_self : bool
+        Whether each element is part of its own neighbourhood
+
+    Returns:
+    --------
+    np.ndarray
+        NaN for elements without neighbours with a value
+    """
+    import numpy as np
+
+    adjacency = neighbours.sparse.tocsr()
+    # Isolates are stored as zero-weight self-loops, weights are binary
+    adjacency.eliminate_zeros()
+    adjacency.data[:] = 1.0
+    if include_self:
+        adjacency = adjacency.tolil()
+        adjacency.setdiag(1.0)
+        adjacency = adjacency.tocsr()
+
+    present = ~np.isnan(values)
+    total = adjacency @ np.where(present, values, 0.0)
+    count = adjacency @ present.astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return total / count
+
+
+def _standardize(values):
+    """Z-scores of columns, ignoring missing values."""
+    import numpy as np
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (values - np.nanmean(values, axis=0)) / np.nanstd(values, axis=0)
+
+
+class Orientation(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    OUTPUT = "OUTPUT"
+
+    def name(self) -> str:
+        return "orientation"
+
+    def displayName(self) -> str:
+        return "Orientation"
+
+    def group(self) -> str:
+        return "Distribution"
+
+    def groupId(self) -> str:
+        return "distribution"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Calculates the deviation of orientation of the minimum rotated "
+            "rectangle of each object from cardinal directions (0-45 degrees). "
+            "Lines are represented by the line connecting their first and last "
+            "point. Parts of multipart lines are merged where they connect, "
+            "otherwise the longest part is used."
+        )
+
+    def initAlgorithm(self, configuration=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT,
+                "Input layer",
+                [
+                    QgsProcessing.SourceType.VectorPolygon,
+                    QgsProcessing.SourceType.VectorLine,
+                ],
+            )
+        )
+
+        add_conversion_parameters(self)
+
+        add_output_parameters(self, "Orientation")
+
+    def processAlgorithm(self, parameters, context, feedback):
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+
+        # Convert QGIS source to GeoSeries and calculate orientation
+        geometry_series = qgs_to_gpd(source, layer=layer, **conversion)
+        orientation_series = _orientation(geometry_series)
+        orientation_values = orientation_series.to_list()
+
+        # Write the new field
+        return write_results(
+            self,
+            parameters,
+            context,
+            feedback,
+            source,
+            [QgsField("orientation", QVariant.Double)],
+            [orientation_values],
+            geometry=geometry_series,
+        )
+
+    def createInstance(self):
+        return self.__class__()
+
+
+class StreetAlignment(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    INPUT_STREETS = "INPUT_STREETS"
+    OUTPUT = "OUTPUT"
+    MAX_DISTANCE = "MAX_DISTANCE"
+
+    def name(self) -> str:
+        return "street_alignment"
+
+    def displayName(self) -> str:
+        return "Street alignment"
+
+    def group(self) -> str:
+        return "Distribution"
+
+    def groupId(self) -> str:
+        return "distribution"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Calculates the deviation of orientation of each object from the "
+            "orientation of its nearest street."
+        )
+
+    def initAlgorithm(self, configuration=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT,
+                "Input layer",
+                [QgsProcessing.SourceType.VectorPolygon],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT_STREETS,
+                "Input street layer",
+                [QgsProcessing.SourceType.VectorLine],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.MAX_DISTANCE,
+                "Maximum distance to search for a street, 0 for no limit",
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0.0,
+                minValue=0.0,
+                optional=True,
+            )
+        )
+
+        add_conversion_parameters(self)
+
+        add_output_parameters(self, "Street alignment")
+
+    def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+        import numpy as np
+
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        street_source = self.parameterAsSource(parameters, self.INPUT_STREETS, context)
+        street_layer = self.parameterAsVectorLayer(
+            parameters, self.INPUT_STREETS, context
+        )
+        max_distance = (
+            self.parameterAsDouble(parameters, self.MAX_DISTANCE, context) or None
+        )
+        conversion = conversion_options(self, parameters, context, feedback, source)
+
+        # Convert QGIS sources to GeoSeries and calculate orientations
+        geometry_series, street_series = read_sources(
+            [(source, layer, None), (street_source, street_layer, None)], **conversion
+        )
+        orientation = momepy.orientation(geometry_series).to_numpy()
+        street_orientation = _orientation(street_series)
+
+        # Compare with the orientation of the nearest street
+        street_index, _ = nearest_street(geometry_series, street_series, max_distance)
+        found = ~np.isnan(street_index)
+        street_alignment_values = np.full(len(geometry_series), np.nan)
+        street_alignment_values[found] = np.abs(
+            orientation[found]
+            - street_orientation.loc[street_index[found].astype(np.int64)].to_numpy()
+        )
+
+        # Write the new field
+        return write_results(
+            self,
+            parameters,
+            context,
+            feedback,
+            source,
+            [QgsField("street_alignment", QVariant.Double)],
+            [street_alignment_values],
+            geometry=geometry_series,
+        )
+
+    def createInstance(self):
+        return self.__class__()
+
+
+class CellAlignment(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    INPUT_TESSELLATION = "INPUT_TESSELLATION"
+    OUTPUT = "OUTPUT"
+
+    def name(self) -> str:
+        return "cell_alignment"
+
+    def displayName(self) -> str:
+        return "Cell alignment"
+
+    def group(self) -> str:
+        return "Distribution"
+
+    def groupId(self) -> str:
+        return "distribution"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Calculates the deviation of orientation of each building from the "
+            "orientation of its tessellation cell. Cells are matched to "
+            "buildings by location."
+        )
+
+    def initAlgorithm(self, configuration=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT,
+                "Input buildings layer",
+                [QgsProcessing.SourceType.VectorPolygon],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT_TESSELLATION,
+                "Input tessellation layer",
+                [QgsProcessing.SourceType.VectorPolygon],
+            )
+        )
+
+        add_conversion_parameters(self)
+
+        add_output_parameters(self, "Cell alignment")
+
+    def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+        import numpy as np
+        import shapely as shp
+
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        tessellation_source = self.parameterAsSource(
+            parameters, self.INPUT_TESSELLATION, context
+        )
+        tessellation_layer = self.parameterAsVectorLayer(
+            parameters, self.INPUT_TESSELLATION, context
+        )
+        conversion = conversion_options(self, parameters, context, feedback, source)
+
+        # Convert QGIS sources to GeoSeries and calculate orientations
+        geometry_series, tessellation_series = read_sources(
+            [
+                (source, layer, None),
+                (tessellation_source, tessellation_layer, None),
+            ],
+            **conversion,
+        )
+        orientation = momepy.orientation(geometry_series).to_numpy()
+        cell_orientation = momepy.orientation(tessellation_series).to_numpy()
+
+        # Match each building to the cell containing its representative point
+        # with a single bulk query
+        tree = shp.STRtree(tessellation_series.array)
+        building_idx, cell_idx = tree.query(
+            shp.point_on_surface(geometry_series.array), predicate="intersects"
+        )
+        building_idx, first = np.unique(building_idx, return_index=True)
+        cell_alignment_values = np.full(len(geometry_series), np.nan)
+        cell_alignment_values[building_idx] = momepy.cell_alignment(
+            orientation[building_idx], cell_orientation[cell_idx[first]]
+        ).to_numpy()
+
+        # Write the new field
+        return write_results(
+            self,
+            parameters,
+            context,
+            feedback,
+            source,
+            [QgsField("cell_alignment", QVariant.Double)],
+            [cell_alignment_values],
+            geometry=geometry_series,
+        )
+
+    def createInstance(self):
+        return self.__class__()
+
+
+class Alignment(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    OUTPUT = "OUTPUT"
+    NEIGHBOURS = "NEIGHBOURS"
+
+    NEIGHBOUR_OPTIONS = ["Contiguity (queen)", "Delaunay triangulation of centroids"]
+
+    def name(self) -> str:
+        return "alignment"
+
+    def displayName(self) -> str:
+        return "Alignment"
+
+    def group(self) -> str:
+        return "Distribution"
+
+    def groupId(self) -> str:
+        return "distribution"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Calculates the mean deviation of orientation of each object from "
+            "the orientation of its neighbours, 0 for objects without neighbours. "
+            "Use contiguity for tessellation cells and triangulation for "
+            "buildings."
+        )
+
+    def initAlgorithm(self, configuration=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT,
+                "Input layer",
+                [QgsProcessing.SourceType.VectorPolygon],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.NEIGHBOURS,
+                "Neighbours",
+                options=self.NEIGHBOUR_OPTIONS,
+                defaultValue=0,
+            )
+        )
+
+        add_conversion_parameters(self)
+
+        add_output_parameters(self, "Alignment")
+
+    def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+        from libpysal import graph
+
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        neighbours_option = self.parameterAsEnum(parameters, self.NEIGHBOURS, context)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+
+        # Convert QGIS source to GeoSeries and calculate orientation
+        geometry_series = qgs_to_gpd(source, layer=layer, **conversion)
+        orientation = momepy.orientation(geometry_series).to_numpy()
+
+        # Build the neighbour graph and compare orientations along its edges
+        if neighbours_option == 0:
+            neighbours = graph.Graph.build_contiguity(geometry_series, rook=False)
+        else:
+            neighbours = graph.Graph.build_triangulation(geometry_series.centroid)
+        alignment_values = _neighbour_alignment(orientation, neighbours)
+
+        # Write the new field
+        return write_results(
+            self,
+            parameters,
+            context,
+            feedback,
+            source,
+            [QgsField("alignment", QVariant.Double)],
+            [alignment_values],
+            geometry=geometry_series,
+        )
+
+    def createInstance(self):
+        return self.__class__()
+
+
+class SpatialLag(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    OUTPUT = "OUTPUT"
+    FIELDS = "FIELDS"
+    NEIGHBOURS = "NEIGHBOURS"
+    ORDER = "ORDER"
+    INCLUDE_SELF = "INCLUDE_SELF"
+    RESULTS = "RESULTS"
+
+    NEIGHBOUR_OPTIONS = ["Contiguity (queen)", "Delaunay triangulation of centroids"]
+    RESULT_OPTIONS = ["Spatial lag", "Standardized values", "Standardized spatial lag"]
+    RESULT_SUFFIXES = ["lag", "z", "lag_z"]
+
+    def name(self) -> str:
+        return "spatial_lag"
+
+    def displayName(self) -> str:
+        return "Spatial lag"
+
+    def group(self) -> str:
+        return "Distribution"
+
+    def groupId(self) -> str:
+        return "distribution"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Calculates contextual characters: the mean of each field over "
+            "the neighbours of each object up to the given order, and "
+            "z-scores of the fields and of their lags. The neighbour graph is "
+            "built once and all fields are lagged together. Missing values "
+            "are left out of the means."
+        )
+
+    def initAlgorithm(self, configuration=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT,
+                "Input layer",
+                [QgsProcessing.SourceType.VectorPolygon],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.FIELDS,
+                "Characters",
+                parentLayerParameterName=self.INPUT,
+                type=QgsProcessingParameterField.Numeric,
+                allowMultiple=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.NEIGHBOURS,
+                "Neighbours",
+                options=self.NEIGHBOUR_OPTIONS,
+                defaultValue=0,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.ORDER,
+                "Order of neighbours",
+                type=QgsProcessingParameterNumber.Integer,
+                defaultValue=1,
+                minValue=1,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.INCLUDE_SELF,
+                "Include each object in its own neighbourhood",
+                defaultValue=False,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.RESULTS,
+                "Results",
+                options=self.RESULT_OPTIONS,
+                allowMultiple=True,
+                defaultValue=[0, 2],
+            )
+        )
+
+        add_conversion_parameters(self)
+
+        add_output_parameters(self, "Spatial lag")
+
+    def processAlgorithm(self, parameters, context, feedback):
+        import numpy as np
+        import pandas as pd
+        from libpysal import graph
+
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        field_names = self.parameterAsFields(parameters, self.FIELDS, context)
+        neighbours_option = self.parameterAsEnum(parameters, self.NEIGHBOURS, context)
+        order = self.parameterAsInt(parameters, self.ORDER, context)
+        include_self = self.parameterAsBoolean(parameters, self.INCLUDE_SELF, context)
+        result_options = self.parameterAsEnums(parameters, self.RESULTS, context)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+
+        # Convert QGIS source to GeoDataFrame with the characters
+        geometry_dataframe = qgs_to_gpd(
+            source, attribute_fields=field_names, layer=layer, **conversion
+        )
+        values = (
+            geometry_dataframe[field_names]
+            .apply(pd.to_numeric, errors="coerce")
+            .to_numpy(dtype=np.float64)
+        )
+
+        # Build the neighbour graph once for all characters
+        if neighbours_option == 0:
+            neighbours = graph.Graph.build_contiguity(
+                geometry_dataframe.geometry, rook=False
+            )
+        else:
+            neighbours = graph.Graph.build_triangulation(
+                geometry_dataframe.geometry.centroid
+            )
+        if order > 1:
+            neighbours = neighbours.higher_order(k=order, lower_order=True)
+
+        lag = None
+        if 0 in result_options or 2 in result_options:
+            lag = _spatial_lag(values, neighbours, include_self)
+        results = {
+            0: lag,
+            1: _standardize(values) if 1 in result_options else None,
+            2: _standardize(lag) if 2 in result_options else None,
+        }
+
+        # Fields of each character grouped together
+        fields = []
+        columns = []
+        for position, name in enumerate(field_names):
+            for option in sorted(result_options):
+                fields.append(
+                    QgsField(f"{name}_{self.RESULT_SUFFIXES[option]}", QVariant.Double)
+                )
+                columns.append(results[option][:, position])
+
+        # Write the new fields
+        return write_results(
+            self,
+            parameters,
+            context,
+            feedback,
+            source,
+            fields,
+            columns,
+            geometry=geometry_dataframe.geometry,
+        )
+
+    def createInstance(self):
+        return self.__class__()
@@ -1,6 +1,23 @@
-import momepy
-
-from .utils import qgs_to_gpd
+from .output import (
+    add_file_output_parameters,
+    add_output_parameters,
+    check_sink,
+    write_copy,
+    write_file,
+    write_results,
+)
+from .parallel import WORKERS, add_workers_parameter, map_chunks
+from .planning import VORONOI_POINT, add_memory_parameter, plan_execution
+from .streaming import add_stream_parameters, stream_options, tiles
+from .utils import (
+    qgs_to_gpd,
+    add_conversion_parameters,
+    conversion_options,
+    nearest_street,
+    read_sources,
+    register_layer,
+    source_feature_ids,
+)
 from PyQt5.QtCore import QVariant
 from qgis.core import (
     QgsField,
@@ -11,11 +28,102 @@ from qgis.core import (
     QgsProcessingAlgorithm,
     QgsProcessingParameterFeatureSource,
     QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterDefinition,
     QgsFields,
     QgsWkbTypes,
 )
 
 
+def _tessellate_chunk(geometry, limit, overlap, options, chunk):
+    """
+    Tessellate a tile of buildings together with the buildings around it
+
+    Parameters:
+    -----------
+    geometry : gpd.GeoSeries
+        All buildings
+    limit : gpd.GeoSeries
+        Limit of the tessellation
+    overlap : float
+        Distance from the tile within which buildings shape its cells
+    options : dict
+        Keyword arguments of momepy.morphological_tessellation
+    chunk : np.ndarray
+        Positions of the buildings of the tile
+
+    Returns:
+    --------
+    gpd.GeoDataFrame
+        Cells of the buildings of the tile
+    """
+    import momepy
+    import numpy as np
+    import shapely as shp
+
+    tile = geometry.iloc[chunk]
+    area = shp.box(*tile.total_bounds).buffer(overlap, join_style="mitre")
+    around = geometry.sindex.query(area, predicate="intersects")
+    cells = momepy.morphological_tessellation(
+        geometry.iloc[np.union1d(chunk, around)], clip=limit, **options
+    )
+    return cells[cells.index.isin(tile.index)]
+
+
+# State of a worker process, set once per worker by _init_blocks
+_STATE = {}
+
+
+def _init_blocks(cells, buildings, edges):
+    _STATE.update(cells=cells, buildings=buildings, edges=edges)
+
+
+def _generate_blocks(chunk):
+    """
+    Generate blocks of the cells of a chunk of enclosures
+
+    Blocks do not cross streets, so enclosures can be processed separately.
+    Cells reaching into the enclosures from outside are passed to momepy as
+    well, as their parts can join cells of the enclosures into one block.
+
+    Parameters:
+    -----------
+    chunk : tuple of np.ndarray
+        Positions of the cells of the enclosures and of the cells reaching
+        into them
+
+    Returns:
+    --------
+    np.ndarray, np.ndarray
+        Geometries of the blocks and the block of each cell of the
+        enclosures, -1 for cells without a building
+    """
+    import momepy
+    import numpy as np
+
+    core, around = chunk
+    cells = _STATE["cells"].iloc[np.union1d(core, around)]
+    buildings = _STATE["buildings"]
+    buildings = buildings[buildings.index.isin(cells.index)]
+    edges = _STATE["edges"]
+    _, near = edges.sindex.query(cells.array, predicate="intersects")
+
+    blocks, cell_block = momepy.generate_blocks(
+        cells.to_frame("geometry"),
+        edges.iloc[np.unique(near)].to_frame("geometry"),
+        buildings.to_frame("geometry"),
+    )
+
+    # Keep and renumber the blocks of the cells of the enclosures
+    cell_block = cell_block.reindex(core).to_numpy(dtype=np.float64, na_value=np.nan)
+    found = ~np.isnan(cell_block)
+    kept, block = np.unique(cell_block[found].astype(np.int64), return_inverse=True)
+    core_block = np.full(len(core), -1, dtype=np.int64)
+    core_block[found] = block.ravel()
+    return blocks.geometry.array[kept], core_block
+
+
 class BufferedLimit(QgsProcessingAlgorithm):
     INPUT = "INPUT"
     OUTPUT = "OUTPUT"
@@ -49,10 +157,14 @@ class BufferedLimit(QgsProcessingAlgorithm):
         )
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+        import geopandas as gpd
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
 
         # Convert QGIS feature to GeoDataFrame and create buffered limit
-        geometry_dataframe = qgs_to_gpd(source)
+        geometry_dataframe = qgs_to_gpd(source, layer=layer)
         limit = momepy.buffered_limit(geometry_dataframe)
 
         # Create output fields
@@ -83,6 +195,9 @@ class BufferedLimit(QgsProcessingAlgorithm):
 
             # Add the feature to the sink
             sink.addFeature(feature, QgsFeatureSink.FastInsert)
+            register_layer(
+                dest_id, gpd.GeoDataFrame({"id": [1]}, geometry=[limit]), context
+            )
 
         return {self.OUTPUT: dest_id}
 
@@ -94,6 +209,10 @@ class MorphologicalTessellation(QgsProcessingAlgorithm):
     INPUT = "INPUT"
     OUTPUT = "OUTPUT"
     LIMIT = "LIMIT"
+    SHRINK = "SHRINK"
+    SEGMENT = "SEGMENT"
+    SIMPLIFY = "SIMPLIFY"
+    OVERLAP = "OVERLAP"
 
     def name(self) -> str:
         return "morphological_tessellation"
@@ -108,7 +227,16 @@ class MorphologicalTessellation(QgsProcessingAlgorithm):
         return "elements"
 
     def shortHelpString(self) -> str:
-        return "Generates morphological tessellation."
+        return (
+            "Generates morphological tessellation. The runtime grows with the "
+            "number of vertices on building boundaries, which is set by the "
+            "segment length. A longer segment, simplified cells and snapping "
+            "the input to a precision grid (advanced conversion parameters) "
+            "trade accuracy of cell edges for speed. Large areas are "
+            "tessellated in tiles fitting into the memory budget, or in chunks "
+            "shown as they finish, each taking into account buildings within "
+            "the overlap distance around it."
+        )
 
     def initAlgorithm(self, configuration=None):
         self.addParameter(
@@ -128,18 +256,126 @@ class MorphologicalTessellation(QgsProcessingAlgorithm):
         )
 
         self.addParameter(
-            QgsProcessingParameterFeatureSink(self.OUTPUT, "Morphological tesselation")
+            QgsProcessingParameterNumber(
+                self.SHRINK,
+                "Distance by which buildings are shrunk before tessellating",
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0.4,
+                minValue=0.0,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.SEGMENT,
+                "Maximum distance between points on building boundaries",
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0.5,
+                minValue=0.01,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.SIMPLIFY,
+                "Simplify cell edges",
+                defaultValue=True,
+            )
+        )
+
+        add_conversion_parameters(self)
+
+        add_stream_parameters(self)
+
+        add_memory_parameter(self)
+
+        overlap = QgsProcessingParameterNumber(
+            self.OVERLAP,
+            "Distance around a chunk within which buildings shape its cells",
+            type=QgsProcessingParameterNumber.Double,
+            defaultValue=200.0,
+            minValue=0.0,
+        )
+        overlap.setFlags(
+            overlap.flags() | QgsProcessingParameterDefinition.FlagAdvanced
+        )
+        self.addParameter(overlap)
+
+        add_file_output_parameters(self)
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT,
+                "Morphological tesselation",
+                optional=True,
+                createByDefault=True,
+            )
         )
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+        import pandas as pd
+        from functools import partial
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
         limit_source = self.parameterAsSource(parameters, self.LIMIT, context)
+        limit_layer = self.parameterAsVectorLayer(parameters, self.LIMIT, context)
+        shrink = self.parameterAsDouble(parameters, self.SHRINK, context)
+        segment = self.parameterAsDouble(parameters, self.SEGMENT, context)
+        simplify = self.parameterAsBoolean(parameters, self.SIMPLIFY, context)
+        overlap = self.parameterAsDouble(parameters, self.OVERLAP, context)
+        preview, chunk_size = stream_options(self, parameters, context, feedback)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        # Boundaries are split into points every segment for the Voronoi diagram
+        tile_size = plan_execution(
+            self,
+            parameters,
+            context,
+            feedback,
+            source,
+            (0, 0, VORONOI_POINT / segment),
+            tiled=True,
+        )
+        if tile_size is not None:
+            chunk_size = tile_size if preview is None else min(chunk_size, tile_size)
 
         # Convert QGIS feature to GeoDataFrame and generate morphological tesselation
-        geometry_dataframe = qgs_to_gpd(source)
-        limit = qgs_to_gpd(limit_source)
-        morphological_tessellation = momepy.morphological_tessellation(
-            geometry_dataframe, clip=limit
+        geometry_dataframe, limit = read_sources(
+            [(source, layer, None), (limit_source, limit_layer, None)], **conversion
+        )
+        options = {"shrink": shrink, "segment": segment, "simplify": simplify}
+        if preview is None and tile_size is None:
+            morphological_tessellation = momepy.morphological_tessellation(
+                geometry_dataframe, clip=limit, **options
+            )
+        else:
+            # Tessellate tiles of buildings, shown as they finish if streaming
+            cells = map_chunks(
+                partial(_tessellate_chunk, geometry_dataframe, limit, overlap, options),
+                tiles(geometry_dataframe, chunk_size),
+                feedback=feedback,
+                callback=None if preview is None else preview.add,
+            )
+            cells = [chunk for chunk in cells if chunk is not None]
+            if feedback.isCanceled():
+                feedback.pushWarning(
+                    f"Cancelled, writing {len(cells)} finished chunks only."
+                )
+            morphological_tessellation = pd.concat(
+                cells or [geometry_dataframe.iloc[:0].to_frame("geometry")]
+            ).sort_index()
+        if conversion["crs"] is not None:
+            morphological_tessellation = morphological_tessellation.to_crs(
+                source.sourceCrs().toWkt()
+            )
+        results = write_file(
+            self,
+            parameters,
+            context,
+            feedback,
+            morphological_tessellation.rename_axis("source_fid").reset_index(),
+            source.sourceCrs(),
         )
 
         # Create empty fields (tessellation cells only need geometry)
@@ -154,6 +390,8 @@ class MorphologicalTessellation(QgsProcessingAlgorithm):
             QgsWkbTypes.Polygon,
             source.sourceCrs(),
         )
+        if not check_sink(self, parameters, sink, results):
+            return results
 
         # Convert tessellation GeoDataFrame back to QGIS features
         for idx, row in morphological_tessellation.iterrows():
@@ -168,7 +406,390 @@ class MorphologicalTessellation(QgsProcessingAlgorithm):
             # Add feature to sink
             sink.addFeature(feature, QgsFeatureSink.FastInsert)
 
-        return {self.OUTPUT: dest_id}
+        # Keep the cells for algorithms reading them later in a model
+        if not feedback.isCanceled():
+            register_layer(dest_id, morphological_tessellation, context)
+
+        results[self.OUTPUT] = dest_id
+        return results
+
+    def createInstance(self):
+        return self.__class__()
+
+
+class NearestStreet(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    INPUT_STREETS = "INPUT_STREETS"
+    OUTPUT = "OUTPUT"
+    MAX_DISTANCE = "MAX_DISTANCE"
+
+    def name(self) -> str:
+        return "nearest_street"
+
+    def displayName(self) -> str:
+        return "Nearest street"
+
+    def group(self) -> str:
+        return "Elements"
+
+    def groupId(self) -> str:
+        return "elements"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Links each building or tessellation cell to its nearest street "
+            "segment. Stores the feature id of the street and the distance to it."
+        )
+
+    def initAlgorithm(self, configuration=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT,
+                "Input layer",
+                [QgsProcessing.SourceType.VectorPolygon],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT_STREETS,
+                "Input street layer",
+                [QgsProcessing.SourceType.VectorLine],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.MAX_DISTANCE,
+                "Maximum distance to search for a street, 0 for no limit",
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0.0,
+                minValue=0.0,
+                optional=True,
+            )
+        )
+
+        add_conversion_parameters(self)
+
+        add_output_parameters(self, "Nearest street")
+
+    def processAlgorithm(self, parameters, context, feedback):
+        import numpy as np
+
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        street_source = self.parameterAsSource(parameters, self.INPUT_STREETS, context)
+        street_layer = self.parameterAsVectorLayer(
+            parameters, self.INPUT_STREETS, context
+        )
+        max_distance = (
+            self.parameterAsDouble(parameters, self.MAX_DISTANCE, context) or None
+        )
+        conversion = conversion_options(self, parameters, context, feedback, source)
+
+        # Convert QGIS sources to GeoSeries and query nearest streets in bulk
+        geometry_series, street_series = read_sources(
+            [(source, layer, None), (street_source, street_layer, None)], **conversion
+        )
+        street_index, street_distance = nearest_street(
+            geometry_series, street_series, max_distance
+        )
+        # Parts of exploded streets are written as the id of their feature
+        found = ~np.isnan(street_index)
+        street_index[found] = source_feature_ids(
+            street_series, street_index[found].astype(np.int64)
+        )
+
+        # Write the new fields, NULL where no street was found within the
+        # maximum distance
+        return write_results(
+            self,
+            parameters,
+            context,
+            feedback,
+            source,
+            [
+                QgsField("street_index", QVariant.LongLong),
+                QgsField("street_distance", QVariant.Double),
+            ],
+            [street_index, street_distance],
+            geometry=geometry_series,
+        )
+
+    def createInstance(self):
+        return self.__class__()
+
+
+class Blocks(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    INPUT_TESSELLATION = "INPUT_TESSELLATION"
+    INPUT_STREETS = "INPUT_STREETS"
+    CHUNK_SIZE = "CHUNK_SIZE"
+    OUTPUT = "OUTPUT"
+    OUTPUT_BUILDINGS = "OUTPUT_BUILDINGS"
+    OUTPUT_TESSELLATION = "OUTPUT_TESSELLATION"
+
+    def name(self) -> str:
+        return "blocks"
+
+    def displayName(self) -> str:
+        return "Blocks"
+
+    def group(self) -> str:
+        return "Elements"
+
+    def groupId(self) -> str:
+        return "elements"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Generates morphological blocks by dissolving tessellation cells "
+            "within areas enclosed by streets, and links buildings and cells "
+            "to their block. Cells are matched to buildings by location. "
+            "Enclosures are processed in chunks of about the given number of "
+            "cells, which bounds memory use and can run in parallel."
+        )
+
+    def initAlgorithm(self, configuration=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT,
+                "Input buildings layer",
+                [QgsProcessing.SourceType.VectorPolygon],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT_TESSELLATION,
+                "Input tessellation layer",
+                [QgsProcessing.SourceType.VectorPolygon],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT_STREETS,
+                "Input street layer",
+                [QgsProcessing.SourceType.VectorLine],
+            )
+        )
+
+        chunk_size = QgsProcessingParameterNumber(
+            self.CHUNK_SIZE,
+            "Number of cells per chunk of enclosures",
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=10000,
+            minValue=1,
+        )
+        chunk_size.setFlags(
+            chunk_size.flags() | QgsProcessingParameterDefinition.FlagAdvanced
+        )
+        self.addParameter(chunk_size)
+
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_file_output_parameters(self)
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT,
+                "Blocks",
+                optional=True,
+                createByDefault=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT_BUILDINGS,
+                "Buildings with block id",
+                optional=True,
+                createByDefault=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT_TESSELLATION,
+                "Tessellation with block id",
+                optional=True,
+                createByDefault=True,
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+        import numpy as np
+        import geopandas as gpd
+        import shapely as shp
+
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        tessellation_source = self.parameterAsSource(
+            parameters, self.INPUT_TESSELLATION, context
+        )
+        tessellation_layer = self.parameterAsVectorLayer(
+            parameters, self.INPUT_TESSELLATION, context
+        )
+        street_source = self.parameterAsSource(parameters, self.INPUT_STREETS, context)
+        street_layer = self.parameterAsVectorLayer(
+            parameters, self.INPUT_STREETS, context
+        )
+        chunk_size = self.parameterAsInt(parameters, self.CHUNK_SIZE, context)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+
+        # Convert QGIS sources to GeoSeries
+        building_series, tessellation_series, street_series = read_sources(
+            [
+                (source, layer, None),
+                (tessellation_source, tessellation_layer, None),
+                (street_source, street_layer, None),
+            ],
+            **conversion,
+        )
+        cells = tessellation_series.reset_index(drop=True)
+
+        # Match each building to the cell containing its representative point
+        # with a single bulk query, one building per cell
+        points = shp.point_on_surface(building_series.array)
+        building_idx, cell_idx = shp.STRtree(cells.array).query(
+            points, predicate="intersects"
+        )
+        cell_idx, first = np.unique(cell_idx, return_index=True)
+        building_idx = building_idx[first]
+        buildings = gpd.GeoSeries(
+            building_series.array[building_idx], index=cell_idx, crs=cells.crs
+        )
+
+        # Assign cells to the areas enclosed by streets by their building, or
+        # their own representative point for cells without a building
+        limit = gpd.GeoSeries(
+            [shp.box(*cells.total_bounds).buffer(1.0)], crs=cells.crs
+        )
+        enclosures = momepy.enclosures(street_series, limit=limit).geometry.array
+        enclosure_tree = shp.STRtree(enclosures)
+        cell_points = shp.point_on_surface(cells.array)
+        cell_points[cell_idx] = points[building_idx]
+        point_idx, enclosure_idx = enclosure_tree.query(
+            cell_points, predicate="intersects"
+        )
+        point_idx, first = np.unique(point_idx, return_index=True)
+        cell_enclosure = np.full(len(cells), -1, dtype=np.int64)
+        cell_enclosure[point_idx] = enclosure_idx[first]
+        reach_cell, reach_enclosure = enclosure_tree.query(
+            cells.array, predicate="intersects"
+        )
+
+        # Split enclosures into chunks of about chunk_size cells
+        enclosure_cells = np.bincount(
+            cell_enclosure + 1, minlength=len(enclosures) + 1
+        )[1:]
+        enclosure_chunk = np.cumsum(enclosure_cells) // chunk_size
+        cell_chunk = np.where(cell_enclosure >= 0, enclosure_chunk[cell_enclosure], -1)
+        reach_chunk = enclosure_chunk[reach_enclosure]
+        chunks = []
+        for chunk in np.unique(cell_chunk[cell_chunk >= 0]):
+            core = np.flatnonzero(cell_chunk == chunk)
+            chunks.append((core, np.setdiff1d(reach_cell[reach_chunk == chunk], core)))
+        feedback.pushInfo(
+            f"{len(enclosures)} enclosures in {len(chunks)} chunks of cells."
+        )
+
+        results = map_chunks(
+            _generate_blocks,
+            chunks,
+            workers=workers,
+            initializer=_init_blocks,
+            initargs=(cells, buildings, street_series.reset_index(drop=True)),
+            feedback=feedback,
+        )
+        if feedback.isCanceled():
+            return {}
+
+        # Number blocks across chunks
+        cell_block = np.full(len(cells), -1, dtype=np.int64)
+        block_geometries = []
+        for (core, _), (geometries, core_block) in zip(chunks, results):
+            offset = len(block_geometries)
+            cell_block[core] = np.where(core_block >= 0, core_block + offset, -1)
+            block_geometries.extend(geometries)
+        building_block = np.full(len(building_series), np.nan)
+        building_block[building_idx] = cell_block[cell_idx]
+        building_block[building_block < 0] = np.nan
+        cell_block = np.where(cell_block >= 0, cell_block, np.nan)
+
+        blocks = gpd.GeoDataFrame(
+            {"bID": np.arange(len(block_geometries))},
+            geometry=block_geometries,
+            crs=cells.crs,
+        )
+        if conversion["crs"] is not None:
+            blocks = blocks.to_crs(source.sourceCrs().toWkt())
+        feedback.pushInfo(f"{len(blocks)} blocks generated.")
+        results = write_file(
+            self, parameters, context, feedback, blocks, source.sourceCrs()
+        )
+
+        # Append block ids to buildings and cells
+        block_field = [QgsField("bID", QVariant.Int)]
+        results.update(
+            write_copy(
+                self,
+                parameters,
+                context,
+                feedback,
+                source,
+                block_field,
+                [building_block],
+                self.OUTPUT_BUILDINGS,
+                building_series,
+                results,
+            )
+        )
+        results.update(
+            write_copy(
+                self,
+                parameters,
+                context,
+                feedback,
+                tessellation_source,
+                block_field,
+                [cell_block],
+                self.OUTPUT_TESSELLATION,
+                tessellation_series,
+                results,
+            )
+        )
+
+        # Create output sink
+        fields = QgsFields()
+        fields.append(QgsField("bID", QVariant.Int))
+        (sink, dest_id) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT,
+            context,
+            fields,
+            QgsWkbTypes.Polygon,
+            source.sourceCrs(),
+        )
+        if not check_sink(self, parameters, sink, results):
+            return results
+
+        for block_id, geometry in enumerate(blocks.geometry.array):
+            if feedback.isCanceled():
+                break
+
+            feature = QgsFeature(fields)
+            feature.setGeometry(QgsGeometry.fromWkt(geometry.wkt))
+            feature.setAttributes([block_id])
+            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+
+        results[self.OUTPUT] = dest_id
+        return results
 
     def createInstance(self):
         return self.__class__()
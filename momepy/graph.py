@@ -0,0 +1,499 @@
+import math
+import random
+from heapq import heappush, heappop
+
+from .utils import qgs_to_gpd
+from .parallel import map_chunks, split
+from PyQt5.QtCore import QVariant
+from qgis.core import (
+    QgsField,
+    QgsFields,
+    QgsFeature,
+    QgsGeometry,
+    QgsPointXY,
+    QgsWkbTypes,
+    QgsProcessing,
+    QgsFeatureSink,
+    QgsProcessingAlgorithm,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterNumber,
+)
+
+# State of a worker process, set once per worker by _init_worker
+_STATE = {}
+
+
+def _graph_arrays(graph, weight):
+    """
+    Convert a momepy primal graph to compact adjacency lists
+
+    Parallel edges are reduced to the shortest one, as only that one can be
+    part of a shortest path. Self-loops are dropped for the same reason.
+
+    Parameters:
+    -----------
+    graph : networkx.MultiGraph
+        Primal graph created by momepy.gdf_to_nx
+    weight : str
+        Edge attribute with the edge length
+
+    Returns:
+    --------
+    tuple
+        Node keys, edges as (u, v, key, data) and adjacency lists of
+        (neighbour, length, edge index) tuples
+    """
+    nodes = list(graph.nodes)
+    position = {node: i for i, node in enumerate(nodes)}
+    edges = list(graph.edges(keys=True, data=True))
+    neighbours = [{} for _ in nodes]
+
+    for e, (u, v, _, data) in enumerate(edges):
+        i, j = position[u], position[v]
+        if i == j:
+            continue
+        length = data[weight]
+        for a, b in ((i, j), (j, i)):
+            best = neighbours[a].get(b)
+            if best is None or length < best[0]:
+                neighbours[a][b] = (length, e)
+
+    adjacency = [
+        [(b, length, e) for b, (length, e) in node_neighbours.items()]
+        for node_neighbours in neighbours
+    ]
+    return nodes, edges, adjacency
+
+
+def _init_worker(
+    adjacency, coordinates, n_edges, metric, radius, samples=0, seed=None
+):
+    _STATE.update(
+        adjacency=adjacency,
+        coordinates=coordinates,
+        n_edges=n_edges,
+        metric=metric,
+        radius=radius,
+        samples=samples,
+        seed=seed,
+    )
+
+
+def _dijkstra(adjacency, source, cutoff, paths, nodes=None):
+    """
+    Single source Dijkstra stopping at ``cutoff``
+
+    Returns nodes in the order they were settled, their distances and, if
+    ``paths`` is True, the number of shortest paths and their predecessors.
+    If ``nodes`` is given, paths only pass through these nodes.
+    """
+    distances = {}
+    seen = {source: 0.0}
+    sigma = {source: 1.0}
+    predecessors = {source: []}
+    order = []
+    heap = [(0.0, source)]
+
+    while heap:
+        distance, v = heappop(heap)
+        if v in distances:
+            continue
+        distances[v] = distance
+        order.append(v)
+        for w, length, e in adjacency[v]:
+            vw_distance = distance + length
+            if cutoff is not None and vw_distance > cutoff:
+                continue
+            if nodes is not None and w not in nodes:
+                continue
+            if w not in distances and (w not in seen or vw_distance < seen[w]):
+                seen[w] = vw_distance
+                heappush(heap, (vw_distance, w))
+                if paths:
+                    sigma[w] = sigma[v]
+                    predecessors[w] = [(v, e)]
+            elif paths and vw_distance == seen[w]:
+                sigma[w] += sigma[v]
+                predecessors[w].append((v, e))
+
+    return order, distances, sigma, predecessors
+
+
+def _ego_betweenness(adjacency, node, radius, samples, seed):
+    """
+    Betweenness of ``node`` within its ego graph, as momepy with a radius
+
+    The ego graph holds the nodes within ``radius`` along the network and all
+    edges between them. Shortest paths between its nodes are searched within
+    the ego graph, from all of them or from a seeded sample of ``samples``.
+    """
+    _, distances, _, _ = _dijkstra(adjacency, node, radius, False)
+    ego = set(distances)
+    sources = sorted(ego)
+    scale = 1.0
+    if 0 < samples < len(sources):
+        sources = random.Random(f"{seed}:{node}").sample(sources, samples)
+        scale = len(ego) / samples
+
+    total = 0.0
+    for s in sources:
+        if s == node:
+            continue
+        order, _, sigma, predecessors = _dijkstra(adjacency, s, None, True, ego)
+        delta = dict.fromkeys(order, 0.0)
+        while order:
+            w = order.pop()
+            coefficient = (1.0 + delta[w]) / sigma[w]
+            for v, _ in predecessors[w]:
+                delta[v] += sigma[v] * coefficient
+        total += delta.get(node, 0.0)
+    return total * scale
+
+
+def _accumulate(sources):
+    """
+    Accumulate centrality contributions of ``sources`` on every node
+
+    Distances are symmetric in the undirected street graph, so the
+    contribution of a source to a reached node equals the contribution the
+    node would get from its own search. This lets the work be split by
+    source nodes (and sampled) for all metrics. Betweenness within a radius
+    is computed in the ego graph of each source node instead.
+    """
+    adjacency = _STATE["adjacency"]
+    coordinates = _STATE["coordinates"]
+    metric = _STATE["metric"]
+    radius = _STATE["radius"]
+
+    n = len(adjacency)
+    node_values = [0.0] * n
+    counts = [0] * n
+    edge_values = [0.0] * _STATE["n_edges"]
+    betweenness = metric == "betweenness"
+
+    if betweenness and radius is not None:
+        for s in sources:
+            node_values[s] = _ego_betweenness(
+                adjacency, s, radius, _STATE["samples"], _STATE["seed"]
+            )
+        return node_values, counts, edge_values
+
+    for s in sources:
+        order, distances, sigma, predecessors = _dijkstra(
+            adjacency, s, radius, betweenness
+        )
+
+        if betweenness:
+            node_values[s] += len(order) - 1
+            delta = dict.fromkeys(order, 0.0)
+            while order:
+                w = order.pop()
+                coefficient = (1.0 + delta[w]) / sigma[w]
+                for v, e in predecessors[w]:
+                    contribution = sigma[v] * coefficient
+                    delta[v] += contribution
+                    edge_values[e] += contribution
+                if w != s:
+                    node_values[w] += delta[w] + 1.0
+            continue
+
+        sx, sy = coordinates[s]
+        for v, distance in distances.items():
+            if v == s or distance <= 0:
+                continue
+            counts[v] += 1
+            if metric == "closeness":
+                node_values[v] += distance
+            else:
+                x, y = coordinates[v]
+                node_values[v] += math.hypot(x - sx, y - sy) / distance
+
+    return node_values, counts, edge_values
+
+
+class _CentralityAlgorithm(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    RADIUS = "RADIUS"
+    SAMPLES = "SAMPLES"
+    SEED = "SEED"
+    WORKERS = "WORKERS"
+    OUTPUT_NODES = "OUTPUT_NODES"
+    OUTPUT_EDGES = "OUTPUT_EDGES"
+
+    metric = None
+
+    def group(self) -> str:
+        return "Graph"
+
+    def groupId(self) -> str:
+        return "graph"
+
+    def initAlgorithm(self, configuration=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT,
+                "Input street layer",
+                [QgsProcessing.SourceType.VectorLine],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.RADIUS,
+                "Search radius along the network, 0 for the whole network",
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0.0,
+                minValue=0.0,
+                optional=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.SAMPLES,
+                "Number of sampled source nodes, 0 for exact computation",
+                type=QgsProcessingParameterNumber.Integer,
+                defaultValue=0,
+                minValue=0,
+                optional=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.SEED,
+                "Random seed used for sampling",
+                type=QgsProcessingParameterNumber.Integer,
+                defaultValue=42,
+                optional=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.WORKERS,
+                "Number of worker processes",
+                type=QgsProcessingParameterNumber.Integer,
+                defaultValue=1,
+                minValue=1,
+                optional=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT_NODES,
+                f"{self.displayName()} (nodes)",
+                QgsProcessing.TypeVectorPoint,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT_EDGES,
+                f"{self.displayName()} (edges)",
+                QgsProcessing.TypeVectorLine,
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+        import geopandas as gpd
+
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        radius = self.parameterAsDouble(parameters, self.RADIUS, context) or None
+        samples = self.parameterAsInt(parameters, self.SAMPLES, context)
+        seed = self.parameterAsInt(parameters, self.SEED, context)
+        workers = self.parameterAsInt(parameters, self.WORKERS, context)
+
+        # Convert QGIS source to a momepy primal graph
+        street_series = qgs_to_gpd(source, layer=layer).explode(index_parts=False)
+        graph = momepy.gdf_to_nx(gpd.GeoDataFrame(geometry=street_series))
+        nodes, edges, adjacency = _graph_arrays(graph, "mm_len")
+        n = len(nodes)
+
+        # Select source nodes, either all of them or a seeded sample. Local
+        # betweenness needs every node and samples sources in ego graphs.
+        local = self.metric == "betweenness" and radius is not None
+        sources = list(range(n))
+        scale = 1.0
+        if 0 < samples < n and not local:
+            sources = sorted(random.Random(seed).sample(sources, samples))
+            scale = n / samples
+            feedback.pushInfo(f"Sampling {samples} of {n} source nodes.")
+
+        # Split source nodes across workers, a few chunks per worker
+        # to keep the progress bar moving
+        chunks = split(sources, workers * 4)
+        results = map_chunks(
+            _accumulate,
+            chunks,
+            workers=workers,
+            initializer=_init_worker,
+            initargs=(
+                adjacency,
+                nodes,
+                len(edges),
+                self.metric,
+                radius,
+                samples,
+                seed,
+            ),
+            feedback=feedback,
+        )
+        if feedback.isCanceled():
+            return {}
+
+        node_values = [0.0] * n
+        counts = [0] * n
+        edge_values = [0.0] * len(edges)
+        for chunk_nodes, chunk_counts, chunk_edges in results:
+            for i in range(n):
+                node_values[i] += chunk_nodes[i]
+                counts[i] += chunk_counts[i]
+            for e in range(len(edges)):
+                edge_values[e] += chunk_edges[e]
+
+        node_values = self.finalize(node_values, counts, scale, n, radius)
+
+        position = {node: i for i, node in enumerate(nodes)}
+        if self.metric == "betweenness" and not local:
+            edge_scale = self.rescale(scale, n, radius)
+            edge_values = [value * edge_scale for value in edge_values]
+        else:
+            edge_values = [
+                (node_values[position[u]] + node_values[position[v]]) / 2
+                for u, v, _, _ in edges
+            ]
+
+        # Write nodes
+        node_fields = QgsFields()
+        node_fields.append(QgsField("nodeID", QVariant.Int))
+        node_fields.append(QgsField(self.metric, QVariant.Double))
+
+        (node_sink, node_dest_id) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT_NODES,
+            context,
+            node_fields,
+            QgsWkbTypes.Point,
+            source.sourceCrs(),
+        )
+
+        for i, (x, y) in enumerate(nodes):
+            feature = QgsFeature(node_fields)
+            feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+            feature.setAttributes([i, node_values[i]])
+            node_sink.addFeature(feature, QgsFeatureSink.FastInsert)
+
+        # Write edges
+        edge_fields = QgsFields()
+        edge_fields.append(QgsField("node_start", QVariant.Int))
+        edge_fields.append(QgsField("node_end", QVariant.Int))
+        edge_fields.append(QgsField("mm_len", QVariant.Double))
+        edge_fields.append(QgsField(self.metric, QVariant.Double))
+
+        (edge_sink, edge_dest_id) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT_EDGES,
+            context,
+            edge_fields,
+            QgsWkbTypes.LineString,
+            source.sourceCrs(),
+        )
+
+        for e, (u, v, _, data) in enumerate(edges):
+            feature = QgsFeature(edge_fields)
+            feature.setGeometry(QgsGeometry.fromWkt(data["geometry"].wkt))
+            feature.setAttributes(
+                [position[u], position[v], data["mm_len"], edge_values[e]]
+            )
+            edge_sink.addFeature(feature, QgsFeatureSink.FastInsert)
+
+        return {self.OUTPUT_NODES: node_dest_id, self.OUTPUT_EDGES: edge_dest_id}
+
+    def createInstance(self):
+        return self.__class__()
+
+
+class ClosenessCentrality(_CentralityAlgorithm):
+    metric = "closeness"
+
+    def name(self) -> str:
+        return "closeness_centrality"
+
+    def displayName(self) -> str:
+        return "Closeness centrality"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Calculates the closeness centrality of street network nodes. "
+            "With a search radius, local closeness within the given network "
+            "distance is calculated. Edges get the mean value of their nodes."
+        )
+
+    def finalize(self, values, counts, scale, n, radius):
+        result = []
+        for distance, count in zip(values, counts):
+            if distance <= 0 or n < 2:
+                result.append(0.0)
+                continue
+            # Normalised by the share of reached nodes as in momepy
+            result.append(count / distance * count * scale / (n - 1))
+        return result
+
+
+class BetweennessCentrality(_CentralityAlgorithm):
+    metric = "betweenness"
+
+    def name(self) -> str:
+        return "betweenness_centrality"
+
+    def displayName(self) -> str:
+        return "Betweenness centrality"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Calculates the betweenness centrality of street network nodes and "
+            "edges. With a search radius, local betweenness of each node is "
+            "calculated within its ego graph, the nodes within the given "
+            "network distance and the edges between them, as in momepy. It is "
+            "not normalised and edges get the mean value of their nodes. "
+            "Sampling source nodes, within each ego graph for local "
+            "betweenness, gives an approximation suitable for large networks."
+        )
+
+    def finalize(self, values, counts, scale, n, radius):
+        return [value * self.rescale(scale, n, radius) for value in values]
+
+    @staticmethod
+    def rescale(scale, n, radius):
+        # Normalised as in momepy for the whole network, otherwise the raw
+        # sum of ego graph dependencies, each pair counted from both ends
+        if radius is None and n > 1:
+            return scale / (n * (n - 1))
+        return scale * 0.5
+
+
+class StraightnessCentrality(_CentralityAlgorithm):
+    metric = "straightness"
+
+    def name(self) -> str:
+        return "straightness_centrality"
+
+    def displayName(self) -> str:
+        return "Straightness centrality"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Calculates the straightness centrality of street network nodes. "
+            "With a search radius, only nodes within the given network "
+            "distance are considered. Edges get the mean value of their nodes."
+        )
+
+    def finalize(self, values, counts, scale, n, radius):
+        return [
+            value / count if count else 0.0 for value, count in zip(values, counts)
+        ]
@@ -22,8 +22,30 @@ from .dimension import (
     StreetProfile,
 )
 from .elements import (
+    Blocks,
     BufferedLimit,
     MorphologicalTessellation,
+    NearestStreet,
+)
+from .distribution import (
+    Orientation,
+    StreetAlignment,
+    CellAlignment,
+    Alignment,
+    SpatialLag,
+)
+from .preprocessing import (
+    RemoveFalseNodes,
+    ConsolidateIntersections,
+    CloseGaps,
+    ExtendLines,
+)
+from .aggregation import GridAggregation
+from .clustering import Clustering
+from .graph import (
+    ClosenessCentrality,
+    BetweennessCentrality,
+    StraightnessCentrality,
 )
 
 
@@ -59,11 +81,31 @@ class MomepyProvider(QgsProcessingProvider):
             EquivalentRectangularIndex(),
             BufferedLimit(),
             MorphologicalTessellation(),
+            NearestStreet(),
+            Blocks(),
+            Orientation(),
+            StreetAlignment(),
+            CellAlignment(),
+            Alignment(),
+            SpatialLag(),
+            RemoveFalseNodes(),
+            ConsolidateIntersections(),
+            CloseGaps(),
+            ExtendLines(),
+            ClosenessCentrality(),
+            BetweennessCentrality(),
+            StraightnessCentrality(),
+            GridAggregation(),
+            Clustering(),
         ]
         return algorithms
 
     def loadAlgorithms(self):
-        """Load each algorithm into current provider."""
+        """Load each algorithm into current provider.
+
+        Algorithm modules import only QGIS at module level, momepy and the
+        scientific stack are imported on the first processAlgorithm call.
+        """
         self.algs = self.getAlgorithms()
         for a in self.algs:
             self.addAlgorithm(a)
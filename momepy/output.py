@@ -0,0 +1,1005 @@
+from PyQt5.QtCore import QVariant
+from qgis.core import (
+    QgsField,
+    QgsFields,
+    QgsFeature,
+    QgsGeometry,
+    QgsWkbTypes,
+    QgsFeatureSink,
+    QgsFeatureRequest,
+    QgsVectorDataProvider,
+    QgsProcessingException,
+    QgsProcessingParameterDefinition,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterField,
+    QgsProcessingParameterFileDestination,
+    QgsProcessingParameterNumber,
+)
+
+from .styling import add_style_parameters, write_statistics
+from .utils import (
+    EXPLODE_PARTS,
+    MULTIPART,
+    PROVIDER_ORDER,
+    SOURCE_IDS,
+    SOURCE_PARTS,
+    SPATIAL_ORDER,
+    register_layer,
+    registered_layer,
+)
+
+OUTPUT_MODE = "OUTPUT_MODE"
+BATCH_SIZE = "BATCH_SIZE"
+ID_FIELD = "ID_FIELD"
+FILE_OUTPUT = "FILE_OUTPUT"
+COMPRESSION = "COMPRESSION"
+ROW_GROUP_SIZE = "ROW_GROUP_SIZE"
+OUTPUT_TYPE = "OUTPUT_TYPE"
+DECIMALS = "DECIMALS"
+
+NEW_LAYER = 0
+IN_PLACE = 1
+TABLE = 2
+OUTPUT_MODES = [
+    "Create a new layer",
+    "Add fields to the input layer",
+    "Create a table of feature ids and results",
+]
+COMPRESSIONS = ["zstd", "snappy", "lz4", "gzip", "none"]
+# Types of result columns by option
+FLOAT_TYPES = {
+    "Double precision (float64)": "float64",
+    "Single precision (float32)": "float32",
+}
+INTEGER_TYPES = {
+    "32-bit integer (int32)": "int32",
+    "16-bit integer (int16)": "int16",
+}
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+
+
+def add_output_parameters(algorithm, description, input_name=None, discrete=False):
+    """
+    Add the output mode parameters and the output sink to an algorithm
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm with an OUTPUT attribute
+    description : str
+        Description of the output sink
+    input_name : str or None
+        Name of the input parameter the results belong to
+        If None, algorithm.INPUT is used
+    discrete : bool
+        Whether results are counts stored in integer fields, see
+        add_output_type_parameters
+    """
+    algorithm.addParameter(
+        QgsProcessingParameterEnum(
+            OUTPUT_MODE,
+            "Output mode",
+            options=OUTPUT_MODES,
+            defaultValue=NEW_LAYER,
+        )
+    )
+
+    batch_size = QgsProcessingParameterNumber(
+        BATCH_SIZE,
+        "Number of features updated per transaction",
+        type=QgsProcessingParameterNumber.Integer,
+        defaultValue=10000,
+        minValue=1,
+    )
+    batch_size.setFlags(
+        batch_size.flags() | QgsProcessingParameterDefinition.FlagAdvanced
+    )
+    algorithm.addParameter(batch_size)
+
+    id_field = QgsProcessingParameterField(
+        ID_FIELD,
+        "Field identifying features in the table of results, feature id if empty",
+        parentLayerParameterName=input_name or algorithm.INPUT,
+        optional=True,
+    )
+    id_field.setFlags(id_field.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+    algorithm.addParameter(id_field)
+
+    add_output_type_parameters(algorithm, discrete)
+
+    add_style_parameters(algorithm)
+
+    add_file_output_parameters(algorithm)
+
+    algorithm.addParameter(
+        QgsProcessingParameterFeatureSink(
+            algorithm.OUTPUT, description, optional=True, createByDefault=True
+        )
+    )
+
+
+def add_output_type_parameters(algorithm, discrete=False):
+    """
+    Add parameters setting the type and precision of result fields
+
+    Continuous results are stored as double or single precision floats,
+    optionally rounded to a number of decimals. Discrete results are stored
+    as 32 or 16-bit integers. Fields of other types, e.g. identifiers, keep
+    their type. Only GeoParquet and Arrow files store the narrower types,
+    OGR formats such as GeoPackage and memory layers keep double and 32-bit
+    integer fields, holding values of the chosen precision.
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm to add the parameters to
+    discrete : bool
+        Whether results are counts stored in integer fields
+    """
+    output_type = QgsProcessingParameterEnum(
+        OUTPUT_TYPE,
+        "Type of result fields (narrower types in GeoParquet and Arrow files only)",
+        options=list(INTEGER_TYPES if discrete else FLOAT_TYPES),
+        defaultValue=0,
+    )
+    output_type.setFlags(
+        output_type.flags() | QgsProcessingParameterDefinition.FlagAdvanced
+    )
+    algorithm.addParameter(output_type)
+    if discrete:
+        return
+
+    decimals = QgsProcessingParameterNumber(
+        DECIMALS,
+        "Number of decimals results are rounded to, -1 to keep all",
+        type=QgsProcessingParameterNumber.Integer,
+        defaultValue=-1,
+        minValue=-1,
+    )
+    decimals.setFlags(decimals.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+    algorithm.addParameter(decimals)
+
+
+def cast_results(algorithm, parameters, context, fields, values):
+    """
+    Cast result fields and their values to the type chosen for the algorithm
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm with output type parameters
+    parameters : dict
+        Parameters of the algorithm
+    context : QgsProcessingContext
+        Processing context
+    fields : list of QgsField
+        Result fields
+    values : list
+        Sequence of values for each field
+
+    Returns:
+    --------
+    list of QgsField, list
+        Fields with the precision of rounded results, and values of the type
+        as np.ndarray of floats or pd.arrays.IntegerArray with missing
+        values masked
+    """
+    import numpy as np
+    import pandas as pd
+
+    definition = algorithm.parameterDefinition(OUTPUT_TYPE)
+    if definition is None:
+        return fields, values
+    option = definition.options()[
+        algorithm.parameterAsEnum(parameters, OUTPUT_TYPE, context)
+    ]
+    decimals = -1
+    if algorithm.parameterDefinition(DECIMALS) is not None:
+        decimals = algorithm.parameterAsInt(parameters, DECIMALS, context)
+
+    cast_fields = []
+    cast_values = []
+    for field, column in zip(fields, values):
+        if option in FLOAT_TYPES and field.type() == QVariant.Double:
+            dtype = FLOAT_TYPES[option]
+            column = np.asarray(column, dtype=np.float64)
+            if decimals >= 0:
+                column = column.round(decimals)
+            column = column.astype(dtype)
+            # OGR ignores narrower type names of fields, only the file output
+            # stores the type
+            field = QgsField(field.name(), QVariant.Double, "", 0, max(decimals, 0))
+        elif option in INTEGER_TYPES and field.type() == QVariant.Int:
+            dtype = INTEGER_TYPES[option]
+            column = np.asarray(column, dtype=np.float64)
+            missing = np.isnan(column)
+            limits = np.iinfo(dtype)
+            present = column[~missing]
+            if ((present < limits.min) | (present > limits.max)).any():
+                raise QgsProcessingException(
+                    f"Values of {field.name()} do not fit into {dtype}, "
+                    "choose a wider type of result fields."
+                )
+            column = pd.arrays.IntegerArray(
+                np.where(missing, 0, column).astype(dtype), missing
+            )
+        cast_fields.append(field)
+        cast_values.append(column)
+    return cast_fields, cast_values
+
+
+def _array(column):
+    """Keep nullable pandas arrays of results, other columns as np.ndarray."""
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(column, pd.arrays.IntegerArray):
+        return column
+    return np.asarray(column)
+
+
+def add_file_output_parameters(algorithm):
+    """
+    Add parameters for writing the results directly to a GeoParquet or Arrow
+    IPC file
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm to add the parameters to
+    """
+    algorithm.addParameter(
+        QgsProcessingParameterFileDestination(
+            FILE_OUTPUT,
+            "GeoParquet or Arrow IPC file",
+            fileFilter="GeoParquet (*.parquet);;Arrow IPC (*.arrow *.feather)",
+            optional=True,
+            createByDefault=False,
+        )
+    )
+
+    compression = QgsProcessingParameterEnum(
+        COMPRESSION,
+        "File compression",
+        options=COMPRESSIONS,
+        defaultValue=0,
+    )
+    compression.setFlags(
+        compression.flags() | QgsProcessingParameterDefinition.FlagAdvanced
+    )
+    algorithm.addParameter(compression)
+
+    row_group_size = QgsProcessingParameterNumber(
+        ROW_GROUP_SIZE,
+        "Number of rows per row group (record batch) of the file",
+        type=QgsProcessingParameterNumber.Integer,
+        defaultValue=100000,
+        minValue=1,
+    )
+    row_group_size.setFlags(
+        row_group_size.flags() | QgsProcessingParameterDefinition.FlagAdvanced
+    )
+    algorithm.addParameter(row_group_size)
+
+
+def write_file(algorithm, parameters, context, feedback, dataframe, crs):
+    """
+    Write a GeoDataFrame to the GeoParquet or Arrow IPC file if requested
+
+    The format is chosen by the file extension, .arrow, .feather and .ipc
+    files are written as Arrow IPC, anything else as GeoParquet.
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm with file output parameters
+    parameters : dict
+        Parameters of the algorithm
+    context : QgsProcessingContext
+        Processing context
+    feedback : QgsProcessingFeedback
+        Processing feedback
+    dataframe : gpd.GeoDataFrame
+        Results to write
+    crs : QgsCoordinateReferenceSystem
+        CRS of the results, used if dataframe has none
+
+    Returns:
+    --------
+    dict
+        Path of the written file under FILE_OUTPUT, empty if no file was requested
+    """
+    path = algorithm.parameterAsFileOutput(parameters, FILE_OUTPUT, context)
+    if not path:
+        return {}
+
+    compression = COMPRESSIONS[
+        algorithm.parameterAsEnum(parameters, COMPRESSION, context)
+    ]
+    row_group_size = algorithm.parameterAsInt(parameters, ROW_GROUP_SIZE, context)
+    if dataframe.crs is None and crs.isValid():
+        dataframe = dataframe.set_crs(crs.toWkt())
+
+    if path.lower().endswith(ARROW_EXTENSIONS):
+        if compression in ("snappy", "gzip"):
+            raise QgsProcessingException(
+                "Arrow IPC files support only zstd and lz4 compression."
+            )
+        dataframe.to_feather(
+            path,
+            compression="uncompressed" if compression == "none" else compression,
+            chunksize=row_group_size,
+        )
+    else:
+        dataframe.to_parquet(
+            path,
+            compression=None if compression == "none" else compression,
+            row_group_size=row_group_size,
+        )
+
+    feedback.pushInfo(f"{len(dataframe)} rows written to {path}.")
+    return {FILE_OUTPUT: path}
+
+
+def _results_dataframe(fields, values, geometry, parts=None):
+    """
+    Combine computed values with geometry indexed by feature id, or with the
+    feature id and part number of exploded parts.
+    """
+    import geopandas as gpd
+
+    data = {field.name(): _array(column) for field, column in zip(fields, values)}
+    index = geometry.index if parts is None else parts.get_level_values(0)
+    dataframe = gpd.GeoDataFrame(data, geometry=geometry.geometry.array, index=index)
+    if parts is not None:
+        dataframe.insert(0, "part", parts.get_level_values(1))
+    return dataframe.rename_axis("source_fid").reset_index()
+
+
+def _exploded_parts(algorithm, parameters, context, geometry):
+    """
+    Get the feature id and part number of each row of exploded geometry, None
+    if multipart geometries were not exploded.
+    """
+    parts = geometry.attrs.get(SOURCE_PARTS)
+    if parts is not None:
+        return parts[geometry.index.to_numpy()]
+    # Derived geometries may have lost the parts of their rows
+    if algorithm.parameterDefinition(MULTIPART) is not None:
+        multipart = algorithm.parameterAsEnum(parameters, MULTIPART, context)
+        if multipart == EXPLODE_PARTS:
+            raise QgsProcessingException(
+                f"{algorithm.displayName()} cannot write results for parts of "
+                "multipart geometries, choose another handling of multipart "
+                "geometries."
+            )
+    return None
+
+
+def _source_geometry(source, geometry):
+    """Project geometry back to the CRS of the source."""
+    crs = source.sourceCrs()
+    if geometry.crs is not None and crs.isValid():
+        return geometry.to_crs(crs.toWkt())
+    return geometry
+
+
+def _reordered(algorithm, parameters, context, source, geometry):
+    """Check whether values are not in the order of all source features."""
+    if len(geometry) != source.featureCount() or SOURCE_IDS in geometry.attrs:
+        return True
+    # Derived geometries may have lost the ids of the spatial order
+    if algorithm.parameterDefinition(SPATIAL_ORDER) is None:
+        return False
+    order = algorithm.parameterAsEnum(parameters, SPATIAL_ORDER, context)
+    return order != PROVIDER_ORDER
+
+
+def _align_values(source, values, index, feature_ids=None):
+    """
+    Spread values computed for a subset of features, or in another order, to
+    all features in the order of the source. Feature ids are read from the
+    source unless given.
+    """
+    import pandas as pd
+
+    if feature_ids is None or len(feature_ids) != source.featureCount():
+        request = QgsFeatureRequest()
+        request.setFlags(QgsFeatureRequest.NoGeometry)
+        request.setNoAttributes()
+        feature_ids = [feature.id() for feature in source.getFeatures(request)]
+    return [
+        _array(pd.Series(_array(column), index=index).reindex(feature_ids).array)
+        for column in values
+    ]
+
+
+def _attribute_values(column):
+    """Convert a column of results to Python values, NaN to None (NULL)."""
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(column, pd.arrays.IntegerArray):
+        return column.to_numpy(dtype=object, na_value=None).tolist()
+    # Single precision floats would carry the digits of their binary fraction
+    # into double fields, e.g. 0.1 as 0.10000000149
+    if getattr(column, "dtype", None) == np.float32:
+        column = _significant(column.astype(np.float64), 7)
+    if hasattr(column, "tolist"):
+        column = column.tolist()
+    return [None if value != value else value for value in column]
+
+
+def _significant(values, digits):
+    """Round values to significant digits."""
+    import numpy as np
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        magnitude = np.floor(np.log10(np.abs(values)))
+    scale = 10.0 ** (digits - 1 - np.nan_to_num(magnitude, neginf=0, posinf=0))
+    return np.round(values * scale) / scale
+
+
+def write_results(
+    algorithm,
+    parameters,
+    context,
+    feedback,
+    source,
+    fields,
+    values,
+    input_name=None,
+    geometry=None,
+):
+    """
+    Write computed values to the output chosen by the output mode
+
+    Either copies the source with the new fields appended, adds the new
+    fields to the input layer and writes only their values, or creates a
+    table without geometry holding the feature id and the new fields, which
+    can be joined back to the source layer. Independently of the mode, the
+    feature ids, new fields and geometry can be written to a GeoParquet or
+    Arrow IPC file, in which case the output sink may be skipped. If the
+    input was itself registered, the converted input with the new fields is
+    registered as the output layer, so that algorithms reading it later in a
+    model skip the conversion.
+    Fields and values are first cast to the type of result fields chosen for
+    the algorithm. Summary statistics of the results are added to the
+    results and can be used to style the output.
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm writing the results
+    parameters : dict
+        Parameters of the algorithm
+    context : QgsProcessingContext
+        Processing context
+    feedback : QgsProcessingFeedback
+        Processing feedback
+    source : QgsProcessingFeatureSource
+        Source the values were computed from
+    fields : list of QgsField
+        New fields
+    values : list
+        Sequence of values for each new field, in the order of source features
+        or of geometry, e.g. a spatial order
+    input_name : str or None
+        Name of the input parameter of source
+        If None, algorithm.INPUT is used
+    geometry : gpd.GeoSeries or gpd.GeoDataFrame or None
+        Geometry of source features indexed by feature id, needed for the file
+        output and for values computed for a subset of features
+
+    Returns:
+    --------
+    dict
+        Results of the algorithm
+    """
+    fields, values = cast_results(algorithm, parameters, context, fields, values)
+    mode = algorithm.parameterAsEnum(parameters, OUTPUT_MODE, context)
+
+    results = {}
+    parts = None
+    if geometry is not None:
+        parts = _exploded_parts(algorithm, parameters, context, geometry)
+        if parts is not None and mode == IN_PLACE:
+            raise QgsProcessingException(
+                "Results for parts of multipart geometries cannot be added to "
+                "the input layer, create a new layer or a table instead."
+            )
+        # Projection drops the attributes of series
+        reordered = _reordered(algorithm, parameters, context, source, geometry)
+        feature_ids = geometry.attrs.get(SOURCE_IDS)
+        # Geometry may have been projected for the computation
+        geometry = _source_geometry(source, geometry)
+        results = write_file(
+            algorithm,
+            parameters,
+            context,
+            feedback,
+            _results_dataframe(fields, values, geometry, parts),
+            source.sourceCrs(),
+        )
+
+    # Features skipped by the computation get NULL values and features sorted
+    # in spatial order are written back in the order of the source
+    if parts is None and geometry is not None and reordered:
+        values = _align_values(source, values, geometry.index, feature_ids)
+
+    aligned_values = values
+    values = [_attribute_values(column) for column in values]
+
+    if parts is not None:
+        results.update(
+            _write_parts(
+                algorithm,
+                parameters,
+                context,
+                feedback,
+                source,
+                fields,
+                values,
+                results,
+                parts,
+                geometry,
+                table=mode == TABLE,
+            )
+        )
+    elif mode == IN_PLACE:
+        results.update(
+            _update_in_place(
+                algorithm,
+                parameters,
+                context,
+                feedback,
+                source,
+                fields,
+                values,
+                input_name or algorithm.INPUT,
+            )
+        )
+    elif mode == TABLE:
+        results.update(
+            _write_table(
+                algorithm,
+                parameters,
+                context,
+                feedback,
+                source,
+                fields,
+                values,
+                results,
+            )
+        )
+    else:
+        results.update(
+            _write_copy(
+                algorithm,
+                parameters,
+                context,
+                feedback,
+                source,
+                fields,
+                values,
+                results,
+            )
+        )
+
+    if feedback.isCanceled():
+        return results
+    layer = algorithm.parameterAsVectorLayer(
+        parameters, input_name or algorithm.INPUT, context
+    )
+
+    # Keep the converted features for algorithms reading the output later
+    if mode != TABLE and parts is None and algorithm.OUTPUT in results:
+        _register_output(
+            layer, results[algorithm.OUTPUT], context, source, fields, aligned_values
+        )
+
+    # Summarise the results written, so that styling needs no layer scan
+    write_statistics(
+        algorithm,
+        parameters,
+        context,
+        feedback,
+        fields,
+        aligned_values,
+        layer if mode == IN_PLACE else None,
+        results,
+        style=mode != TABLE,
+    )
+    return results
+
+
+def _register_output(layer, dest_id, context, source, fields, values):
+    """Register the converted input layer with the new fields as the output."""
+    dataframe = None if layer is None else registered_layer(layer.id())
+    if dataframe is None or len(dataframe) != source.featureCount():
+        return
+    if any(len(column) != len(dataframe) for column in values):
+        return
+
+    dataframe = dataframe.copy()
+    for field, column in zip(fields, values):
+        dataframe[field.name()] = _array(column)
+    register_layer(dest_id, dataframe, context)
+
+
+def check_sink(algorithm, parameters, sink, results):
+    """
+    Check whether features should be written to the output sink
+
+    The sink may be skipped only if other results were written, e.g. to a file.
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm with an OUTPUT attribute
+    parameters : dict
+        Parameters of the algorithm
+    sink : QgsFeatureSink or None
+        Sink returned by parameterAsSink
+    results : dict
+        Results written so far
+
+    Returns:
+    --------
+    bool
+    """
+    if sink is not None:
+        return True
+    if results:
+        return False
+    raise QgsProcessingException(
+        algorithm.invalidSinkError(parameters, algorithm.OUTPUT)
+    )
+
+
+def write_copy(
+    algorithm,
+    parameters,
+    context,
+    feedback,
+    source,
+    fields,
+    values,
+    output_name,
+    geometry,
+    results,
+):
+    """
+    Copy the features of a source with new fields to an additional output
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm writing the results
+    parameters : dict
+        Parameters of the algorithm
+    context : QgsProcessingContext
+        Processing context
+    feedback : QgsProcessingFeedback
+        Processing feedback
+    source : QgsProcessingFeatureSource
+        Source the values were computed for
+    fields : list of QgsField
+        New fields
+    values : list
+        Sequence of values for each new field, in the order of geometry
+    output_name : str
+        Name of the output sink parameter
+    geometry : gpd.GeoSeries or gpd.GeoDataFrame
+        Geometry of source features indexed by feature id
+    results : dict
+        Results written so far, the output may be skipped if there are any
+
+    Returns:
+    --------
+    dict
+        Destination id of the output under output_name, empty if skipped
+    """
+    parts = _exploded_parts(algorithm, parameters, context, geometry)
+    if parts is not None:
+        return _write_parts(
+            algorithm,
+            parameters,
+            context,
+            feedback,
+            source,
+            fields,
+            [_attribute_values(column) for column in values],
+            results,
+            parts,
+            _source_geometry(source, geometry),
+            output_name,
+        )
+    if _reordered(algorithm, parameters, context, source, geometry):
+        values = _align_values(
+            source, values, geometry.index, geometry.attrs.get(SOURCE_IDS)
+        )
+    values = [_attribute_values(column) for column in values]
+    return _write_copy(
+        algorithm,
+        parameters,
+        context,
+        feedback,
+        source,
+        fields,
+        values,
+        results,
+        output_name,
+    )
+
+
+def _write_copy(
+    algorithm,
+    parameters,
+    context,
+    feedback,
+    source,
+    fields,
+    values,
+    results,
+    output_name=None,
+):
+    output_name = output_name or algorithm.OUTPUT
+
+    # Create output fields (original fields + new fields)
+    output_fields = source.fields()
+    for field in fields:
+        output_fields.append(field)
+
+    # Create sink
+    (sink, dest_id) = algorithm.parameterAsSink(
+        parameters,
+        output_name,
+        context,
+        output_fields,
+        source.wkbType(),
+        source.sourceCrs(),
+    )
+    if not check_sink(algorithm, parameters, sink, results):
+        return {}
+
+    # Get features from source
+    features = source.getFeatures()
+    total = 100.0 / source.featureCount() if source.featureCount() else 0
+
+    # Process each feature directly
+    for current, feature in enumerate(features):
+        if feedback.isCanceled():
+            break
+
+        # Create output feature
+        output_feature = QgsFeature(output_fields)
+        output_feature.setGeometry(feature.geometry())
+
+        # Copy attributes and add new values
+        attributes = feature.attributes()
+        attributes.extend(column[current] for column in values)
+        output_feature.setAttributes(attributes)
+
+        # Add feature to sink
+        sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
+
+        # Update progress
+        feedback.setProgress(int(current * total))
+
+    return {output_name: dest_id}
+
+
+def _write_parts(
+    algorithm,
+    parameters,
+    context,
+    feedback,
+    source,
+    fields,
+    values,
+    results,
+    parts,
+    geometry,
+    output_name=None,
+    table=False,
+):
+    """
+    Write results of exploded multipart geometries, one feature for each part
+
+    Parts are written with the attributes of their feature and their part
+    number, or as a table of the feature id, or the id field, and the part
+    number. Features skipped by the computation, with null or empty
+    geometry, are written once with NULL values.
+    """
+    output_name = output_name or algorithm.OUTPUT
+
+    # Create output fields (original fields or id, part number, new fields)
+    request = QgsFeatureRequest()
+    id_field = None
+    if table:
+        output_fields = QgsFields()
+        request.setFlags(QgsFeatureRequest.NoGeometry)
+        id_field = algorithm.parameterAsString(parameters, ID_FIELD, context)
+        if id_field:
+            id_index = source.fields().lookupField(id_field)
+            output_fields.append(source.fields().field(id_index))
+            request.setSubsetOfAttributes([id_index])
+        else:
+            output_fields.append(QgsField("source_fid", QVariant.LongLong))
+            request.setNoAttributes()
+    else:
+        output_fields = source.fields()
+    output_fields.append(QgsField("part", QVariant.Int))
+    for field in fields:
+        output_fields.append(field)
+
+    # Create sink, parts are single part geometries
+    (sink, dest_id) = algorithm.parameterAsSink(
+        parameters,
+        output_name,
+        context,
+        output_fields,
+        QgsWkbTypes.NoGeometry if table else QgsWkbTypes.singleType(source.wkbType()),
+        source.sourceCrs(),
+    )
+    if not check_sink(algorithm, parameters, sink, results):
+        return {}
+
+    # Rows of the parts of each feature, by part number
+    feature_ids = parts.get_level_values(0).tolist()
+    part_numbers = parts.get_level_values(1).tolist()
+    rows = {}
+    for row in sorted(range(len(parts)), key=part_numbers.__getitem__):
+        rows.setdefault(feature_ids[row], []).append(row)
+    part_geometries = geometry.geometry.array
+    missing = [None] * (len(fields) + 1)
+
+    total = 100.0 / source.featureCount() if source.featureCount() else 0
+    for current, feature in enumerate(source.getFeatures(request)):
+        if feedback.isCanceled():
+            break
+
+        if not table:
+            attributes = feature.attributes()
+        else:
+            attributes = [feature[id_index] if id_field else feature.id()]
+        for row in rows.get(feature.id(), [None]):
+            output_feature = QgsFeature(output_fields)
+            if row is None:
+                output_feature.setAttributes(attributes + missing)
+            else:
+                if not table:
+                    output_feature.setGeometry(
+                        QgsGeometry.fromWkt(part_geometries[row].wkt)
+                    )
+                output_feature.setAttributes(
+                    attributes
+                    + [part_numbers[row]]
+                    + [column[row] for column in values]
+                )
+            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
+
+        feedback.setProgress(int(current * total))
+
+    return {output_name: dest_id}
+
+
+def _write_table(
+    algorithm, parameters, context, feedback, source, fields, values, results
+):
+    id_field = algorithm.parameterAsString(parameters, ID_FIELD, context)
+
+    # Create output fields (id + new fields)
+    output_fields = QgsFields()
+    request = QgsFeatureRequest()
+    request.setFlags(QgsFeatureRequest.NoGeometry)
+    if id_field:
+        id_index = source.fields().lookupField(id_field)
+        output_fields.append(source.fields().field(id_index))
+        request.setSubsetOfAttributes([id_index])
+    else:
+        output_fields.append(QgsField("source_fid", QVariant.LongLong))
+        request.setNoAttributes()
+    for field in fields:
+        output_fields.append(field)
+
+    # Create sink without geometry
+    (sink, dest_id) = algorithm.parameterAsSink(
+        parameters,
+        algorithm.OUTPUT,
+        context,
+        output_fields,
+        QgsWkbTypes.NoGeometry,
+        source.sourceCrs(),
+    )
+    if not check_sink(algorithm, parameters, sink, results):
+        return {}
+
+    total = 100.0 / source.featureCount() if source.featureCount() else 0
+
+    # Only the identifier of source features is read
+    for current, feature in enumerate(source.getFeatures(request)):
+        if feedback.isCanceled():
+            break
+
+        output_feature = QgsFeature(output_fields)
+        attributes = [feature[id_index] if id_field else feature.id()]
+        attributes.extend(column[current] for column in values)
+        output_feature.setAttributes(attributes)
+        sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
+
+        feedback.setProgress(int(current * total))
+
+    return {algorithm.OUTPUT: dest_id}
+
+
+def _update_in_place(
+    algorithm, parameters, context, feedback, source, fields, values, input_name
+):
+    layer = algorithm.parameterAsVectorLayer(parameters, input_name, context)
+    if layer is None:
+        raise QgsProcessingException(
+            "Adding fields to the input layer requires a vector layer as input."
+        )
+    if layer.isEditable():
+        raise QgsProcessingException(
+            f"Layer {layer.name()} is in edit mode, save or discard the edits first."
+        )
+
+    provider = layer.dataProvider()
+    required = QgsVectorDataProvider.AddAttributes
+    required |= QgsVectorDataProvider.ChangeAttributeValues
+    if provider.capabilities() & required != required:
+        raise QgsProcessingException(
+            f"Layer {layer.name()} does not support adding and changing fields."
+        )
+
+    # Add fields which are not present yet, existing ones are overwritten
+    new_fields = [
+        field for field in fields if provider.fields().indexOf(field.name()) == -1
+    ]
+    if new_fields:
+        if not provider.addAttributes(new_fields):
+            raise QgsProcessingException(
+                f"Could not add fields to {layer.name()}: "
+                + "; ".join(provider.errors())
+            )
+        layer.updateFields()
+    indices = [provider.fields().indexOf(field.name()) for field in fields]
+
+    # Only feature ids are needed to write the values
+    batch_size = algorithm.parameterAsInt(parameters, BATCH_SIZE, context)
+    request = QgsFeatureRequest()
+    request.setFlags(QgsFeatureRequest.NoGeometry)
+    request.setNoAttributes()
+    total = 100.0 / source.featureCount() if source.featureCount() else 0
+
+    # Write values in batches, each batch is a single provider transaction
+    changes = {}
+    for current, feature in enumerate(source.getFeatures(request)):
+        if feedback.isCanceled():
+            break
+
+        changes[feature.id()] = {
+            index: column[current] for index, column in zip(indices, values)
+        }
+        if len(changes) >= batch_size:
+            _change_attribute_values(provider, layer, changes)
+            changes = {}
+            feedback.setProgress(int(current * total))
+
+    if changes:
+        _change_attribute_values(provider, layer, changes)
+
+    layer.triggerRepaint()
+    return {algorithm.OUTPUT: layer.id()}
+
+
+def _change_attribute_values(provider, layer, changes):
+    if not provider.changeAttributeValues(changes):
+        raise QgsProcessingException(
+            f"Could not write values to {layer.name()}: "
+            + "; ".join(provider.errors())
+        )
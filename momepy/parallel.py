@@ -0,0 +1,342 @@
+import os
+import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+from multiprocessing import shared_memory
+
+from qgis.core import QgsProcessingParameterDefinition, QgsProcessingParameterNumber
+
+WORKERS = "WORKERS"
+
+# Arrays attached from shared memory in a worker process
+_shared = {}
+
+
+def python_executable():
+    """
+    Find the Python interpreter used to spawn worker processes
+
+    Inside QGIS ``sys.executable`` points to the QGIS binary, which cannot be
+    used to start a worker. Look for the interpreter QGIS is bundled with.
+
+    Returns:
+    --------
+    str
+    """
+    executable = os.path.basename(sys.executable).lower()
+    if executable.startswith("python"):
+        return sys.executable
+
+    candidates = [
+        os.path.join(sys.exec_prefix, "pythonw.exe"),
+        os.path.join(sys.exec_prefix, "python.exe"),
+        os.path.join(sys.exec_prefix, "bin", "python3"),
+        os.path.join(sys.exec_prefix, "bin", "python"),
+    ]
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+    return sys.executable
+
+
+def split(items, parts):
+    """
+    Split a sequence into at most ``parts`` contiguous, non-empty chunks
+
+    Parameters:
+    -----------
+    items : sequence
+        Items to split
+    parts : int
+        Number of chunks
+
+    Returns:
+    --------
+    list
+    """
+    parts = max(1, min(parts, len(items)))
+    size, remainder = divmod(len(items), parts)
+    chunks = []
+    start = 0
+    for part in range(parts):
+        stop = start + size + (1 if part < remainder else 0)
+        chunks.append(items[start:stop])
+        start = stop
+    return [chunk for chunk in chunks if len(chunk)]
+
+
+def map_chunks(
+    function,
+    chunks,
+    workers=1,
+    initializer=None,
+    initargs=(),
+    feedback=None,
+    callback=None,
+):
+    """
+    Apply a function to each chunk, optionally in separate processes
+
+    ``function`` and ``initializer`` must be importable module-level functions.
+    ``initializer`` is called once per worker process (or once in the current
+    process when running serially) and is the place to hand over large shared
+    state, so that it is pickled once per worker rather than once per chunk.
+
+    Parameters:
+    -----------
+    function : callable
+        Function applied to each chunk
+    chunks : list
+        Chunks of work
+    workers : int
+        Number of worker processes, 1 runs in the current process
+    initializer : callable or None
+        Function setting up the state of each worker
+    initargs : tuple
+        Arguments passed to ``initializer``
+    feedback : QgsProcessingFeedback or None
+        Feedback used for progress reporting and cancellation
+    callback : callable or None
+        Called in the current process with each result as soon as its chunk
+        is finished, in the order chunks finish
+
+    Returns:
+    --------
+    list
+        Results in the order of ``chunks``. When cancelled, the results of
+        unfinished chunks are None.
+    """
+    results = [None] * len(chunks)
+    total = 100.0 / len(chunks) if chunks else 0
+
+    if workers <= 1 or len(chunks) <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for current, chunk in enumerate(chunks):
+            if feedback is not None and feedback.isCanceled():
+                break
+            results[current] = function(chunk)
+            if callback is not None:
+                callback(results[current])
+            if feedback is not None:
+                feedback.setProgress(int((current + 1) * total))
+        return results
+
+    context = multiprocessing.get_context("spawn")
+    context.set_executable(python_executable())
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=initializer,
+        initargs=initargs,
+    ) as executor:
+        futures = {
+            executor.submit(function, chunk): current
+            for current, chunk in enumerate(chunks)
+        }
+        pending = set(futures)
+        done = 0
+        while pending:
+            finished, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in finished:
+                results[futures[future]] = future.result()
+                if callback is not None:
+                    callback(results[futures[future]])
+                done += 1
+            if feedback is not None:
+                feedback.setProgress(int(done * total))
+                if feedback.isCanceled():
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    break
+
+    return results
+
+
+def add_workers_parameter(algorithm):
+    """
+    Add the parameter setting the number of worker processes
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm to add the parameter to
+    """
+    workers = QgsProcessingParameterNumber(
+        WORKERS,
+        "Number of worker processes",
+        type=QgsProcessingParameterNumber.Integer,
+        defaultValue=1,
+        minValue=1,
+    )
+    workers.setFlags(workers.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+    algorithm.addParameter(workers)
+
+
+def map_geometry(
+    function,
+    geometry,
+    columns=None,
+    outputs=None,
+    workers=1,
+    feedback=None,
+    chunk_size=None,
+    **kwargs,
+):
+    """
+    Apply a momepy function to geometries, optionally in worker processes
+
+    Workers do not receive pickled geometries. The geometries are packed as
+    WKB into one contiguous buffer in shared memory with an array of offsets,
+    per-feature input columns are shared as float64 arrays and workers write
+    into a shared float64 result array. Each worker parses only the WKB of
+    its chunk, read directly from the shared buffer.
+
+    Parameters:
+    -----------
+    function : callable
+        Importable module-level function taking a GeoSeries, e.g. a momepy
+        function
+    geometry : gpd.GeoSeries or gpd.GeoDataFrame
+        Geometries to compute the function for
+    columns : dict or None
+        Per-feature numeric arguments of function, keyed by argument name
+    outputs : list or None
+        Column names if function returns a DataFrame
+        If None, function returns a Series
+    workers : int
+        Number of worker processes, 1 calls function in the current process
+    feedback : QgsProcessingFeedback or None
+        Feedback used for progress reporting and cancellation
+    chunk_size : int or None
+        Largest number of geometries function is applied to at once, which
+        bounds its working memory. If None, all geometries are passed at once
+        when running in the current process.
+    **kwargs
+        Scalar arguments of function
+
+    Returns:
+    --------
+    pd.Series or pd.DataFrame
+        Indexed like geometry, NaN for chunks not computed when cancelled
+    """
+    import numpy as np
+    import pandas as pd
+    import shapely as shp
+
+    columns = columns or {}
+    if chunk_size is None or chunk_size >= len(geometry):
+        chunk_size = len(geometry)
+    if workers <= 1 or len(geometry) < 2:
+        if chunk_size >= len(geometry):
+            return function(geometry, **columns, **kwargs)
+        results = map_chunks(
+            partial(_apply_slice, function, geometry, columns, kwargs),
+            [
+                (start, min(start + chunk_size, len(geometry)))
+                for start in range(0, len(geometry), chunk_size)
+            ],
+            feedback=feedback,
+        )
+        results = [result for result in results if result is not None]
+        if not results:
+            results = [_apply_slice(function, geometry, columns, kwargs, (0, 0))]
+        return pd.concat(results).reindex(geometry.index)
+
+    # Pack geometries to WKB with offsets, missing geometries have no bytes
+    wkb = shp.to_wkb(np.asarray(geometry.geometry.array))
+    lengths = np.array([0 if b is None else len(b) for b in wkb], dtype=np.int64)
+    offsets = np.zeros(len(wkb) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    shape = (len(wkb),) if outputs is None else (len(wkb), len(outputs))
+    arrays = {
+        "wkb": np.frombuffer(b"".join(b for b in wkb if b is not None), np.uint8),
+        "offsets": offsets,
+        "result": np.full(shape, np.nan),
+    }
+    for name, column in columns.items():
+        arrays[name] = np.asarray(column, dtype=np.float64)
+
+    blocks, specs = _share(arrays)
+    try:
+        chunks = [
+            (chunk[0], chunk[-1] + 1)
+            for chunk in split(
+                np.arange(len(wkb)), max(workers * 4, -(-len(wkb) // chunk_size))
+            )
+        ]
+        map_chunks(
+            partial(_apply_shared, function, list(columns), kwargs),
+            chunks,
+            workers=workers,
+            initializer=_attach_shared,
+            initargs=(specs,),
+            feedback=feedback,
+        )
+        result = np.ndarray(shape, np.float64, buffer=blocks[-1].buf).copy()
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    if outputs is None:
+        return pd.Series(result, index=geometry.index)
+    return pd.DataFrame(result, index=geometry.index, columns=outputs)
+
+
+def _apply_slice(function, geometry, columns, kwargs, chunk):
+    start, stop = chunk
+    columns = {
+        name: column.iloc[start:stop] if hasattr(column, "iloc") else column[start:stop]
+        for name, column in columns.items()
+    }
+    return function(geometry.iloc[start:stop], **columns, **kwargs)
+
+
+def _share(arrays):
+    """Copy arrays to new shared memory blocks, the result array last."""
+    import numpy as np
+
+    blocks = []
+    specs = {}
+    for name in sorted(arrays, key=lambda name: name == "result"):
+        array = arrays[name]
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, specs
+
+
+def _attach_shared(specs):
+    import numpy as np
+
+    _shared.clear()
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        # Keep the block open as long as the array view is used
+        _shared[name] = (block, np.ndarray(shape, dtype, buffer=block.buf))
+
+
+def _apply_shared(function, column_names, kwargs, chunk):
+    import numpy as np
+    import geopandas as gpd
+    import shapely as shp
+
+    start, stop = chunk
+    offsets = _shared["offsets"][1]
+    buffer = _shared["wkb"][1]
+    wkb = np.array(
+        [
+            bytes(buffer[offsets[i] : offsets[i + 1]]) or None
+            for i in range(start, stop)
+        ],
+        dtype=object,
+    )
+    geometry = gpd.GeoSeries(shp.from_wkb(wkb))
+    columns = {name: _shared[name][1][start:stop] for name in column_names}
+
+    result = function(geometry, **columns, **kwargs)
+    _shared["result"][1][start:stop] = np.asarray(result, dtype=np.float64)
+    return stop - start
@@ -0,0 +1,215 @@
+import os
+
+from qgis.core import (
+    QgsFeatureRequest,
+    QgsProcessingParameterDefinition,
+    QgsProcessingParameterNumber,
+)
+
+MEMORY_BUDGET = "MEMORY_BUDGET"
+
+# Features sampled to estimate the number of vertices and the length
+SAMPLE_SIZE = 1000
+# Metres per degree at the equator, for lengths of geographic layers
+DEGREE_LENGTH = 111320.0
+
+# Memory profiles in bytes per feature, per vertex and per metre of boundary
+# or line, rough figures for typical building and street layers.
+# Converted geometry held for the whole run: features read from QGIS, WKB and
+# shapely geometries
+GEOMETRY_PROFILE = (600, 48, 0)
+# Shape and dimension characters: GEOS intermediates such as hulls and
+# bounding rectangles, and result arrays
+SHAPE_PROFILE = (1500, 150, 0)
+# Voronoi diagram of a morphological tessellation, per boundary point
+VORONOI_POINT = 1000
+# Street profile, per tick on either side of a street
+PROFILE_TICK = 1500
+# Tiles take up to half as much again for features around them
+TILE_OVERHEAD = 1.5
+# Smallest number of features per chunk, when even the input barely fits
+MIN_CHUNK_SIZE = 100
+
+
+def add_memory_parameter(algorithm):
+    """
+    Add the parameter setting the memory budget used to plan the execution
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm to add the parameter to
+    """
+    budget = QgsProcessingParameterNumber(
+        MEMORY_BUDGET,
+        "Memory budget in MB, 0 for half of the available memory",
+        type=QgsProcessingParameterNumber.Integer,
+        defaultValue=0,
+        minValue=0,
+    )
+    budget.setFlags(budget.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+    algorithm.addParameter(budget)
+
+
+def memory_budget(algorithm, parameters, context):
+    """
+    Read the memory budget
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm with the memory parameter
+    parameters : dict
+        Parameters of the algorithm
+    context : QgsProcessingContext
+        Processing context
+
+    Returns:
+    --------
+    int or None
+        Budget in bytes, None if it is not set and the available memory is
+        unknown
+    """
+    budget = algorithm.parameterAsInt(parameters, MEMORY_BUDGET, context)
+    if budget > 0:
+        return budget * 2**20
+    available = available_memory()
+    return None if available is None else available // 2
+
+
+def available_memory():
+    """
+    Find the memory available to the process
+
+    Uses psutil if installed, as it is with QGIS on Windows and macOS, and
+    system configuration on other POSIX systems.
+
+    Returns:
+    --------
+    int or None
+        Available memory in bytes, None if unknown
+    """
+    try:
+        import psutil
+
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def sample_geometry(source, size=SAMPLE_SIZE):
+    """
+    Measure the mean number of vertices and length of sampled features
+
+    Reads geometries of the first features only, without attributes.
+
+    Parameters:
+    -----------
+    source : QgsProcessingFeatureSource
+        Source to sample
+    size : int
+        Number of sampled features
+
+    Returns:
+    --------
+    float, float
+        Mean number of vertices and mean length or perimeter in metres
+    """
+    request = QgsFeatureRequest()
+    request.setNoAttributes()
+    request.setLimit(size)
+
+    count = vertices = length = 0
+    for feature in source.getFeatures(request):
+        geometry = feature.geometry()
+        count += 1
+        if geometry.isNull():
+            continue
+        vertices += geometry.constGet().nCoordinates()
+        length += geometry.length()
+
+    if not count:
+        return 0.0, 0.0
+    if source.sourceCrs().isGeographic():
+        length *= DEGREE_LENGTH
+    return vertices / count, length / count
+
+
+def plan_execution(
+    algorithm, parameters, context, feedback, source, profile, tiled=False
+):
+    """
+    Estimate the peak memory of an algorithm and choose how to execute it
+
+    The whole layer is processed at once if the estimate fits into the memory
+    budget, otherwise features are processed in chunks, or in spatial tiles
+    for algorithms where neighbouring features interact, sized to fit. The
+    converted input is held in memory in either case. The estimate and the
+    plan are logged to feedback.
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm with the memory parameter
+    parameters : dict
+        Parameters of the algorithm
+    context : QgsProcessingContext
+        Processing context
+    feedback : QgsProcessingFeedback
+        Processing feedback
+    source : QgsProcessingFeatureSource
+        Main input of the algorithm
+    profile : tuple of float
+        Working memory of the algorithm in bytes per feature, per vertex and
+        per metre of length or perimeter
+    tiled : bool
+        Whether the algorithm is split into spatial tiles rather than chunks
+        of features
+
+    Returns:
+    --------
+    int or None
+        Number of features per chunk or tile, None for the whole layer
+    """
+    count = source.featureCount()
+    if count <= 0:
+        return None
+    vertices, length = sample_geometry(source)
+    sizes = (1, vertices, length)
+    held = count * sum(cost * size for cost, size in zip(GEOMETRY_PROFILE, sizes))
+    working = count * sum(cost * size for cost, size in zip(profile, sizes))
+    budget = memory_budget(algorithm, parameters, context)
+
+    estimate = (
+        f"Estimated peak memory {_megabytes(held + working)} for {count} features "
+        f"with {vertices:.0f} vertices on average"
+    )
+    if budget is None:
+        feedback.pushInfo(f"{estimate}, memory budget unknown: whole layer.")
+        return None
+    estimate += f", budget {_megabytes(budget)}"
+    if held + working <= budget:
+        feedback.pushInfo(f"{estimate}: whole layer.")
+        return None
+
+    per_feature = working / count * (TILE_OVERHEAD if tiled else 1.0)
+    chunk_size = int(max(budget - held, 0) / per_feature) if per_feature else 0
+    if chunk_size >= MIN_CHUNK_SIZE:
+        feedback.pushInfo(
+            f"{estimate}: {'tiles' if tiled else 'chunks'} of {chunk_size} features."
+        )
+        return chunk_size
+    feedback.pushWarning(
+        f"{estimate}: the input barely fits into the budget, processing "
+        f"{'tiles' if tiled else 'chunks'} of {MIN_CHUNK_SIZE} features may run "
+        "out of memory."
+    )
+    return MIN_CHUNK_SIZE if MIN_CHUNK_SIZE < count else None
+
+
+def _megabytes(size):
+    return f"{size / 2**20:.0f} MB"
@@ -0,0 +1,588 @@
+from .output import add_file_output_parameters, check_sink, write_file
+from .utils import qgs_to_gpd, register_layer
+from PyQt5.QtCore import QVariant
+from qgis.core import (
+    QgsField,
+    QgsFields,
+    QgsFeature,
+    QgsGeometry,
+    QgsWkbTypes,
+    QgsProcessing,
+    QgsFeatureSink,
+    QgsProcessingAlgorithm,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterNumber,
+)
+
+
+def _present(geometry):
+    """Mask of geometries which are neither null nor empty."""
+    return (geometry.notna() & ~geometry.is_empty).to_numpy()
+
+
+def _restore(values, present):
+    """Spread results of present geometries to all, null for the others."""
+    import geopandas as gpd
+    import numpy as np
+
+    restored = np.full(len(present), None, dtype=object)
+    restored[present] = np.asarray(values, dtype=object)
+    return gpd.array.from_shapely(restored)
+
+
+def _qgs_geometry(geometry, multi=False):
+    """Convert a shapely geometry, None to a null geometry."""
+    if geometry is None:
+        return QgsGeometry()
+    converted = QgsGeometry.fromWkt(geometry.wkt)
+    if multi:
+        converted.convertToMultiType()
+    return converted
+
+
+class RemoveFalseNodes(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    OUTPUT = "OUTPUT"
+
+    def name(self) -> str:
+        return "remove_false_nodes"
+
+    def displayName(self) -> str:
+        return "Remove false nodes"
+
+    def group(self) -> str:
+        return "Preprocessing"
+
+    def groupId(self) -> str:
+        return "preprocessing"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Merges street segments meeting at nodes of degree 2 into single "
+            "lines. Attributes of merged segments are not preserved."
+        )
+
+    def initAlgorithm(self, configuration=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT,
+                "Input street layer",
+                [QgsProcessing.SourceType.VectorLine],
+            )
+        )
+
+        add_file_output_parameters(self)
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT,
+                "Streets without false nodes",
+                QgsProcessing.TypeVectorLine,
+                optional=True,
+                createByDefault=True,
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+        import geopandas as gpd
+
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+
+        # Convert QGIS source to GeoSeries and merge lines at false nodes
+        line_geometry_series = qgs_to_gpd(source, layer=layer)
+        line_geometry_series = line_geometry_series[_present(line_geometry_series)]
+        cleaned = momepy.remove_false_nodes(line_geometry_series)
+        feedback.pushInfo(
+            f"Number of edges reduced from {source.featureCount()} to {len(cleaned)}."
+        )
+        cleaned_dataframe = gpd.GeoDataFrame(geometry=cleaned.array)
+        results = write_file(
+            self, parameters, context, feedback, cleaned_dataframe, source.sourceCrs()
+        )
+
+        # Merged segments have no single set of attributes, keep geometry only.
+        # Merging may leave multipart lines, so the output is multipart.
+        fields = QgsFields()
+
+        # Create sink
+        (sink, dest_id) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT,
+            context,
+            fields,
+            QgsWkbTypes.MultiLineString,
+            source.sourceCrs(),
+        )
+        if not check_sink(self, parameters, sink, results):
+            return results
+
+        total = 100.0 / len(cleaned) if len(cleaned) else 0
+        for current, geometry in enumerate(cleaned.array):
+            if feedback.isCanceled():
+                break
+
+            feature = QgsFeature(fields)
+            feature.setGeometry(_qgs_geometry(geometry, multi=True))
+            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+
+            feedback.setProgress(int(current * total))
+
+        # Keep the edges for algorithms reading them later in a model
+        if not feedback.isCanceled():
+            register_layer(dest_id, cleaned_dataframe, context)
+
+        results[self.OUTPUT] = dest_id
+        return results
+
+    def createInstance(self):
+        return self.__class__()
+
+
+class ConsolidateIntersections(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    OUTPUT = "OUTPUT"
+    TOLERANCE = "TOLERANCE"
+
+    def name(self) -> str:
+        return "consolidate_intersections"
+
+    def displayName(self) -> str:
+        return "Consolidate intersections"
+
+    def group(self) -> str:
+        return "Preprocessing"
+
+    def groupId(self) -> str:
+        return "preprocessing"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Consolidates clusters of intersections within the tolerance into "
+            "single nodes and rebuilds the street network accordingly."
+        )
+
+    def initAlgorithm(self, configuration=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT,
+                "Input street layer",
+                [QgsProcessing.SourceType.VectorLine],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.TOLERANCE,
+                "Distance within which intersections are consolidated",
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=30.0,
+                minValue=0.0,
+            )
+        )
+
+        add_file_output_parameters(self)
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT,
+                "Streets with consolidated intersections",
+                QgsProcessing.TypeVectorLine,
+                optional=True,
+                createByDefault=True,
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+        import geopandas as gpd
+        import networkx as nx
+
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        tolerance = self.parameterAsDouble(parameters, self.TOLERANCE, context)
+
+        # Convert QGIS source to a graph with the node and edge attributes
+        # consolidate_intersections expects
+        line_geometry_series = qgs_to_gpd(source, layer=layer)
+        line_geometry_series = line_geometry_series[
+            _present(line_geometry_series)
+        ].explode(index_parts=False)
+        graph = momepy.gdf_to_nx(
+            gpd.GeoDataFrame(geometry=line_geometry_series),
+            length="length",
+            integer_labels=True,
+        )
+        nx.set_edge_attributes(
+            graph,
+            {(u, v, k): {"from": u, "to": v} for u, v, k in graph.edges(keys=True)},
+        )
+
+        # Nodes cluster along edges within the tolerance, momepy fails if
+        # there are none, in which case the network is kept as it is
+        if any(
+            data["length"] <= tolerance for _, _, data in graph.edges(data=True)
+        ):
+            graph = momepy.consolidate_intersections(graph, tolerance=tolerance)
+        else:
+            feedback.pushInfo("No intersections within the tolerance.")
+        edges = momepy.nx_to_gdf(graph, points=False)
+        # Rebuilt edges carry their geometry in the new_geometry attribute,
+        # there is no geometry column if all edges were rebuilt
+        if "geometry" not in edges:
+            geometry = edges["new_geometry"]
+        elif "new_geometry" in edges:
+            geometry = edges.geometry.where(
+                edges.geometry.notna(), edges["new_geometry"]
+            )
+        else:
+            geometry = edges.geometry
+        edges = gpd.GeoDataFrame(geometry=gpd.GeoSeries(geometry))
+        feedback.pushInfo(
+            f"Number of edges reduced from {len(line_geometry_series)} to "
+            f"{len(edges)}."
+        )
+        edge_dataframe = gpd.GeoDataFrame(
+            {"length": edges.length.to_numpy()}, geometry=edges.geometry.array
+        )
+        results = write_file(
+            self, parameters, context, feedback, edge_dataframe, source.sourceCrs()
+        )
+
+        # Create output fields
+        fields = QgsFields()
+        fields.append(QgsField("length", QVariant.Double))
+
+        # Create sink
+        (sink, dest_id) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT,
+            context,
+            fields,
+            QgsWkbTypes.MultiLineString,
+            source.sourceCrs(),
+        )
+        if not check_sink(self, parameters, sink, results):
+            return results
+
+        total = 100.0 / len(edges) if len(edges) else 0
+        for current, geometry in enumerate(edges.geometry.array):
+            if feedback.isCanceled():
+                break
+
+            feature = QgsFeature(fields)
+            feature.setGeometry(_qgs_geometry(geometry, multi=True))
+            feature.setAttributes([geometry.length])
+            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+
+            feedback.setProgress(int(current * total))
+
+        # Keep the edges for algorithms reading them later in a model
+        if not feedback.isCanceled():
+            register_layer(dest_id, edge_dataframe, context)
+
+        results[self.OUTPUT] = dest_id
+        return results
+
+    def createInstance(self):
+        return self.__class__()
+
+
+class CloseGaps(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    OUTPUT = "OUTPUT"
+    TOLERANCE = "TOLERANCE"
+
+    def name(self) -> str:
+        return "close_gaps"
+
+    def displayName(self) -> str:
+        return "Close gaps"
+
+    def group(self) -> str:
+        return "Preprocessing"
+
+    def groupId(self) -> str:
+        return "preprocessing"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Snaps line endpoints within the tolerance to their common centroid, "
+            "closing gaps between street segments."
+        )
+
+    def initAlgorithm(self, configuration=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT,
+                "Input street layer",
+                [QgsProcessing.SourceType.VectorLine],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.TOLERANCE,
+                "Distance within which endpoints are snapped together",
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0.25,
+                minValue=0.0,
+            )
+        )
+
+        add_file_output_parameters(self)
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT,
+                "Streets with closed gaps",
+                QgsProcessing.TypeVectorLine,
+                optional=True,
+                createByDefault=True,
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+        import geopandas as gpd
+
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        tolerance = self.parameterAsDouble(parameters, self.TOLERANCE, context)
+
+        # Convert QGIS source to GeoSeries and snap endpoints in bulk, null and
+        # empty lines stay null
+        line_geometry_series = qgs_to_gpd(source, layer=layer)
+        present = _present(line_geometry_series)
+        snapped = momepy.close_gaps(line_geometry_series[present], tolerance)
+        snapped_values = _restore(snapped.array, present)
+        results = write_file(
+            self,
+            parameters,
+            context,
+            feedback,
+            gpd.GeoDataFrame(
+                {"source_fid": line_geometry_series.index}, geometry=snapped_values
+            ),
+            source.sourceCrs(),
+        )
+
+        # Geometries map one to one to input features, keep attributes
+        fields = source.fields()
+
+        # Create sink
+        (sink, dest_id) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT,
+            context,
+            fields,
+            source.wkbType(),
+            source.sourceCrs(),
+        )
+        if not check_sink(self, parameters, sink, results):
+            return results
+
+        # Get features from source
+        features = source.getFeatures()
+        total = 100.0 / source.featureCount() if source.featureCount() else 0
+
+        # Process each feature directly
+        for current, feature in enumerate(features):
+            if feedback.isCanceled():
+                break
+
+            # Create output feature with snapped geometry
+            output_feature = QgsFeature(fields)
+            output_feature.setGeometry(_qgs_geometry(snapped_values[current]))
+            output_feature.setAttributes(feature.attributes())
+
+            # Add feature to sink
+            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
+
+            # Update progress
+            feedback.setProgress(int(current * total))
+
+        results[self.OUTPUT] = dest_id
+        return results
+
+    def createInstance(self):
+        return self.__class__()
+
+
+class ExtendLines(QgsProcessingAlgorithm):
+    INPUT = "INPUT"
+    OUTPUT = "OUTPUT"
+    TOLERANCE = "TOLERANCE"
+    TARGET = "TARGET"
+    BARRIER = "BARRIER"
+    EXTENSION = "EXTENSION"
+
+    def name(self) -> str:
+        return "extend_lines"
+
+    def displayName(self) -> str:
+        return "Extend lines"
+
+    def group(self) -> str:
+        return "Preprocessing"
+
+    def groupId(self) -> str:
+        return "preprocessing"
+
+    def shortHelpString(self) -> str:
+        return (
+            "Extends dangling street segments to the nearest line within the "
+            "tolerance, or to the target layer if given."
+        )
+
+    def initAlgorithm(self, configuration=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT,
+                "Input street layer",
+                [QgsProcessing.SourceType.VectorLine],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.TOLERANCE,
+                "Maximum distance of the extension",
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=10.0,
+                minValue=0.0,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.TARGET,
+                "Target layer to extend the lines to",
+                [
+                    QgsProcessing.SourceType.VectorLine,
+                    QgsProcessing.SourceType.VectorPolygon,
+                ],
+                optional=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.BARRIER,
+                "Barrier layer the extensions cannot cross",
+                [
+                    QgsProcessing.SourceType.VectorLine,
+                    QgsProcessing.SourceType.VectorPolygon,
+                ],
+                optional=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.EXTENSION,
+                "Distance by which the extension exceeds the target",
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0.0,
+                minValue=0.0,
+                optional=True,
+            )
+        )
+
+        add_file_output_parameters(self)
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT,
+                "Extended streets",
+                QgsProcessing.TypeVectorLine,
+                optional=True,
+                createByDefault=True,
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+        import geopandas as gpd
+
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        tolerance = self.parameterAsDouble(parameters, self.TOLERANCE, context)
+        target_source = self.parameterAsSource(parameters, self.TARGET, context)
+        target_layer = self.parameterAsVectorLayer(parameters, self.TARGET, context)
+        barrier_source = self.parameterAsSource(parameters, self.BARRIER, context)
+        barrier_layer = self.parameterAsVectorLayer(parameters, self.BARRIER, context)
+        extension = self.parameterAsDouble(parameters, self.EXTENSION, context)
+
+        # Convert QGIS sources to GeoDataFrames and extend dangling lines, null
+        # and empty lines stay null
+        line_dataframe = gpd.GeoDataFrame(geometry=qgs_to_gpd(source, layer=layer))
+        present = _present(line_dataframe.geometry)
+        target = barrier = None
+        if target_source:
+            target = qgs_to_gpd(target_source, layer=target_layer)
+            target = gpd.GeoDataFrame(geometry=target[_present(target)])
+        if barrier_source:
+            barrier = qgs_to_gpd(barrier_source, layer=barrier_layer)
+            barrier = gpd.GeoDataFrame(geometry=barrier[_present(barrier)])
+        extended = momepy.extend_lines(
+            line_dataframe[present],
+            tolerance,
+            target=target,
+            barrier=barrier,
+            extension=extension,
+        )
+        extended_values = _restore(extended.geometry.array, present)
+        results = write_file(
+            self,
+            parameters,
+            context,
+            feedback,
+            gpd.GeoDataFrame(
+                {"source_fid": line_dataframe.index}, geometry=extended_values
+            ),
+            source.sourceCrs(),
+        )
+
+        # Geometries map one to one to input features, keep attributes
+        fields = source.fields()
+
+        # Create sink
+        (sink, dest_id) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT,
+            context,
+            fields,
+            source.wkbType(),
+            source.sourceCrs(),
+        )
+        if not check_sink(self, parameters, sink, results):
+            return results
+
+        # Get features from source
+        features = source.getFeatures()
+        total = 100.0 / source.featureCount() if source.featureCount() else 0
+
+        # Process each feature directly
+        for current, feature in enumerate(features):
+            if feedback.isCanceled():
+                break
+
+            # Create output feature with extended geometry
+            output_feature = QgsFeature(fields)
+            output_feature.setGeometry(_qgs_geometry(extended_values[current]))
+            output_feature.setAttributes(feature.attributes())
+
+            # Add feature to sink
+            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
+
+            # Update progress
+            feedback.setProgress(int(current * total))
+
+        results[self.OUTPUT] = dest_id
+        return results
+
+    def createInstance(self):
+        return self.__class__()
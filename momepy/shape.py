@@ -1,15 +1,13 @@
-import momepy
-
-from .utils import qgs_to_gpd
+from .output import add_output_parameters, write_results
+from .parallel import WORKERS, add_workers_parameter, map_geometry
+from .planning import SHAPE_PROFILE, add_memory_parameter, plan_execution
+from .utils import qgs_to_gpd, add_conversion_parameters, conversion_options
 from PyQt5.QtCore import QVariant
 from qgis.core import (
     QgsField,
-    QgsFeature,
     QgsProcessing,
-    QgsFeatureSink,
     QgsProcessingAlgorithm,
     QgsProcessingParameterFeatureSource,
-    QgsProcessingParameterFeatureSink,
     QgsProcessingParameterField,
     QgsProcessingParameterNumber,
     QgsProcessingParameterBoolean,
@@ -54,58 +52,53 @@ class FormFactor(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, "Form factor"))
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Form factor")
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
         height_field = self.parameterAsString(parameters, self.HEIGHT_FIELD, context)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS feature to GeoDataFrame and calculate form factor
-        geometry_dataframe = qgs_to_gpd(source, attribute_fields=[height_field])
+        geometry_dataframe = qgs_to_gpd(
+            source, attribute_fields=[height_field], layer=layer, **conversion
+        )
         height = geometry_dataframe[height_field]
-        form_factor_series = momepy.form_factor(geometry_dataframe, height)
+        form_factor_series = map_geometry(
+            momepy.form_factor,
+            geometry_dataframe,
+            columns={"height": height},
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
+        )
         form_factor_values = form_factor_series.to_list()
 
-        # Create output fields (original fields + new form factor field)
-        fields = source.fields()
-        fields.append(QgsField("form_factor", QVariant.Double))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new field
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [QgsField("form_factor", QVariant.Double)],
+            [form_factor_values],
+            geometry=geometry_dataframe,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new form factor
-            attributes = feature.attributes()
-            attributes.append(form_factor_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
@@ -138,58 +131,48 @@ class FractalDimension(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(
-            QgsProcessingParameterFeatureSink(self.OUTPUT, "Fractal dimension")
-        )
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Fractal dimension")
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS source to GeoSeries and calculate fractal dimension
-        geometry_series = qgs_to_gpd(source)
-        fractal_dimension_series = momepy.fractal_dimension(geometry_series)
+        geometry_series = qgs_to_gpd(source, layer=layer, **conversion)
+        fractal_dimension_series = map_geometry(
+            momepy.fractal_dimension,
+            geometry_series,
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
+        )
         fractal_dimension_values = fractal_dimension_series.to_list()
 
-        # Create output fields (original fields + new ratio field)
-        fields = source.fields()
-        fields.append(QgsField("fractal_dimension", QVariant.Double))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new field
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [QgsField("fractal_dimension", QVariant.Double)],
+            [fractal_dimension_values],
+            geometry=geometry_series,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new ratio
-            attributes = feature.attributes()
-            attributes.append(fractal_dimension_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
@@ -222,58 +205,48 @@ class FacadeRatio(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(
-            QgsProcessingParameterFeatureSink(self.OUTPUT, "Facade ratio")
-        )
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Facade ratio")
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS source to GeoSeries and calculate facade ratio
-        geometry_series = qgs_to_gpd(source)
-        facade_ratio_series = momepy.facade_ratio(geometry_series)
+        geometry_series = qgs_to_gpd(source, layer=layer, **conversion)
+        facade_ratio_series = map_geometry(
+            momepy.facade_ratio,
+            geometry_series,
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
+        )
         facade_ratio_values = facade_ratio_series.to_list()
 
-        # Create output fields (original fields + new ratio field)
-        fields = source.fields()
-        fields.append(QgsField("facade_ratio", QVariant.Double))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new field
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [QgsField("facade_ratio", QVariant.Double)],
+            [facade_ratio_values],
+            geometry=geometry_series,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new ratio
-            attributes = feature.attributes()
-            attributes.append(facade_ratio_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
@@ -306,58 +279,48 @@ class CircularCompactness(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(
-            QgsProcessingParameterFeatureSink(self.OUTPUT, "Circular compactness")
-        )
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Circular compactness")
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS feature to GeoSeries and calculate circular compactness
-        geometry_series = qgs_to_gpd(source)
-        circular_compactness_series = momepy.circular_compactness(geometry_series)
+        geometry_series = qgs_to_gpd(source, layer=layer, **conversion)
+        circular_compactness_series = map_geometry(
+            momepy.circular_compactness,
+            geometry_series,
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
+        )
         circular_compactness_values = circular_compactness_series.to_list()
 
-        # Create output fields (original fields + new circular compactness field)
-        fields = source.fields()
-        fields.append(QgsField("circular_compactness", QVariant.Double))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new field
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [QgsField("circular_compactness", QVariant.Double)],
+            [circular_compactness_values],
+            geometry=geometry_series,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new circular compactness
-            attributes = feature.attributes()
-            attributes.append(circular_compactness_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
@@ -390,58 +353,48 @@ class SquareCompactness(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(
-            QgsProcessingParameterFeatureSink(self.OUTPUT, "Square compactness")
-        )
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Square compactness")
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS source to GeoSeries and calculate square compactness
-        geometry_series = qgs_to_gpd(source)
-        square_compactness_series = momepy.square_compactness(geometry_series)
+        geometry_series = qgs_to_gpd(source, layer=layer, **conversion)
+        square_compactness_series = map_geometry(
+            momepy.square_compactness,
+            geometry_series,
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
+        )
         square_compactness_values = square_compactness_series.to_list()
 
-        # Create output fields (original fields + new ratio field)
-        fields = source.fields()
-        fields.append(QgsField("square_compactness", QVariant.Double))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new field
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [QgsField("square_compactness", QVariant.Double)],
+            [square_compactness_values],
+            geometry=geometry_series,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new ratio
-            attributes = feature.attributes()
-            attributes.append(square_compactness_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
@@ -474,55 +427,48 @@ class Convexity(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, "Convexity"))
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Convexity")
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS feature to GeoSeries and calculate convexity
-        geometry_series = qgs_to_gpd(source)
-        convexity_series = momepy.convexity(geometry_series)
+        geometry_series = qgs_to_gpd(source, layer=layer, **conversion)
+        convexity_series = map_geometry(
+            momepy.convexity,
+            geometry_series,
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
+        )
         convexity_values = convexity_series.to_list()
 
-        fields = source.fields()
-        fields.append(QgsField("convexity", QVariant.Double))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new field
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [QgsField("convexity", QVariant.Double)],
+            [convexity_values],
+            geometry=geometry_series,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new convexity
-            attributes = feature.attributes()
-            attributes.append(convexity_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
@@ -565,64 +511,55 @@ class CourtyardIndex(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(
-            QgsProcessingParameterFeatureSink(self.OUTPUT, "Courtyard index")
-        )
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Courtyard index")
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
         courtyard_area_field = self.parameterAsString(
             parameters, self.COURTYARD_AREA_FIELD, context
         )
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS feature to GeoDataFrame and calculate courtyard index
-        geometry_dataframe = qgs_to_gpd(source, attribute_fields=[courtyard_area_field])
+        geometry_dataframe = qgs_to_gpd(
+            source, attribute_fields=[courtyard_area_field], layer=layer, **conversion
+        )
         courtyard_area = geometry_dataframe[courtyard_area_field]
-        courtyard_index_series = momepy.courtyard_index(
-            geometry_dataframe, courtyard_area=courtyard_area
+        courtyard_index_series = map_geometry(
+            momepy.courtyard_index,
+            geometry_dataframe,
+            columns={"courtyard_area": courtyard_area},
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
         )
         courtyard_index_values = courtyard_index_series.to_list()
 
-        # Create output fields (original fields + new courtyard index field)
-        fields = source.fields()
-        fields.append(QgsField("courtyard_index", QVariant.Double))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new field
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [QgsField("courtyard_index", QVariant.Double)],
+            [courtyard_index_values],
+            geometry=geometry_dataframe,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new courtyard index
-            attributes = feature.attributes()
-            attributes.append(courtyard_index_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
@@ -655,57 +592,48 @@ class Rectangularity(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(
-            QgsProcessingParameterFeatureSink(self.OUTPUT, "Rectangularity")
-        )
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Rectangularity")
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS feature to GeoSeries and calculate rectangularity
-        geometry_series = qgs_to_gpd(source)
-        rectangularity_series = momepy.rectangularity(geometry_series)
+        geometry_series = qgs_to_gpd(source, layer=layer, **conversion)
+        rectangularity_series = map_geometry(
+            momepy.rectangularity,
+            geometry_series,
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
+        )
         rectangularity_values = rectangularity_series.to_list()
 
-        fields = source.fields()
-        fields.append(QgsField("rectangularity", QVariant.Double))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new field
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [QgsField("rectangularity", QVariant.Double)],
+            [rectangularity_values],
+            geometry=geometry_series,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new rectangularity
-            attributes = feature.attributes()
-            attributes.append(rectangularity_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
@@ -748,62 +676,55 @@ class ShapeIndex(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, "Shape index"))
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Shape index")
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
         longest_axis_field = self.parameterAsString(
             parameters, self.LONGEST_AXIS_FIELD, context
         )
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS feature to GeoDataFrame and calculate shape index
-        geometry_dataframe = qgs_to_gpd(source, attribute_fields=[longest_axis_field])
+        geometry_dataframe = qgs_to_gpd(
+            source, attribute_fields=[longest_axis_field], layer=layer, **conversion
+        )
         longest_axis = geometry_dataframe[longest_axis_field]
-        shape_index_series = momepy.shape_index(
-            geometry_dataframe, longest_axis_length=longest_axis
+        shape_index_series = map_geometry(
+            momepy.shape_index,
+            geometry_dataframe,
+            columns={"longest_axis_length": longest_axis},
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
         )
         shape_index_values = shape_index_series.to_list()
 
-        # Create output fields (original fields + new shape index field)
-        fields = source.fields()
-        fields.append(QgsField("shape_index", QVariant.Double))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new field
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [QgsField("shape_index", QVariant.Double)],
+            [shape_index_values],
+            geometry=geometry_dataframe,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new shape index
-            attributes = feature.attributes()
-            attributes.append(shape_index_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
@@ -857,61 +778,54 @@ class Corners(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, "Corners"))
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Corners", discrete=True)
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
         eps_field = self.parameterAsDouble(parameters, self.EPS_FIELD, context)
         interiors_field = self.parameterAsBool(
             parameters, self.INTERIORS_FIELD, context
         )
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS feature to GeoSeries and calculate number of corners
-        geometry_series = qgs_to_gpd(source)
-        corners_series = momepy.corners(
-            geometry_series, eps=eps_field, include_interiors=interiors_field
+        geometry_series = qgs_to_gpd(source, layer=layer, **conversion)
+        corners_series = map_geometry(
+            momepy.corners,
+            geometry_series,
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
+            eps=eps_field,
+            include_interiors=interiors_field,
         )
         corners_values = corners_series.to_list()
 
-        fields = source.fields()
-        fields.append(QgsField("corners", QVariant.Int))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new field
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [QgsField("corners", QVariant.Int)],
+            [corners_values],
+            geometry=geometry_series,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new corners
-            attributes = feature.attributes()
-            attributes.append(corners_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
@@ -965,61 +879,54 @@ class Squareness(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, "Squareness"))
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Squareness")
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
         eps_field = self.parameterAsDouble(parameters, self.EPS_FIELD, context)
         interiors_field = self.parameterAsBool(
             parameters, self.INTERIORS_FIELD, context
         )
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS feature to GeoSeries and calculate squareness
-        geometry_series = qgs_to_gpd(source)
-        squareness_series = momepy.squareness(
-            geometry_series, eps=eps_field, include_interiors=interiors_field
+        geometry_series = qgs_to_gpd(source, layer=layer, **conversion)
+        squareness_series = map_geometry(
+            momepy.squareness,
+            geometry_series,
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
+            eps=eps_field,
+            include_interiors=interiors_field,
         )
         squareness_values = squareness_series.to_list()
 
-        fields = source.fields()
-        fields.append(QgsField("squareness", QVariant.Double))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new field
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [QgsField("squareness", QVariant.Double)],
+            [squareness_values],
+            geometry=geometry_series,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new squareness
-            attributes = feature.attributes()
-            attributes.append(squareness_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
@@ -1052,59 +959,48 @@ class EquivalentRectangularIndex(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(
-            QgsProcessingParameterFeatureSink(
-                self.OUTPUT, "Equivalent rectangular index"
-            )
-        )
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Equivalent rectangular index")
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS feature to GeoSeries and calculate equivalent rectangular index
-        geometry_series = qgs_to_gpd(source)
-        eri_series = momepy.equivalent_rectangular_index(geometry_series)
+        geometry_series = qgs_to_gpd(source, layer=layer, **conversion)
+        eri_series = map_geometry(
+            momepy.equivalent_rectangular_index,
+            geometry_series,
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
+        )
         eri_values = eri_series.to_list()
 
-        fields = source.fields()
-        fields.append(QgsField("eri", QVariant.Double))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new field
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [QgsField("eri", QVariant.Double)],
+            [eri_values],
+            geometry=geometry_series,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new equivalent rectangular index
-            attributes = feature.attributes()
-            attributes.append(eri_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
@@ -1137,55 +1033,48 @@ class Elongation(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, "Elongation"))
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Elongation")
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS feature to GeoSeries and calculate elongation
-        geometry_series = qgs_to_gpd(source)
-        elongation_series = momepy.elongation(geometry_series)
+        geometry_series = qgs_to_gpd(source, layer=layer, **conversion)
+        elongation_series = map_geometry(
+            momepy.elongation,
+            geometry_series,
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
+        )
         elongation_values = elongation_series.to_list()
 
-        fields = source.fields()
-        fields.append(QgsField("elongation", QVariant.Double))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new field
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [QgsField("elongation", QVariant.Double)],
+            [elongation_values],
+            geometry=geometry_series,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new elongation
-            attributes = feature.attributes()
-            attributes.append(elongation_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
@@ -1241,63 +1130,59 @@ class CentroidCornerDistance(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(
-            QgsProcessingParameterFeatureSink(self.OUTPUT, "Centroid corner distance")
-        )
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Centroid corner distance")
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
         eps_field = self.parameterAsDouble(parameters, self.EPS_FIELD, context)
         interiors_field = self.parameterAsBool(
             parameters, self.INTERIORS_FIELD, context
         )
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS feature to GeoSeries and calculate centroid corner distance
-        geometry_series = qgs_to_gpd(source)
-        ccd_series = momepy.centroid_corner_distance(
-            geometry_series, eps=eps_field, include_interiors=interiors_field
+        geometry_series = qgs_to_gpd(source, layer=layer, **conversion)
+        ccd_dataframe = map_geometry(
+            momepy.centroid_corner_distance,
+            geometry_series,
+            outputs=["mean", "std"],
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
+            eps=eps_field,
+            include_interiors=interiors_field,
         )
-        ccd_values = ccd_series.to_list()
-
-        fields = source.fields()
-        fields.append(QgsField("ccd", QVariant.Double))
+        ccd_mean_values = ccd_dataframe["mean"].to_list()
+        ccd_std_values = ccd_dataframe["std"].to_list()
 
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new fields, mean and standard deviation of the distance
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [
+                QgsField("ccd_mean", QVariant.Double),
+                QgsField("ccd_std", QVariant.Double),
+            ],
+            [ccd_mean_values, ccd_std_values],
+            geometry=geometry_series,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new centroid corner distance
-            attributes = feature.attributes()
-            attributes.append(ccd_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
@@ -1330,55 +1215,48 @@ class Linearity(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, "Linearity"))
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Linearity")
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS feature to GeoSeries and calculate linearity
-        geometry_series = qgs_to_gpd(source)
-        linearity_series = momepy.linearity(geometry_series)
+        geometry_series = qgs_to_gpd(source, layer=layer, **conversion)
+        linearity_series = map_geometry(
+            momepy.linearity,
+            geometry_series,
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
+        )
         linearity_values = linearity_series.to_list()
 
-        fields = source.fields()
-        fields.append(QgsField("linearity", QVariant.Double))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new field
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [QgsField("linearity", QVariant.Double)],
+            [linearity_values],
+            geometry=geometry_series,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new linearity
-            attributes = feature.attributes()
-            attributes.append(linearity_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
@@ -1413,58 +1291,48 @@ class CompactnessWeightedAxis(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(
-            QgsProcessingParameterFeatureSink(self.OUTPUT, "Compactness weighted axis")
-        )
+        add_conversion_parameters(self)
+
+        add_workers_parameter(self)
+
+        add_memory_parameter(self)
+
+        add_output_parameters(self, "Compactness weighted axis")
 
     def processAlgorithm(self, parameters, context, feedback):
+        import momepy
+
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        conversion = conversion_options(self, parameters, context, feedback, source)
+        workers = self.parameterAsInt(parameters, WORKERS, context)
+        chunk_size = plan_execution(
+            self, parameters, context, feedback, source, SHAPE_PROFILE
+        )
 
         # Convert QGIS source to GeoSeries and calculate compactness-weighted axis
-        geometry_series = qgs_to_gpd(source)
-        cwa_series = momepy.compactness_weighted_axis(geometry_series)
+        geometry_series = qgs_to_gpd(source, layer=layer, **conversion)
+        cwa_series = map_geometry(
+            momepy.compactness_weighted_axis,
+            geometry_series,
+            workers=workers,
+            feedback=feedback,
+            chunk_size=chunk_size,
+        )
         cwa_values = cwa_series.to_list()
 
-        # Create output fields (original fields + new cwa field)
-        fields = source.fields()
-        fields.append(QgsField("cwa", QVariant.Double))
-
-        # Create sink
-        (sink, dest_id) = self.parameterAsSink(
+        # Write the new field
+        return write_results(
+            self,
             parameters,
-            self.OUTPUT,
             context,
-            fields,
-            source.wkbType(),
-            source.sourceCrs(),
+            feedback,
+            source,
+            [QgsField("cwa", QVariant.Double)],
+            [cwa_values],
+            geometry=geometry_series,
         )
 
-        # Get features from source
-        features = source.getFeatures()
-        total = 100.0 / source.featureCount() if source.featureCount() else 0
-
-        # Process each feature directly
-        for current, feature in enumerate(features):
-            if feedback.isCanceled():
-                break
-
-            # Create output feature
-            output_feature = QgsFeature(fields)
-            output_feature.setGeometry(feature.geometry())
-
-            # Copy attributes and add new cwa
-            attributes = feature.attributes()
-            attributes.append(cwa_values[current])
-            output_feature.setAttributes(attributes)
-
-            # Add feature to sink
-            sink.addFeature(output_feature, QgsFeatureSink.Flag.FastInsert)
-
-            # Update progress
-            feedback.setProgress(int(current * total))
-
-        return {self.OUTPUT: dest_id}
-
     def createInstance(self):
         return self.__class__()
 
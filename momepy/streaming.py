@@ -0,0 +1,199 @@
+from PyQt5.QtCore import QCoreApplication, QObject, QVariant, pyqtSignal
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsFeature,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsMemoryProviderUtils,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterDefinition,
+    QgsProcessingParameterNumber,
+    QgsProject,
+    QgsWkbTypes,
+)
+
+STREAM = "STREAM"
+CHUNK_SIZE = "CHUNK_SIZE"
+
+
+def add_stream_parameters(algorithm):
+    """
+    Add the parameters computing in chunks shown in a temporary layer as
+    they finish
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm to add the parameters to
+    """
+    stream = QgsProcessingParameterBoolean(
+        STREAM,
+        "Compute in chunks and show finished chunks in a temporary layer",
+        defaultValue=False,
+    )
+    stream.setFlags(stream.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+    algorithm.addParameter(stream)
+
+    chunk_size = QgsProcessingParameterNumber(
+        CHUNK_SIZE,
+        "Number of features per chunk",
+        type=QgsProcessingParameterNumber.Integer,
+        defaultValue=1000,
+        minValue=1,
+    )
+    chunk_size.setFlags(
+        chunk_size.flags() | QgsProcessingParameterDefinition.FlagAdvanced
+    )
+    algorithm.addParameter(chunk_size)
+
+
+def stream_options(algorithm, parameters, context, feedback):
+    """
+    Read the stream parameters
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm with stream parameters
+    parameters : dict
+        Parameters of the algorithm
+    context : QgsProcessingContext
+        Processing context
+    feedback : QgsProcessingFeedback
+        Feedback of the run, the temporary layer is removed if it is cancelled
+
+    Returns:
+    --------
+    PreviewLayer or None, int
+        Temporary layer for finished chunks, None if the computation is not
+        chunked, and the number of features per chunk
+    """
+    chunk_size = algorithm.parameterAsInt(parameters, CHUNK_SIZE, context)
+    if not algorithm.parameterAsBoolean(parameters, STREAM, context):
+        return None, chunk_size
+    name = f"{algorithm.displayName()} (partial)"
+    return PreviewLayer(name, feedback), chunk_size
+
+
+def tiles(geometry, size):
+    """
+    Group geometries into square tiles of about ``size`` geometries
+
+    Tiles follow a regular grid over the centroids of the geometries, so that
+    each chunk of work covers a compact area.
+
+    Parameters:
+    -----------
+    geometry : gpd.GeoSeries or gpd.GeoDataFrame
+        Geometries to group
+    size : int
+        Expected number of geometries per tile
+
+    Returns:
+    --------
+    list of np.ndarray
+        Positions of geometries in each non-empty tile
+    """
+    import numpy as np
+    import shapely as shp
+
+    coordinates = shp.get_coordinates(shp.centroid(geometry.geometry.array))
+    side = max(1, int(np.ceil(np.sqrt(len(coordinates) / size))))
+    low = coordinates.min(axis=0)
+    extent = np.maximum(coordinates.max(axis=0) - low, np.finfo(float).eps)
+    cells = np.minimum((coordinates - low) / extent * side, side - 1).astype(np.int64)
+    tile = cells[:, 1] * side + cells[:, 0]
+
+    order = np.argsort(tile, kind="stable")
+    bounds = np.flatnonzero(np.diff(tile[order])) + 1
+    return np.split(order, bounds)
+
+
+class PreviewLayer(QObject):
+    """
+    Temporary layer receiving results chunk by chunk while an algorithm runs
+
+    Processing algorithms run in a background task, while layers may only be
+    added to the project in the main thread. Chunks are therefore handed over
+    with a queued signal and the layer is created with the first chunk. The
+    layer is removed from the project if the run is cancelled.
+    """
+
+    chunkReady = pyqtSignal(object, object, object)
+
+    def __init__(self, name, feedback):
+        super().__init__()
+        self.name = name
+        self.layer = None
+        self.canceled = False
+        # Slots run in the thread of the object
+        self.moveToThread(QCoreApplication.instance().thread())
+        self.chunkReady.connect(self._add)
+        feedback.canceled.connect(self._remove)
+
+    def add(self, dataframe):
+        """
+        Add a chunk of results to the layer
+
+        Parameters:
+        -----------
+        dataframe : gpd.GeoDataFrame
+            Results indexed by feature id of the source, numeric columns are
+            written as fields
+        """
+        if len(dataframe):
+            crs = QgsCoordinateReferenceSystem()
+            if dataframe.crs is not None:
+                crs = QgsCoordinateReferenceSystem.fromWkt(dataframe.crs.to_wkt())
+            fields, features = _features(dataframe)
+            self.chunkReady.emit(fields, features, crs)
+
+    def _add(self, fields, features, crs):
+        # Chunks queued before the cancellation arrive after the removal
+        if self.canceled:
+            return
+        if self.layer is None:
+            self.layer = QgsMemoryProviderUtils.createMemoryLayer(
+                self.name,
+                fields,
+                QgsWkbTypes.multiType(features[0].geometry().wkbType()),
+                crs,
+            )
+            QgsProject.instance().addMapLayer(self.layer)
+        self.layer.dataProvider().addFeatures(features)
+        self.layer.updateExtents()
+        self.layer.triggerRepaint()
+
+    def _remove(self):
+        self.canceled = True
+        if self.layer is not None:
+            QgsProject.instance().removeMapLayer(self.layer.id())
+            self.layer = None
+
+
+def _features(dataframe):
+    """Convert a chunk of results to fields and features."""
+    import shapely as shp
+
+    data = dataframe.drop(columns=dataframe.geometry.name)
+    columns = [column for column in data if data[column].dtype.kind in "fiub"]
+    fields = QgsFields()
+    fields.append(QgsField("source_fid", QVariant.LongLong))
+    for column in columns:
+        fields.append(QgsField(str(column), QVariant.Double))
+
+    features = []
+    rows = data[columns].itertuples(name=None)
+    for row, wkb in zip(rows, shp.to_wkb(dataframe.geometry.array)):
+        feature = QgsFeature(fields)
+        geometry = QgsGeometry()
+        geometry.fromWkb(wkb)
+        # Chunks may mix single and multipart geometries
+        geometry.convertToMultiType()
+        feature.setGeometry(geometry)
+        feature.setAttributes(
+            [int(row[0])] + [None if value != value else value for value in row[1:]]
+        )
+        features.append(feature)
+    return fields, features
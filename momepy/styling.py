@@ -0,0 +1,280 @@
+import json
+
+from PyQt5.QtCore import QCoreApplication, QObject, QVariant, pyqtSignal
+from qgis.core import (
+    QgsGraduatedSymbolRenderer,
+    QgsProcessingLayerPostProcessorInterface,
+    QgsProcessingOutputString,
+    QgsProcessingParameterDefinition,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterNumber,
+    QgsRendererRange,
+    QgsStyle,
+    QgsSymbol,
+)
+
+STATISTICS = "STATISTICS"
+STYLE = "STYLE"
+CLASSES = "CLASSES"
+
+NO_STYLE = 0
+QUANTILE = 1
+EQUAL_INTERVAL = 2
+STYLES = [
+    "Keep the default style",
+    "Graduated style with quantile classes",
+    "Graduated style with equal interval classes",
+]
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+NUMERIC_TYPES = (QVariant.Double, QVariant.Int, QVariant.LongLong)
+
+# Styles must outlive the algorithm until they are applied, kept by layer
+# and dropped once applied
+_styles = {}
+
+
+def add_style_parameters(algorithm):
+    """
+    Add the parameters styling the output by the first result field and the
+    output holding summary statistics of result fields
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm to add the parameters to
+    """
+    style = QgsProcessingParameterEnum(
+        STYLE,
+        "Style of the output layer",
+        options=STYLES,
+        defaultValue=NO_STYLE,
+    )
+    style.setFlags(style.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+    algorithm.addParameter(style)
+
+    classes = QgsProcessingParameterNumber(
+        CLASSES,
+        "Number of classes of the graduated style",
+        type=QgsProcessingParameterNumber.Integer,
+        defaultValue=5,
+        minValue=2,
+    )
+    classes.setFlags(classes.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+    algorithm.addParameter(classes)
+
+    algorithm.addOutput(
+        QgsProcessingOutputString(
+            STATISTICS, "Summary statistics of result fields (JSON)"
+        )
+    )
+
+
+def result_statistics(fields, values):
+    """
+    Summarise numeric result fields
+
+    Results are held in memory when they are written, so the statistics are
+    exact and do not need another pass over the written layer.
+
+    Parameters:
+    -----------
+    fields : list of QgsField
+        Result fields
+    values : list
+        Sequence of values for each field, np.ndarray of floats or
+        pd.arrays.IntegerArray
+
+    Returns:
+    --------
+    dict
+        For each numeric field the count of values and of missing values,
+        minimum, maximum, mean, standard deviation and quantiles
+    """
+    import numpy as np
+
+    statistics = {}
+    for field, column in zip(fields, values):
+        if field.type() not in NUMERIC_TYPES:
+            continue
+        column = _float_array(column)
+        present = column[~np.isnan(column)]
+        summary = {"count": int(len(present)), "null_count": int(len(column))}
+        summary["null_count"] -= summary["count"]
+        if len(present):
+            quantiles = np.quantile(present, QUANTILES)
+            summary.update(
+                min=float(present.min()),
+                max=float(present.max()),
+                mean=float(present.mean()),
+                std=float(present.std()),
+                quantiles={str(q): float(v) for q, v in zip(QUANTILES, quantiles)},
+            )
+        statistics[field.name()] = summary
+    return statistics
+
+
+def _float_array(column):
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(column, pd.arrays.IntegerArray):
+        return column.to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.asarray(column, dtype=np.float64)
+
+
+def class_breaks(column, classes, style):
+    """
+    Compute the class breaks of a graduated style
+
+    Parameters:
+    -----------
+    column : array-like
+        Values of the styled field
+    classes : int
+        Number of classes
+    style : int
+        QUANTILE or EQUAL_INTERVAL
+
+    Returns:
+    --------
+    np.ndarray
+        Increasing breaks, fewer classes if quantiles coincide, empty if there
+        are no values
+    """
+    import numpy as np
+
+    column = _float_array(column)
+    present = column[~np.isnan(column)]
+    if not len(present):
+        return np.array([])
+    if style == QUANTILE:
+        breaks = np.quantile(present, np.linspace(0, 1, classes + 1))
+    else:
+        breaks = np.linspace(present.min(), present.max(), classes + 1)
+    return np.unique(breaks)
+
+
+def write_statistics(
+    algorithm, parameters, context, feedback, fields, values, layer, results, style=True
+):
+    """
+    Add summary statistics of result fields to the results and style the
+    output by the first result field if requested
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm with style parameters
+    parameters : dict
+        Parameters of the algorithm
+    context : QgsProcessingContext
+        Processing context
+    feedback : QgsProcessingFeedback
+        Processing feedback
+    fields : list of QgsField
+        Result fields
+    values : list
+        Sequence of values for each field, in the order of written features
+    layer : QgsVectorLayer or None
+        Input layer if the fields were added to it, None if the results were
+        written to a new layer under algorithm.OUTPUT
+    results : dict
+        Results of the algorithm, updated in place
+    style : bool
+        Whether the output has geometry and can be styled
+    """
+    if algorithm.parameterDefinition(STYLE) is None:
+        return
+    statistics = result_statistics(fields, values)
+    results[STATISTICS] = json.dumps(statistics)
+
+    if style:
+        style = algorithm.parameterAsEnum(parameters, STYLE, context)
+    if style == NO_STYLE or not fields or fields[0].name() not in statistics:
+        return
+    classes = algorithm.parameterAsInt(parameters, CLASSES, context)
+    breaks = class_breaks(values[0], classes, style).tolist()
+    if len(breaks) < 2:
+        feedback.pushWarning(
+            f"{fields[0].name()} has fewer than two distinct values, "
+            "the output is not styled."
+        )
+        return
+
+    if layer is not None:
+        # Layers in the project may only be changed in the main thread
+        _styles[layer.id()] = LayerStyle(layer, fields[0].name(), breaks)
+        return
+
+    dest_id = results.get(algorithm.OUTPUT)
+    if dest_id is None or not context.willLoadLayerOnCompletion(dest_id):
+        feedback.pushInfo("The output is not loaded, the style is not applied.")
+        return
+    processor = GraduatedStyle(dest_id, fields[0].name(), breaks)
+    _styles[dest_id] = processor
+    context.layerToLoadOnCompletionDetails(dest_id).setPostProcessor(processor)
+
+
+def graduated_renderer(layer, field, breaks):
+    """
+    Create a graduated renderer of a field with the default color ramp
+
+    Parameters:
+    -----------
+    layer : QgsVectorLayer
+        Styled layer
+    field : str
+        Name of the styled field
+    breaks : list of float
+        Increasing class breaks
+
+    Returns:
+    --------
+    QgsGraduatedSymbolRenderer
+    """
+    ranges = []
+    for lower, upper in zip(breaks[:-1], breaks[1:]):
+        symbol = QgsSymbol.defaultSymbol(layer.geometryType())
+        ranges.append(QgsRendererRange(lower, upper, symbol, f"{lower:g} - {upper:g}"))
+    renderer = QgsGraduatedSymbolRenderer(field, ranges)
+    ramp = QgsStyle.defaultStyle().colorRamp("Viridis")
+    if ramp is not None:
+        renderer.updateColorRamp(ramp)
+    return renderer
+
+
+class GraduatedStyle(QgsProcessingLayerPostProcessorInterface):
+    """
+    Apply a graduated style to an output layer once it is loaded
+    """
+
+    def __init__(self, dest_id, field, breaks):
+        super().__init__()
+        self.dest_id = dest_id
+        self.field = field
+        self.breaks = breaks
+
+    def postProcessLayer(self, layer, context, feedback):
+        layer.setRenderer(graduated_renderer(layer, self.field, self.breaks))
+        layer.triggerRepaint()
+        _styles.pop(self.dest_id, None)
+
+
+class LayerStyle(QObject):
+    """
+    Apply a graduated style to a layer of the project in the main thread
+    """
+
+    styleReady = pyqtSignal(object, str, object)
+
+    def __init__(self, layer, field, breaks):
+        super().__init__()
+        # Slots run in the thread of the object
+        self.moveToThread(QCoreApplication.instance().thread())
+        self.styleReady.connect(self._apply)
+        self.styleReady.emit(layer, field, breaks)
+
+    def _apply(self, layer, field, breaks):
+        layer.setRenderer(graduated_renderer(layer, field, breaks))
+        layer.triggerRepaint()
+        _styles.pop(layer.id(), None)
@@ -1,11 +1,83 @@
-import geopandas as gpd
-import shapely as shp
+import importlib.util
+import os
+from collections import OrderedDict
+from functools import partial
 
+from qgis.core import (
+    QgsFeatureRequest,
+    QgsProviderRegistry,
+    QgsProcessingException,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterCrs,
+    QgsProcessingParameterDefinition,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterNumber,
+)
 
-def qgs_to_gpd(source, attribute_fields=None):
+from .planning import GEOMETRY_PROFILE
+
+# Formats read directly from disk instead of iterating features
+COLUMNAR_EXTENSIONS = (".gpkg", ".shp", ".fgb")
+
+PROJECTION = "PROJECTION"
+TARGET_CRS = "TARGET_CRS"
+REPAIR = "REPAIR"
+GRID_SIZE = "GRID_SIZE"
+MULTIPART = "MULTIPART"
+KEEP_MULTIPART, LARGEST_PART, SKIP_MULTIPART, EXPLODE_PARTS = range(4)
+MULTIPART_OPTIONS = [
+    "Keep multipart geometries",
+    "Use the largest part of multipart geometries",
+    "Skip multipart geometries",
+    "Explode multipart geometries, one result for each part",
+]
+SOURCE_CRS, LOCAL_UTM, CUSTOM_CRS = range(3)
+PROJECTIONS = [
+    "CRS of the input layer",
+    "Local UTM zone",
+    "Target CRS",
+]
+SPATIAL_ORDER = "SPATIAL_ORDER"
+PROVIDER_ORDER, HILBERT, MORTON = range(3)
+SPATIAL_ORDERS = [
+    "Order of the provider",
+    "Hilbert curve through centroids",
+    "Morton (Z-order) curve through centroids",
+]
+# Bits per coordinate of positions on space-filling curves
+CURVE_BITS = 16
+# Attribute of converted layers holding the feature ids in source order
+SOURCE_IDS = "source_ids"
+# Attribute of exploded layers holding the feature id and part number by label
+SOURCE_PARTS = "source_parts"
+
+# Converted temporary outputs by layer id, reused by algorithms later in a
+# model, and their estimated size in bytes
+REGISTRY_BYTES = 1024**3
+_registry = OrderedDict()
+_sizes = {}
+
+
+def qgs_to_gpd(
+    source,
+    attribute_fields=None,
+    layer=None,
+    crs=None,
+    repair=False,
+    grid_size=None,
+    multipart=None,
+    order=PROVIDER_ORDER,
+    feedback=None,
+):
     """
     Convert QGIS feature soure to Geopandas GeoSeries
 
+    If the layer was converted before, by an earlier algorithm of a model
+    reading it or writing it, the registered geometries are reused. If the
+    layer behind the source is a GeoPackage, Shapefile or FlatGeobuf on disk,
+    the file is read at once with pyogrio, otherwise features are iterated
+    one by one.
+
     Parameters:
     -----------
     source : QgsProcessingParameterFeatureSource
@@ -14,12 +86,590 @@ def qgs_to_gpd(source, attribute_fields=None):
         List of field names to extract as attributes
         If None, returns only GeoSeries
         If list, returns GeoDataFrame with specified fields
+    layer : QgsVectorLayer or None
+        Layer of the source, used to find the file it reads from
+    crs : pyproj.CRS or None
+        CRS to project the geometries to, see target_crs
+        If None, geometries stay in the CRS of the source
+    repair : bool
+        Whether to repair invalid geometries, see repair_geometry
+    grid_size : float or None
+        Precision grid to snap geometries to after repairing them
+    multipart : int or None
+        Handling of multipart geometries, see mask_geometry
+        If None, null and empty geometries are kept as well
+    order : int
+        PROVIDER_ORDER, or HILBERT or MORTON to sort features along a
+        space-filling curve, see spatial_order. Ids of all source features
+        in the order of the source are kept in the SOURCE_IDS attribute of
+        the result, so that results can be written back in that order.
+    feedback : QgsProcessingFeedback or None
+        Feedback used to report repaired and masked geometries
+
+    Returns:
+    --------
+    gpd.GeoSeries or gpd.GeoDataFrame
+        Indexed by QGIS feature ids, with the CRS of the source or crs, null
+        geometries are None
+    """
+    converted = _registered(source, layer, attribute_fields)
+    if converted is None:
+        options = _file_options(source, layer, attribute_fields)
+        converted = _read_layer(source, attribute_fields, options)
+    return _convert(
+        converted,
+        source,
+        attribute_fields,
+        crs,
+        repair,
+        grid_size,
+        multipart,
+        order,
+        feedback,
+    )
+
+
+def read_sources(sources, **conversion):
+    """
+    Convert several QGIS feature sources to GeoPandas, reading them at once
+
+    Sources which are not registered are read concurrently in a thread pool,
+    so that waiting for one provider, e.g. a file on a network drive or a
+    database, overlaps with reading the others. Files read with pyogrio and
+    providers fetching features release the GIL while they wait. Layers are
+    queried for their file in the calling thread, workers only get plain
+    values. Converting the read features happens afterwards in the calling
+    thread. The time each source was read in, relative to the start, is
+    reported to feedback.
+
+    Parameters:
+    -----------
+    sources : list of tuple
+        Source, layer and attribute fields of each source as passed to
+        qgs_to_gpd, layer and attribute fields may be None
+    **conversion
+        Conversion options of all sources, see conversion_options
+
+    Returns:
+    --------
+    list
+        Converted sources in the order of sources, see qgs_to_gpd
+    """
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    feedback = conversion.get("feedback")
+    converted = [
+        _registered(source, layer, attribute_fields)
+        for source, layer, attribute_fields in sources
+    ]
+    pending = [index for index, read in enumerate(converted) if read is None]
+    # Layers belong to the calling thread
+    options = {index: _file_options(*sources[index]) for index in pending}
+
+    start = time.perf_counter()
+
+    def timed_read(index):
+        started = time.perf_counter() - start
+        source, _, attribute_fields = sources[index]
+        read = _read_layer(source, attribute_fields, options[index])
+        return read, started, time.perf_counter() - start
+
+    if len(pending) > 1:
+        with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+            reads = list(executor.map(timed_read, pending))
+    else:
+        reads = [timed_read(index) for index in pending]
+
+    for index, (read, started, finished) in zip(pending, reads):
+        source = sources[index][0]
+        converted[index] = read
+        if feedback is not None:
+            feedback.pushInfo(
+                f"Read {len(read)} features of {source.sourceName()} from "
+                f"{started:.2f} s to {finished:.2f} s."
+            )
+    if feedback is not None and len(reads) > 1:
+        feedback.pushInfo(
+            f"Read {len(reads)} sources in {max(read[2] for read in reads):.2f} s, "
+            f"{sum(read[2] - read[1] for read in reads):.2f} s one after another."
+        )
+
+    return [
+        _convert(read, source, attribute_fields, **conversion)
+        for read, (source, _, attribute_fields) in zip(converted, sources)
+    ]
+
+
+def _read_layer(source, attribute_fields, options):
+    """
+    Read features from the file of the layer if there are options of reading
+    it, see _file_options, or by iterating the source.
+    """
+    if options is not None:
+        return _read_file(options)
+    return _iterate_features(source, attribute_fields)
+
+
+def _convert(
+    converted,
+    source,
+    attribute_fields=None,
+    crs=None,
+    repair=False,
+    grid_size=None,
+    multipart=None,
+    order=PROVIDER_ORDER,
+    feedback=None,
+):
+    """Project, repair, mask and order read features, see qgs_to_gpd."""
+    if not attribute_fields:
+        converted = converted.geometry.rename(None)
+    feature_ids = converted.index.to_numpy()
+
+    # Attach the CRS of the source and project if requested
+    source_crs = source.sourceCrs()
+    if source_crs.isValid():
+        converted = converted.set_crs(source_crs.toWkt(), allow_override=True)
+    if crs is not None:
+        converted = converted.to_crs(crs)
+
+    if repair or grid_size:
+        converted = repair_geometry(converted, grid_size, feedback)
+    if multipart is not None:
+        converted = mask_geometry(converted, multipart, feedback)
+
+    if order != PROVIDER_ORDER:
+        converted = converted.iloc[spatial_order(converted, order)]
+        # A new dictionary, attributes may be shared with registered layers
+        converted.attrs = {**converted.attrs, SOURCE_IDS: feature_ids}
+    return converted
+
+
+def repair_geometry(geometry, grid_size=None, feedback=None):
+    """
+    Repair invalid geometries and optionally snap them to a precision grid
+
+    All geometries are checked at once. Invalid polygons are rebuilt with the
+    deterministic structure method of make_valid, dropping collapsed parts,
+    so that they stay polygonal. Older shapely falls back to the linework
+    method, keeping polygonal parts only. Index and attributes are kept, so results
+    still align with the source features.
+
+    Parameters:
+    -----------
+    geometry : gpd.GeoSeries or gpd.GeoDataFrame
+        Geometries to repair
+    grid_size : float or None
+        Size of the precision grid, None or 0 keeps the precision
+    feedback : QgsProcessingFeedback or None
+        Feedback used to report the number of repaired geometries
+
+    Returns:
+    --------
+    gpd.GeoSeries or gpd.GeoDataFrame
+    """
+    import numpy as np
+    import shapely as shp
+
+    values = np.asarray(geometry.geometry.array)
+    missing = shp.is_missing(values)
+    empty = shp.is_empty(values)
+    invalid = ~shp.is_valid(values) & ~missing
+    polygonal = np.isin(shp.get_type_id(values), [3, 6])
+
+    repaired = values.copy()
+    structure = invalid & polygonal
+    repaired[structure] = _make_valid_polygons(values[structure])
+    repaired[invalid & ~polygonal] = shp.make_valid(values[invalid & ~polygonal])
+    if grid_size:
+        repaired = shp.set_precision(repaired, grid_size)
+
+    if feedback is not None:
+        feedback.pushInfo(
+            f"{invalid.sum()} invalid geometries repaired, "
+            f"{empty.sum()} empty and {missing.sum()} missing geometries found."
+        )
+
+    return _replace_geometry(geometry, repaired)
+
+
+def _make_valid_polygons(values):
+    """
+    Rebuild invalid polygons, keeping them polygonal
+
+    The structure method needs shapely 2.1 and GEOS 3.10. With older versions
+    the linework method may add lines and points of collapsed parts, which
+    are dropped, leaving multipolygons of the remaining parts.
+    """
+    import numpy as np
+    import shapely as shp
+
+    try:
+        return shp.make_valid(values, method="structure", keep_collapsed=False)
+    except (TypeError, shp.errors.UnsupportedGEOSVersionError):
+        pass
+
+    repaired = shp.make_valid(values)
+    parts, index = shp.get_parts(repaired, return_index=True)
+    # Collections may hold multipolygons, split them once more
+    parts, part_index = shp.get_parts(parts, return_index=True)
+    index = index[part_index]
+    polygon = shp.get_type_id(parts) == 3
+    rebuilt = np.array([shp.Polygon() for _ in values], dtype=object)
+    shp.multipolygons(parts[polygon], indices=index[polygon], out=rebuilt)
+    return rebuilt
+
+
+def spatial_order(geometry, curve=HILBERT, bits=CURVE_BITS):
+    """
+    Find the order of geometries along a space-filling curve
+
+    Centroids are snapped to a grid of 2 ** bits cells per side over their
+    extent and sorted by the position of their cell on a Hilbert or Morton
+    curve, so that geometries close in the order are close in space.
+    Geometries without a centroid come last, in their original order.
+
+    Parameters:
+    -----------
+    geometry : gpd.GeoSeries or gpd.GeoDataFrame
+        Geometries to order
+    curve : int
+        HILBERT or MORTON
+    bits : int
+        Bits per coordinate, at most 31
+
+    Returns:
+    --------
+    np.ndarray
+        Positions of geometries in the order of the curve
+    """
+    import numpy as np
+    import shapely as shp
+
+    centroids = shp.centroid(geometry.geometry.array)
+    x, y = shp.get_x(centroids), shp.get_y(centroids)
+    missing = np.isnan(x) | np.isnan(y)
+    if missing.all():
+        return np.arange(len(geometry))
+
+    side = 2**bits - 1
+    cells = []
+    for coordinate in (x, y):
+        low, high = np.nanmin(coordinate), np.nanmax(coordinate)
+        scaled = (coordinate - low) / (high - low or 1.0) * side
+        cells.append(np.where(missing, 0, scaled).astype(np.int64))
+
+    if curve == MORTON:
+        key = _morton_key(*cells, bits)
+    else:
+        key = _hilbert_key(*cells, bits)
+    key[missing] = 1 << 2 * bits
+    return np.argsort(key, kind="stable")
+
+
+def _morton_key(x, y, bits):
+    """Interleave the bits of cell coordinates."""
+    import numpy as np
+
+    key = np.zeros(len(x), dtype=np.int64)
+    for bit in range(bits):
+        key |= ((x >> bit) & 1) << (2 * bit)
+        key |= ((y >> bit) & 1) << (2 * bit + 1)
+    return key
+
+
+def _hilbert_key(x, y, bits):
+    """Distance of cells along a Hilbert curve, vectorised over cells."""
+    import numpy as np
+
+    n = 1 << bits
+    x, y = x.copy(), y.copy()
+    key = np.zeros(len(x), dtype=np.int64)
+    s = n >> 1
+    while s > 0:
+        rx = ((x & s) > 0).astype(np.int64)
+        ry = ((y & s) > 0).astype(np.int64)
+        key += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so that the curve continues in it
+        flip = (ry == 0) & (rx == 1)
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        swap = ry == 0
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+        s >>= 1
+    return key
+
+
+def mask_geometry(geometry, multipart=KEEP_MULTIPART, feedback=None):
+    """
+    Keep only geometries characters can be computed for
+
+    Geometries are classified as null, empty, single part or multipart at once.
+    Null and empty geometries are dropped. Multipart geometries are kept,
+    replaced by their largest part (area for polygons, length for lines),
+    dropped or exploded into parts. The index of feature ids is kept, so that
+    the features which were dropped get NULL values when the results are
+    written. Exploded parts are labelled by their position instead, with the
+    feature id and part number of each label kept in the SOURCE_PARTS
+    attribute, see source_feature_ids.
+
+    Parameters:
+    -----------
+    geometry : gpd.GeoSeries or gpd.GeoDataFrame
+        Geometries to mask
+    multipart : int
+        KEEP_MULTIPART, LARGEST_PART, SKIP_MULTIPART or EXPLODE_PARTS
+    feedback : QgsProcessingFeedback or None
+        Feedback used to report the number of geometries of each class
 
     Returns:
     --------
     gpd.GeoSeries or gpd.GeoDataFrame
+        Subset of geometry
+    """
+    import numpy as np
+    import shapely as shp
+
+    values = np.asarray(geometry.geometry.array)
+    missing = shp.is_missing(values)
+    empty = shp.is_empty(values)
+    multi = np.isin(shp.get_type_id(values), [4, 5, 6, 7]) & ~empty
+
+    if feedback is not None:
+        feedback.pushInfo(
+            f"{(~missing & ~empty & ~multi).sum()} single part, {multi.sum()} "
+            f"multipart, {empty.sum()} empty and {missing.sum()} null geometries."
+        )
+
+    keep = ~missing & ~empty
+    if multipart == SKIP_MULTIPART:
+        keep &= ~multi
+    masked = geometry[keep]
+    if multipart == EXPLODE_PARTS:
+        exploded = masked.explode(index_parts=True)
+        parts = exploded.index
+        exploded = exploded.reset_index(drop=True)
+        exploded.attrs = {**masked.attrs, SOURCE_PARTS: parts}
+        return exploded
+    if multipart != LARGEST_PART or not multi[keep].any():
+        return masked
+
+    # Explode multipart geometries and map the largest part back to the feature
+    multi = multi[keep]
+    masked_values = values[keep]
+    parts, part_index = shp.get_parts(masked_values[multi], return_index=True)
+    size = shp.area(parts)
+    lines = size == 0
+    size[lines] = shp.length(parts[lines])
+    order = np.lexsort((-size, part_index))
+    _, first = np.unique(part_index[order], return_index=True)
+    masked_values[np.flatnonzero(multi)] = parts[order[first]]
+    return _replace_geometry(masked, masked_values)
+
+
+def source_feature_ids(geometry, labels=None):
+    """
+    Get the ids of the source features of converted geometries
+
+    Parameters:
+    -----------
+    geometry : gpd.GeoSeries or gpd.GeoDataFrame
+        Converted by qgs_to_gpd
+    labels : np.ndarray or None
+        Index labels of geometry, all of them if None
+
+    Returns:
+    --------
+    np.ndarray
+        The labels, for exploded parts the ids of the features they are parts
+        of
+    """
+    import numpy as np
+
+    labels = geometry.index.to_numpy() if labels is None else np.asarray(labels)
+    parts = geometry.attrs.get(SOURCE_PARTS)
+    if parts is None:
+        return labels
+    return parts.get_level_values(0).to_numpy()[labels]
+
+
+def _replace_geometry(geometry, values):
+    """Return a copy of geometry with its geometries replaced by values."""
+    if hasattr(geometry, "set_geometry"):
+        return geometry.set_geometry(
+            type(geometry.geometry)(values, index=geometry.index, crs=geometry.crs)
+        )
+    return type(geometry)(values, index=geometry.index, crs=geometry.crs)
+
+
+def register_layer(layer_id, dataframe, context):
     """
+    Keep the converted features of an output for algorithms of a model
+    reading it later
+
+    Only temporary outputs, memory layers held by the processing context as
+    models pass them between their algorithms, are kept. They are dropped
+    when their data changes, when the layer is deleted and when the context
+    is deleted as the model finishes. The most recently registered layers
+    are kept up to REGISTRY_BYTES in total. Features are matched to the layer
+    by their order, so dataframe must be in the order the features are read
+    from the layer, with geometries in the CRS of the layer.
+
+    Parameters:
+    -----------
+    layer_id : str
+        Id of the layer, e.g. the destination id of an output sink
+    dataframe : gpd.GeoSeries or gpd.GeoDataFrame
+        Geometries and attributes of the features of the layer
+    context : QgsProcessingContext
+        Processing context holding the layer
+    """
+    store = context.temporaryLayerStore()
+    layer = store.mapLayer(layer_id)
+    if layer is None or layer.providerType() != "memory":
+        return
+    if not hasattr(dataframe, "set_geometry"):
+        dataframe = dataframe.to_frame("geometry")
+    size = _registered_bytes(dataframe)
+    if size > REGISTRY_BYTES:
+        return
+
+    forget = partial(forget_layer, layer_id)
+    layer.dataChanged.connect(forget)
+    layer.willBeDeleted.connect(forget)
+    store.destroyed.connect(forget)
+    _registry[layer_id] = dataframe
+    _registry.move_to_end(layer_id)
+    _sizes[layer_id] = size
+    while sum(_sizes.values()) > REGISTRY_BYTES:
+        forget_layer(next(iter(_registry)))
+
+
+def _registered_bytes(dataframe):
+    """Estimate the memory held by converted features."""
+    import shapely as shp
+
+    per_feature, per_vertex, _ = GEOMETRY_PROFILE
+    geometry = dataframe.geometry.array
+    attributes = dataframe.drop(columns=dataframe.geometry.name)
+    return int(
+        per_feature * len(dataframe)
+        + per_vertex * shp.get_num_coordinates(geometry).sum()
+        + attributes.memory_usage(deep=True).sum()
+    )
+
+
+def registered_layer(layer_id):
+    """
+    Get the converted features registered for a layer
+
+    Parameters:
+    -----------
+    layer_id : str
+        Id of the layer
+
+    Returns:
+    --------
+    gpd.GeoDataFrame or None
+        None if the layer is not registered
+    """
+    return _registry.get(layer_id)
+
+
+def forget_layer(layer_id):
+    """
+    Drop the converted features of a layer, e.g. when the layer changed
+
+    Parameters:
+    -----------
+    layer_id : str
+        Id of the layer
+    """
+    _registry.pop(layer_id, None)
+    _sizes.pop(layer_id, None)
+
+
+def _registered(source, layer, attribute_fields):
+    """
+    Reuse the converted features registered for the layer of a source
+
+    Falls back (returns None) if the layer is not registered, the source is a
+    subset of the layer, the layer has pending edits or its features no
+    longer match the registered ones.
+
+    Parameters:
+    -----------
+    source : QgsProcessingFeatureSource
+        QGIS feature source of the layer
+    layer : QgsVectorLayer or None
+        Layer of the source
+    attribute_fields : list or None
+        List of field names to extract as attributes
+
+    Returns:
+    --------
+    gpd.GeoDataFrame or None
+        Indexed by QGIS feature ids
+    """
+    import numpy as np
+
+    if layer is None or layer.id() not in _registry:
+        return None
+    dataframe = _registry[layer.id()]
+    columns = list(attribute_fields or [])
+    if (
+        source.featureCount() != layer.featureCount()
+        or layer.isModified()
+        or not set(columns).issubset(dataframe.columns)
+    ):
+        return None
+
+    request = QgsFeatureRequest()
+    request.setFlags(QgsFeatureRequest.NoGeometry)
+    request.setNoAttributes()
+    feature_ids = [feature.id() for feature in layer.getFeatures(request)]
+    extent = layer.extent()
+    bounds = [
+        extent.xMinimum(),
+        extent.yMinimum(),
+        extent.xMaximum(),
+        extent.yMaximum(),
+    ]
+    if len(feature_ids) != len(dataframe) or (
+        dataframe.geometry.notna().any()
+        and not np.allclose(bounds, dataframe.total_bounds)
+    ):
+        forget_layer(layer.id())
+        return None
+
+    _registry.move_to_end(layer.id())
+    converted = dataframe[columns + [dataframe.geometry.name]].copy()
+    converted.index = feature_ids
+    return converted
+
+
+def _iterate_features(source, attribute_fields):
+    """
+    Convert QGIS feature source to GeoSeries feature by feature
+
+    Parameters:
+    -----------
+    source : QgsProcessingFeatureSource
+        QGIS feature source
+    attribute_fields : list or None
+        List of field names to extract as attributes
+
+    Returns:
+    --------
+    gpd.GeoSeries or gpd.GeoDataFrame
+        Indexed by QGIS feature ids
+    """
+    import geopandas as gpd
+    import shapely as shp
+
     geometries = []
+    feature_ids = []
     attributes_data = {}
 
     # Initialize attribute dictionary if needed
@@ -29,11 +679,13 @@ def qgs_to_gpd(source, attribute_fields=None):
 
     # Extract data from features
     for feature in source.getFeatures():
-        # Extract geometries
+        # Extract geometries, null geometries stay missing
         qgs_geometry = feature.geometry()
-        wkt = qgs_geometry.asWkt()
-        shapely_geometry = shp.from_wkt(wkt)
-        geometries.append(shapely_geometry)
+        if qgs_geometry.isNull():
+            geometries.append(None)
+        else:
+            geometries.append(bytes(qgs_geometry.asWkb()))
+        feature_ids.append(feature.id())
 
         # Extract attributes if needed
         if attribute_fields:
@@ -49,12 +701,302 @@ def qgs_to_gpd(source, attribute_fields=None):
                     # Field not found, add None
                     attributes_data[field_name].append(None)
 
+    # Parse all geometries at once
+    geometries = shp.from_wkb(geometries)
+
     # Create appropriate return type
     if attribute_fields:
         # Create GeoDataFrame with attributes
         gdf_data = attributes_data.copy()
         gdf_data["geometry"] = geometries
-        return gpd.GeoDataFrame(gdf_data)
+        return gpd.GeoDataFrame(gdf_data, index=feature_ids)
     else:
         # Return just GeoSeries
-        return gpd.GeoSeries(geometries)
+        return gpd.GeoSeries(geometries, index=feature_ids)
+
+
+def _file_options(source, layer, attribute_fields):
+    """
+    Get the options of reading the file a layer is stored in with pyogrio
+
+    Layers may only be queried in the thread they live in, so the options
+    are plain values which can be read in any thread.
+
+    Parameters:
+    -----------
+    source : QgsProcessingFeatureSource
+        QGIS feature source of the layer
+    layer : QgsVectorLayer or None
+        Layer of the source
+    attribute_fields : list or None
+        List of field names to read
+
+    Returns:
+    --------
+    dict or None
+        Path, layer, columns and filter of the file, None if the layer
+        cannot be read directly and its features need to be iterated
+    """
+    if layer is None or layer.providerType() != "ogr":
+        return None
+
+    # Selected features only, feature limits and filters of the processing
+    # source are not reflected in the file
+    if source.featureCount() != layer.featureCount():
+        return None
+
+    uri = QgsProviderRegistry.instance().decodeUri("ogr", layer.source())
+    path = uri.get("path") or ""
+    if not path.lower().endswith(COLUMNAR_EXTENSIONS) or not os.path.isfile(path):
+        return None
+
+    columns = list(attribute_fields or [])
+    if not set(columns).issubset(layer.dataProvider().fields().names()):
+        return None
+
+    if importlib.util.find_spec("pyogrio") is None:
+        return None
+
+    return {
+        "path": path,
+        "layer": uri.get("layerName") or None,
+        "columns": columns,
+        "where": layer.subsetString() or None,
+    }
+
+
+def _read_file(options):
+    """
+    Read the file a layer is stored in with pyogrio
+
+    Parameters:
+    -----------
+    options : dict
+        Options of reading the file, see _file_options
+
+    Returns:
+    --------
+    gpd.GeoDataFrame
+        Indexed by QGIS feature ids
+    """
+    import pyogrio
+
+    dataframe = pyogrio.read_dataframe(
+        options["path"],
+        layer=options["layer"],
+        columns=options["columns"],
+        where=options["where"],
+        fid_as_index=True,
+        use_arrow=importlib.util.find_spec("pyarrow") is not None,
+    )
+    dataframe.index.name = None
+    return dataframe
+
+
+def add_conversion_parameters(algorithm):
+    """
+    Add parameters controlling how inputs are converted to GeoPandas
+
+    The CRS characters are computed in, the repair of invalid geometries,
+    the handling of multipart geometries and the order of features. Null and
+    empty geometries are always skipped.
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm to add the parameters to
+    """
+    projection = QgsProcessingParameterEnum(
+        PROJECTION,
+        "Compute in",
+        options=PROJECTIONS,
+        defaultValue=SOURCE_CRS,
+    )
+    projection.setFlags(
+        projection.flags() | QgsProcessingParameterDefinition.FlagAdvanced
+    )
+    algorithm.addParameter(projection)
+
+    target = QgsProcessingParameterCrs(TARGET_CRS, "Target CRS", optional=True)
+    target.setFlags(target.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+    algorithm.addParameter(target)
+
+    repair = QgsProcessingParameterBoolean(
+        REPAIR, "Repair invalid geometries", defaultValue=False
+    )
+    repair.setFlags(repair.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+    algorithm.addParameter(repair)
+
+    grid_size = QgsProcessingParameterNumber(
+        GRID_SIZE,
+        "Snap geometries to a precision grid of this size, 0 to keep precision",
+        type=QgsProcessingParameterNumber.Double,
+        defaultValue=0.0,
+        minValue=0.0,
+    )
+    grid_size.setFlags(
+        grid_size.flags() | QgsProcessingParameterDefinition.FlagAdvanced
+    )
+    algorithm.addParameter(grid_size)
+
+    multipart = QgsProcessingParameterEnum(
+        MULTIPART,
+        "Multipart geometries",
+        options=MULTIPART_OPTIONS,
+        defaultValue=KEEP_MULTIPART,
+    )
+    multipart.setFlags(
+        multipart.flags() | QgsProcessingParameterDefinition.FlagAdvanced
+    )
+    algorithm.addParameter(multipart)
+
+    order = QgsProcessingParameterEnum(
+        SPATIAL_ORDER,
+        "Order of features for chunked and parallel processing",
+        options=SPATIAL_ORDERS,
+        defaultValue=PROVIDER_ORDER,
+    )
+    order.setFlags(order.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+    algorithm.addParameter(order)
+
+
+def conversion_options(algorithm, parameters, context, feedback, source):
+    """
+    Collect keyword arguments of qgs_to_gpd from the conversion parameters
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm with conversion parameters
+    parameters : dict
+        Parameters of the algorithm
+    context : QgsProcessingContext
+        Processing context
+    feedback : QgsProcessingFeedback
+        Processing feedback
+    source : QgsProcessingFeatureSource
+        Main input of the algorithm
+
+    Returns:
+    --------
+    dict
+    """
+    return {
+        "crs": target_crs(algorithm, parameters, context, feedback, source),
+        "repair": algorithm.parameterAsBoolean(parameters, REPAIR, context),
+        "grid_size": algorithm.parameterAsDouble(parameters, GRID_SIZE, context),
+        "multipart": algorithm.parameterAsEnum(parameters, MULTIPART, context),
+        "order": algorithm.parameterAsEnum(parameters, SPATIAL_ORDER, context),
+        "feedback": feedback,
+    }
+
+
+def target_crs(algorithm, parameters, context, feedback, source):
+    """
+    Find the projected CRS to compute characters in
+
+    The local UTM zone is chosen by the centre of the extent of source, as in
+    GeoSeries.estimate_utm_crs.
+
+    Parameters:
+    -----------
+    algorithm : QgsProcessingAlgorithm
+        Algorithm with projection parameters
+    parameters : dict
+        Parameters of the algorithm
+    context : QgsProcessingContext
+        Processing context
+    feedback : QgsProcessingFeedback
+        Processing feedback
+    source : QgsProcessingFeatureSource
+        Main input of the algorithm
+
+    Returns:
+    --------
+    pyproj.CRS or None
+        None if the CRS of the source is kept
+    """
+    import pyproj
+    from pyproj.aoi import AreaOfInterest
+    from pyproj.database import query_utm_crs_info
+
+    source_crs = source.sourceCrs()
+    projection = algorithm.parameterAsEnum(parameters, PROJECTION, context)
+
+    if projection == SOURCE_CRS:
+        if source_crs.isGeographic():
+            feedback.pushWarning(
+                "The input layer has a geographic CRS, distances, lengths and "
+                "areas are computed in degrees. Compute in a local UTM zone or "
+                "a projected target CRS instead."
+            )
+        return None
+
+    if not source_crs.isValid():
+        raise QgsProcessingException("The input layer has no CRS to project from.")
+
+    if projection == LOCAL_UTM:
+        extent = source.sourceExtent()
+        to_geographic = pyproj.Transformer.from_crs(
+            source_crs.toWkt(), "EPSG:4326", always_xy=True
+        )
+        x, y = to_geographic.transform(
+            (extent.xMinimum() + extent.xMaximum()) / 2,
+            (extent.yMinimum() + extent.yMaximum()) / 2,
+        )
+        utm_crs = query_utm_crs_info(
+            datum_name="WGS 84", area_of_interest=AreaOfInterest(x, y, x, y)
+        )
+        if not utm_crs:
+            raise QgsProcessingException(
+                "No UTM zone covers the extent of the input layer."
+            )
+        crs = pyproj.CRS.from_epsg(utm_crs[0].code)
+    else:
+        custom_crs = algorithm.parameterAsCrs(parameters, TARGET_CRS, context)
+        if not custom_crs.isValid():
+            raise QgsProcessingException("Target CRS is not set.")
+        crs = pyproj.CRS.from_user_input(custom_crs.toWkt())
+
+    if not crs.is_projected:
+        raise QgsProcessingException(f"{crs.name} is not a projected CRS.")
+    feedback.pushInfo(f"Computing in {crs.name}.")
+    return crs
+
+
+def nearest_street(geometry, streets, max_distance=None):
+    """
+    Find the nearest street for each geometry with a single bulk query
+
+    Parameters:
+    -----------
+    geometry : gpd.GeoSeries
+        Buildings or tessellation cells
+    streets : gpd.GeoSeries
+        Street network
+    max_distance : float or None
+        Maximum distance within which to search for the nearest street
+        If None, the search is not limited
+
+    Returns:
+    --------
+    tuple of np.ndarray
+        Index label of the nearest street and the distance to it for each
+        geometry, NaN where no street was found within max_distance
+    """
+    import numpy as np
+    import shapely as shp
+
+    tree = shp.STRtree(streets.array)
+    (input_idx, tree_idx), distances = tree.query_nearest(
+        geometry.array,
+        max_distance=max_distance,
+        return_distance=True,
+        all_matches=False,
+    )
+
+    street_index = np.full(len(geometry), np.nan)
+    street_index[input_idx] = streets.index.to_numpy()[tree_idx]
+    street_distance = np.full(len(geometry), np.nan)
+    street_distance[input_idx] = distances
+    return street_index, street_distance
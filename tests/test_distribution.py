@@ -0,0 +1,89 @@
+"""
+Tests of distribution algorithms
+
+Run with the Python interpreter of the QGIS installation, e.g.
+
+    python-qgis -m pytest tests
+"""
+
+import importlib
+import os
+import sys
+
+import pytest
+
+qgis_core = pytest.importorskip("qgis.core")
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+distribution = importlib.import_module(
+    os.path.basename(PLUGIN_DIR) + ".momepy.distribution"
+)
+
+
+@pytest.fixture(scope="module")
+def application():
+    application = qgis_core.QgsApplication([], False)
+    application.initQgis()
+    yield application
+
+
+def memory_layer(geometry_type, wkts):
+    layer = qgis_core.QgsVectorLayer(f"{geometry_type}?crs=EPSG:3857", "", "memory")
+    features = []
+    for wkt in wkts:
+        feature = qgis_core.QgsFeature()
+        feature.setGeometry(qgis_core.QgsGeometry.fromWkt(wkt))
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    return layer
+
+
+def test_orientation_of_multipart_lines():
+    import geopandas as gpd
+    import shapely as shp
+
+    lines = gpd.GeoSeries(
+        [
+            shp.MultiLineString([[(0, 0), (5, 5)], [(5, 5), (10, 10)]]),
+            shp.MultiLineString([[(0, 0), (1, 0)], [(10, 10), (30, 30)]]),
+            shp.LineString([(0, 0), (10, 0)]),
+        ]
+    )
+    orientation = distribution._orientation(lines)
+    # Connected parts are merged, disjoint ones use the longest part
+    assert orientation.round(6).tolist() == [45.0, 45.0, 0.0]
+
+
+def test_street_alignment_with_multipart_streets(application):
+    buildings = memory_layer(
+        "Polygon",
+        [
+            "POLYGON ((0 10, 10 10, 10 20, 0 20, 0 10))",
+            "POLYGON ((30 10, 40 15, 35 25, 25 20, 30 10))",
+        ],
+    )
+    streets = memory_layer(
+        "MultiLineString",
+        [
+            "MULTILINESTRING ((-10 0, 20 0), (20 0, 50 0))",
+            "MULTILINESTRING ((100 100, 100 150), (200 100, 200 110))",
+        ],
+    )
+
+    algorithm = distribution.StreetAlignment().create()
+    context = qgis_core.QgsProcessingContext()
+    feedback = qgis_core.QgsProcessingFeedback()
+    results, ok = algorithm.run(
+        {"INPUT": buildings, "INPUT_STREETS": streets, "OUTPUT": "TEMPORARY_OUTPUT"},
+        context,
+        feedback,
+    )
+    assert ok
+
+    output = qgis_core.QgsProcessingUtils.mapLayerFromString(
+        results["OUTPUT"], context
+    )
+    alignment = [feature["street_alignment"] for feature in output.getFeatures()]
+    assert alignment[0] == pytest.approx(0.0)
+    assert alignment[1] == pytest.approx(26.565051, abs=1e-4)
@@ -0,0 +1,72 @@
+"""
+Tests of preprocessing algorithms
+
+Run with the Python interpreter of the QGIS installation, e.g.
+
+    python-qgis -m pytest tests
+"""
+
+import importlib
+import os
+import sys
+
+import pytest
+
+qgis_core = pytest.importorskip("qgis.core")
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+preprocessing = importlib.import_module(
+    os.path.basename(PLUGIN_DIR) + ".momepy.preprocessing"
+)
+
+
+@pytest.fixture(scope="module")
+def application():
+    application = qgis_core.QgsApplication([], False)
+    application.initQgis()
+    yield application
+
+
+def memory_layer(geometry_type, wkts):
+    layer = qgis_core.QgsVectorLayer(f"{geometry_type}?crs=EPSG:3857", "", "memory")
+    features = []
+    for wkt in wkts:
+        feature = qgis_core.QgsFeature()
+        feature.setGeometry(qgis_core.QgsGeometry.fromWkt(wkt))
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    return layer
+
+
+def test_consolidate_fully_consolidated_network(application):
+    # A short link between two T-junctions, every edge is rebuilt
+    streets = memory_layer(
+        "LineString",
+        [
+            "LINESTRING (0 0, 5 0)",
+            "LINESTRING (0 0, 0 50)",
+            "LINESTRING (0 0, 0 -50)",
+            "LINESTRING (5 0, 5 50)",
+            "LINESTRING (5 0, 5 -50)",
+        ],
+    )
+
+    algorithm = preprocessing.ConsolidateIntersections().create()
+    context = qgis_core.QgsProcessingContext()
+    feedback = qgis_core.QgsProcessingFeedback()
+    results, ok = algorithm.run(
+        {"INPUT": streets, "TOLERANCE": 10, "OUTPUT": "TEMPORARY_OUTPUT"},
+        context,
+        feedback,
+    )
+    assert ok
+
+    output = qgis_core.QgsProcessingUtils.mapLayerFromString(
+        results["OUTPUT"], context
+    )
+    edges = list(output.getFeatures())
+    assert len(edges) == 4
+    for edge in edges:
+        assert not edge.geometry().isEmpty()
+        assert edge["length"] == pytest.approx(edge.geometry().length())